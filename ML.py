@@ -133,6 +133,10 @@ scaled_df = pd.DataFrame(scaled_numeric, columns=numeric_cols)
 # 3. Combinaison des données transformées
 X_transformed = pd.concat([scaled_df, encoded_df], axis=1)
 
+# Schéma de features (ordre des colonnes, min/max du scaler, vocabulaires) pour le service
+from feature_encoder import construire_schema, sauvegarder_schema
+schema_features = construire_schema(scaler, X_transformed.columns)
+
 # Résultat final
 print(X_transformed.head())
 
@@ -967,7 +971,10 @@ print("👥 PROFILS DES NOUVEAUX CLIENTS :")
 print(nouveaux_clients[['age', 'bmi', 'children', 'sex_male', 'smoker_yes']])
 
 # 2. PRÉDICTION AVEC LE MEILLEUR MODÈLE
-predictions = modele_final.predict(xgb.DMatrix(nouveaux_clients))
+# Mise à l'échelle identique à X_transformed avant la prédiction
+nouveaux_clients_X = nouveaux_clients.copy()
+nouveaux_clients_X[numeric_cols] = scaler.transform(nouveaux_clients[numeric_cols])
+predictions = modele_final.predict(xgb.DMatrix(nouveaux_clients_X))
 nouveaux_clients['frais_predits'] = predictions
 
 # 3. ANALYSE DES RÉSULTATS (NOUVEAU)
@@ -1163,6 +1170,11 @@ joblib.dump(modele_final, 'models/modele_final.pkl')
 joblib.dump(encoder, 'models/encoder.pkl')
 joblib.dump(scaler, 'models/scaler.pkl')
 joblib.dump(clf, 'models/clf.pkl')
+sauvegarder_schema(schema_features, 'models/feature_schema.json')
+
+# Formats natifs (sans pickle) : booster UBJSON + paramètres NumPy de encoder/scaler/clf
+from native_export import exporter_natif
+exporter_natif(modele_final, encoder, scaler, clf, 'models')
 print("✅ Modèles sauvegardés!")
 
 
@@ -1199,6 +1211,10 @@ def sauvegarder_modeles():
         joblib.dump(encoder, 'models/encoder.pkl')
         joblib.dump(scaler, 'models/scaler.pkl')
         joblib.dump(clf, 'models/clf.pkl')
+        sauvegarder_schema(schema_features, 'models/feature_schema.json')
+
+        from native_export import exporter_natif
+        exporter_natif(modele_final, encoder, scaler, clf, 'models')
         
         print("✅ Modèles sauvegardés avec succès dans le dossier 'models/'")
         print("📁 Fichiers créés :")
@@ -1206,6 +1222,9 @@ def sauvegarder_modeles():
         print("   - encoder.pkl") 
         print("   - scaler.pkl")
         print("   - clf.pkl")
+        print("   - feature_schema.json")
+        print("   - modele_final.ubj")
+        print("   - preprocessing.npz")
         return True
         
     except Exception as e:
@@ -1,83 +1,256 @@
-from flask import Flask, render_template, request, jsonify
-import pandas as pd
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g, redirect
 import xgboost as xgb
-import plotly.graph_objects as go
-import plotly.utils
 import json
-import joblib
+import math
 import os
 import numpy as np
 import logging
+import time
+from urllib.parse import urlencode
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from feature_encoder import FeatureEncoder, SchemaIncompatible, verifier_schema_modele
+from model_registry import ModelRegistry, artefacts_a_charger
+from pack_engine import PackEngine
+from figure_cache import FigureCache
+from shared_models import mesurer_memoire
+from prediction_cache import PredictionCache, empreinte_booster
+from price_table import FICHIER_META, charger_table
+from metrics import Chronometre, RegistreMetriques, marquer
+from request_log import JournalRequetes, configurer_journalisation
+from json_codec import FournisseurJson, FragmentJson
+from static_assets import AssetsStatiques
 
 app = Flask(__name__)
 
-def load_models():
-    """Charge tous les modèles sauvegardés"""
-    try:
-        logging.info("Chargement des modèles...")
-        
-        if not os.path.exists('models'):
-            logging.error("Dossier 'models' introuvable")
-            return None, None, None, None
-        
-        required_files = ['modele_final.pkl', 'encoder.pkl', 'scaler.pkl', 'clf.pkl']
-        for file in required_files:
-            if not os.path.exists(f'models/{file}'):
-                logging.error(f"Fichier manquant: models/{file}")
-                return None, None, None, None
-        
-        modele_final = joblib.load('models/modele_final.pkl')
-        encoder = joblib.load('models/encoder.pkl') 
-        scaler = joblib.load('models/scaler.pkl')
-        clf = joblib.load('models/clf.pkl')
-        
-        logging.info("Modèles chargés avec succès")
-        return modele_final, encoder, scaler, clf
-        
-    except Exception as e:
-        logging.error(f"Erreur: {e}")
-        return None, None, None, None
+# Journalisation : lignes JSON écrites par un thread dédié (LOG_FORMAT=texte pour
+# l'ancien format), succès des routes API échantillonnés, erreurs toujours écrites.
+# LOG_HASH_KEY : clé des empreintes de payload (commune aux workers pour les corréler)
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO').upper()
+app.config['LOG_FORMAT'] = os.environ.get('LOG_FORMAT', 'json')
+app.config['LOG_SUCCESS_SAMPLE'] = float(os.environ.get('LOG_SUCCESS_SAMPLE', 0.01))
+app.config['LOG_HASH_KEY'] = os.environ.get('LOG_HASH_KEY')
+app.config['LOG_ERROR_PAYLOAD'] = os.environ.get('LOG_ERROR_PAYLOAD', '0') == '1'
+
+configurer_journalisation(app.config['LOG_LEVEL'], app.config['LOG_FORMAT'])
+
+# Codec JSON des requêtes et réponses : 'auto' (orjson s'il est installé), 'orjson' ou 'stdlib'
+app.config['JSON_CODEC'] = os.environ.get('JSON_CODEC', 'auto')
+app.json = FournisseurJson(app, app.config['JSON_CODEC'])
+
+# Taille des paquets pour le scoring par lot (/predict/batch)
+app.config['BATCH_CHUNK_SIZE'] = int(os.environ.get('BATCH_CHUNK_SIZE', 10000))
+app.config['BATCH_MAX_CHUNK_SIZE'] = int(os.environ.get('BATCH_MAX_CHUNK_SIZE', 100000))
+
+# Rendu de la jauge par défaut : 'server' (figure Plotly) ou 'client' (paramètres seuls).
+# En mode 'client', plotly n'est importé que si une requête demande explicitement la figure.
+app.config['GAUGE_RENDER'] = os.environ.get('GAUGE_RENDER', 'server')
+
+# Micro-batching de /predict côté ASGI (asgi_app.py) : taille maximale d'un lot
+# et attente maximale (ms) avant de scorer un lot incomplet
+app.config['MICROBATCH_MAX_SIZE'] = int(os.environ.get('MICROBATCH_MAX_SIZE', 64))
+app.config['MICROBATCH_MAX_WAIT_MS'] = float(os.environ.get('MICROBATCH_MAX_WAIT_MS', 2))
+# Threads servant les autres routes Flask derrière le serveur ASGI
+app.config['ASGI_WSGI_THREADS'] = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+
+# Chronométrage par étape de /predict et /pack (histogrammes sur /metrics)
+# et, en option, en-tête Server-Timing dans les réponses
+app.config['METRICS'] = os.environ.get('METRICS', '1') == '1'
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '0') == '1'
+
+# Durée de cache (s) des réponses GET /pack (navigateurs, CDN, reverse proxy) ;
+# au-delà, revalidation par ETag (304 sans corps)
+app.config['PACK_CACHE_MAX_AGE'] = int(os.environ.get('PACK_CACHE_MAX_AGE', 86400))
+
+# Nombre maximal de jauges non préchauffées gardées en cache (LRU)
+app.config['GAUGE_CACHE_SIZE'] = int(os.environ.get('GAUGE_CACHE_SIZE', 64))
+
+# Cache optionnel des frais prédits pour /predict (désactivé par défaut).
+# PREDICTION_CACHE_BMI_STEP : pas de quantification du BMI (0 = BMI exact)
+app.config['PREDICTION_CACHE'] = os.environ.get('PREDICTION_CACHE', '0') == '1'
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE', 100000))
+app.config['PREDICTION_CACHE_TTL'] = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+app.config['PREDICTION_CACHE_BMI_STEP'] = float(os.environ.get('PREDICTION_CACHE_BMI_STEP', 0.1))
+app.config['PREDICTION_CACHE_MAX_MO'] = float(os.environ.get('PREDICTION_CACHE_MAX_MO', 64))
 
-# Charger les modèles
-modele_final, encoder, scaler, clf = load_models()
+# Source des frais prédits : 'booster' (XGBoost) ou 'table' (table de prix matérialisée
+# par price_table.py, lue sans appeler XGBoost)
+app.config['PREDICTION_MODE'] = os.environ.get('PREDICTION_MODE', 'booster')
+
+# Artefacts du dossier models/ chargés en parallèle par le registre
+ARTEFACTS = artefacts_a_charger('models')
+if app.config['PREDICTION_MODE'] == 'table':
+    ARTEFACTS['price_table'] = (FICHIER_META, charger_table)
+
+# Objets de service, renseignés par preparer_modeles() une fois le chargement terminé
+modele_final, encoder, scaler, clf, schema_features = None, None, None, None, None
+empreinte_modele = None
+table_prix = None
+encodeur_features = None
+
+def preparer_modeles(artefacts):
+    """Valide les artefacts chargés et construit les objets utilisés par les routes"""
+    global modele_final, encoder, scaler, clf, schema_features, encodeur_features, empreinte_modele, table_prix
+
+    # Contrat entraînement / service : le registre reste non prêt si le schéma ne correspond pas
+    verifier_schema_modele(artefacts['feature_schema'], artefacts['modele_final'])
+    encodeur = FeatureEncoder.depuis_schema(artefacts['feature_schema'])
+
+    encoder = artefacts['encoder']
+    scaler = artefacts['scaler']
+    clf = artefacts['clf']
+    schema_features = artefacts['feature_schema']
+    encodeur_features = encodeur
+    modele_final = artefacts['modele_final']
+    # Le cache des prédictions est invalidé dès que ce contenu change
+    empreinte_modele = empreinte_booster(modele_final)
+
+    # Une table construite pour un autre booster ou un autre schéma donnerait des prix faux
+    table = artefacts.get('price_table')
+    if table is not None:
+        if table.empreinte_modele != empreinte_modele or table.hash_schema != schema_features['hash']:
+            raise SchemaIncompatible("Table de prix obsolète : relancer python price_table.py")
+        table_prix = table
+
+# Chargement en arrière-plan : Flask répond à /health/live pendant le chargement
+registry = ModelRegistry('models', ARTEFACTS, preparer=preparer_modeles)
+registry.demarrer()
+
+prediction_cache = None
+if app.config['PREDICTION_CACHE']:
+    prediction_cache = PredictionCache(
+        taille_max=app.config['PREDICTION_CACHE_SIZE'],
+        ttl=app.config['PREDICTION_CACHE_TTL'],
+        pas_bmi=app.config['PREDICTION_CACHE_BMI_STEP'],
+        memoire_max_mo=app.config['PREDICTION_CACHE_MAX_MO']
+    )
 
 # =============================================================================
 # FONCTIONS DE PRÉDICTION AVEC VOTRE LOGIQUE
 # =============================================================================
 
-def prepare_client_data(age, bmi, children, sex, smoker, region):
-    """Prépare les données du client dans le format attendu par le modèle"""
-    
-    # One-hot encoding manuel pour correspondre à X_transformed
-    sex_female = 1 if sex == 'female' else 0
-    sex_male = 1 if sex == 'male' else 0
-    
-    smoker_no = 1 if smoker == 'no' else 0
-    smoker_yes = 1 if smoker == 'yes' else 0
-    
-    region_northeast = 1 if region == 'northeast' else 0
-    region_northwest = 1 if region == 'northwest' else 0
-    region_southeast = 1 if region == 'southeast' else 0
-    region_southwest = 1 if region == 'southwest' else 0
-    
-    # Création du DataFrame avec les mêmes colonnes que pendant l'entraînement
-    client_data = pd.DataFrame({
-        'age': [age],
-        'bmi': [bmi], 
-        'children': [children],
-        'sex_female': [sex_female],
-        'sex_male': [sex_male],
-        'smoker_no': [smoker_no],
-        'smoker_yes': [smoker_yes],
-        'region_northeast': [region_northeast],
-        'region_northwest': [region_northwest],
-        'region_southeast': [region_southeast],
-        'region_southwest': [region_southwest]
-    })
-    
-    return client_data
+class ClientInvalide(ValueError):
+    """Données client rejetées par la validation (message affichable tel quel)"""
+
+
+def valider_client(data):
+    """Convertit et valide les champs d'un client, lève ClientInvalide si invalide"""
+    age = int(data['age'])
+    bmi = float(data['bmi'])
+    children = int(data['children'])
+    sex = data['sex']
+    smoker = data['smoker']
+    region = data['region']
+
+    # Listes ou nombres casseraient l'encodage vectorisé du paquet entier
+    for nom, valeur in (('sex', sex), ('smoker', smoker), ('region', region)):
+        if not isinstance(valeur, str):
+            raise ClientInvalide(f"Champ {nom} invalide: chaîne attendue")
+
+    if age < 18 or age > 100:
+        raise ClientInvalide("L'âge doit être entre 18 et 100 ans")
+
+    if children < 0 or children > 20:
+        raise ClientInvalide("Nombre d'enfants invalide")
+
+    return age, bmi, children, sex, smoker, region
+
+def calculer_frais(client):
+    """Frais prédits par le booster pour un client (age, bmi, children, sex, smoker, region)"""
+    client_data = encodeur_features.encode(*client)
+    marquer('encodage')
+    dmatrix = xgb.DMatrix(client_data, feature_names=encodeur_features.colonnes)
+    marquer('dmatrix')
+    frais = float(modele_final.predict(dmatrix)[0])
+    marquer('booster')
+    return frais
+
+def predire_frais(age, bmi, children, sex, smoker, region):
+    """Frais prédits : table de prix (mode 'table'), sinon cache des prédictions ou booster"""
+    if table_prix is not None:
+        frais = table_prix.prix(age, bmi, children, sex, smoker, region)
+        marquer('table')
+        # Hors grille (catégorie inconnue, BMI non fini) : calcul direct
+        if frais is not None:
+            return frais
+    if prediction_cache is None:
+        return calculer_frais((age, bmi, children, sex, smoker, region))
+    cle = prediction_cache.canonique(age, bmi, children, sex, smoker, region)
+    # Entrée non finie : pas de clé canonique, calcul direct
+    if cle is None:
+        return calculer_frais((age, bmi, children, sex, smoker, region))
+    frais = prediction_cache.get_or_compute(cle, empreinte_modele, calculer_frais)
+    marquer('cache')
+    return frais
+
+def predire_frais_lot(colonnes):
+    """Frais prédits pour des colonnes (ages, bmis, children, sexes, smokers, regions), un seul appel au booster"""
+    X = encodeur_features.encode_batch(*colonnes)
+    return modele_final.predict(xgb.DMatrix(X, feature_names=encodeur_features.colonnes)).tolist()
+
+def scorer_paquet(paquet):
+    """
+    Valide, encode et score un paquet de (index, données client).
+    Un seul appel au booster par paquet ; les erreurs sont retournées ligne par ligne.
+    """
+    indices = []
+    colonnes = ([], [], [], [], [], [])
+    erreurs = []
+
+    for index, data in paquet:
+        try:
+            if not isinstance(data, dict):
+                raise ClientInvalide("Client invalide: objet JSON attendu")
+            valeurs = valider_client(data)
+        except ClientInvalide as e:
+            erreurs.append({'index': index, 'error': str(e)})
+            continue
+        except (KeyError, TypeError, ValueError) as e:
+            erreurs.append({'index': index, 'error': f"Erreur lors de l'analyse: {str(e)}"})
+            continue
+
+        indices.append(index)
+        for colonne, valeur in zip(colonnes, valeurs):
+            colonne.append(valeur)
+
+    resultats = []
+    if indices:
+        frais = predire_frais_lot(colonnes)
+        ages, bmis, enfants, _, smokers, _ = colonnes
+        packs = pack_engine.resultats(pack_engine.classify_many(ages, bmis, enfants, smokers))
+        for index, frais_predits, pack in zip(indices, frais, packs):
+            resultats.append({
+                'index': index,
+                'frais': round(frais_predits, 2),
+                'frais_predits': f"${frais_predits:,.2f}",
+                'remboursement_class': pack['remboursement_class'],
+                'pack': pack['pack']
+            })
+
+    return resultats, erreurs
+
+def iterer_paquets(lignes, taille):
+    """Regroupe un itérable de (index, client) en paquets de `taille` éléments"""
+    paquet = []
+    for element in lignes:
+        paquet.append(element)
+        if len(paquet) >= taille:
+            yield paquet
+            paquet = []
+    if paquet:
+        yield paquet
+
+def lire_ndjson(flux):
+    """Lit un flux NDJSON ligne par ligne ; une ligne illisible devient une erreur de ligne"""
+    index = 0
+    for ligne in flux:
+        ligne = ligne.strip()
+        if not ligne:
+            continue
+        try:
+            yield index, app.json.loads(ligne)
+        except ValueError as e:
+            yield index, e
+        index += 1
 
 def definir_pack_auto(bmi, age, type_client):
     """
@@ -239,8 +412,8 @@ def predict_risk_and_pack(age, bmi, children, smoker):
         'remboursement_text': f"Remboursement {remboursement_details['taux_remboursement']}%"
     }
 
-def create_risk_gauge(taux_remboursement, color, label):
-    """Crée un graphique jauge pour le type de remboursement"""
+def parametres_jauge(taux_remboursement, color, label):
+    """Paramètres suffisants pour reconstruire la jauge (côté serveur ou dans index.html)"""
     
     # Déterminer le texte à afficher selon le taux
     if taux_remboursement >= 75:
@@ -252,6 +425,22 @@ def create_risk_gauge(taux_remboursement, color, label):
     else:
         remboursement_text = "FAIBLE"
         niveau_text = "Bas"
+
+    return {
+        'taux_remboursement': taux_remboursement,
+        'color': color,
+        'label': label,
+        'remboursement_text': remboursement_text,
+        'niveau_text': niveau_text
+    }
+
+def construire_risk_gauge(taux_remboursement, color, label):
+    """Construit et sérialise le graphique jauge (appelé une seule fois par clé du cache)"""
+    # Import paresseux : les workers qui ne servent que des paramètres ne chargent jamais plotly
+    import plotly.graph_objects as go
+    import plotly.utils
+
+    remboursement_text = parametres_jauge(taux_remboursement, color, label)['remboursement_text']
     
     fig = go.Figure(go.Indicator(
         mode="gauge+number",
@@ -318,91 +507,342 @@ def create_risk_gauge(taux_remboursement, color, label):
     
     return json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
 
+# Jauges pré-sérialisées, indexées par (taux_remboursement, color, label)
+gauge_cache = FigureCache(construire_risk_gauge, taille_max=app.config['GAUGE_CACHE_SIZE'])
+
+def create_risk_gauge(taux_remboursement, color, label):
+    """Retourne le texte JSON du graphique jauge pour le type de remboursement (depuis le cache)"""
+    return gauge_cache.get(taux_remboursement, color, label)
+
+def prechauffer_jauges():
+    """Construit au démarrage les jauges des trois classes de remboursement"""
+    cles = []
+    for remboursement_class in ('R1', 'R2', 'R3'):
+        details = get_remboursement_details(remboursement_class, None)
+        cles.append((details['taux_remboursement'], details['color'], details['label']))
+    # Import de plotly et première figure (validateurs créés à la demande) hors mesure :
+    # sinon cout_moyen_ms, donc temps_economise_ms, compte ce coût unique à chaque hit
+    import plotly.graph_objects  # noqa: F401
+    construire_risk_gauge(*cles[0])
+    gauge_cache.prechauffer(cles)
+    logging.info("Jauges préchauffées: %s ms par figure", gauge_cache.stats()['cout_moyen_ms'])
+
+# Table de décision des packs compilée une seule fois au démarrage
+pack_engine = PackEngine(predict_risk_and_pack)
+
+if app.config['GAUGE_RENDER'] == 'server':
+    prechauffer_jauges()
+
 # =============================================================================
 # ROUTES FLASK
 # =============================================================================
 
+# Fichiers statiques empreintés et précompressés (python static_assets.py) : /assets/...
+assets = AssetsStatiques().enregistrer(app)
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
+# Type de contenu pour demander uniquement les paramètres de la jauge
+MIME_PARAMETRES_JAUGE = 'application/vnd.assurance.gauge-params+json'
+
+def choisir_rendu_jauge(mode, accept):
+    """Mode de rendu de la jauge : ?gauge=client|server, puis en-tête Accept, puis config"""
+    if mode in ('client', 'server'):
+        return mode
+    if MIME_PARAMETRES_JAUGE in (accept or ''):
+        return 'client'
+    return app.config['GAUGE_RENDER']
+
+def rendu_jauge_demande():
+    """Mode de rendu de la jauge pour la requête Flask courante"""
+    return choisir_rendu_jauge(request.args.get('gauge'), request.headers.get('Accept', ''))
+
+def reponse_prediction(client, frais_predits, rendu):
+    """Corps JSON de /predict : frais, risque / pack et jauge (figure ou paramètres)"""
+    age, bmi, children, _, smoker, _ = client
+    frais_formatted = f"${frais_predits:,.2f}"
+
+    # ==================== ÉVALUATION DU RISQUE ET PACK ====================
+    risk_data = pack_engine.lookup(age, bmi, children, smoker)
+    marquer('pack')
+
+    reponse = {
+        'success': True,
+        'frais_predits': frais_formatted,
+        'risk_data': dict(risk_data)
+    }
+
+    # ==================== CRÉATION DU GRAPHIQUE ====================
+    jauge = (risk_data['taux_remboursement'], risk_data['color'], risk_data['label'])
+    if rendu == 'client':
+        reponse['gauge_params'] = parametres_jauge(*jauge)
+    else:
+        # Figure déjà sérialisée : insérée telle quelle (objet JSON, pas une chaîne ré-échappée)
+        reponse['graph_json'] = FragmentJson(create_risk_gauge(*jauge))
+    marquer('jauge')
+    return reponse
+
 @app.route('/predict', methods=['POST'])
 def predict():
     """Route principale pour la prédiction des frais"""
-    if modele_final is None:
+    if not registry.pret:
         return jsonify({'success': False, 'error': "Système temporairement indisponible"})
     
     try:
         data = request.json
+        marquer('json')
         
-        age = int(data['age'])
-        bmi = float(data['bmi'])
-        children = int(data['children'])
-        sex = data['sex']
-        smoker = data['smoker']
-        region = data['region']
-        
-        if age < 18 or age > 100:
-            return jsonify({'success': False, 'error': "L'âge doit être entre 18 et 100 ans"})
-        
-        if children < 0 or children > 20:
-            return jsonify({'success': False, 'error': "Nombre d'enfants invalide"})
+        try:
+            client = valider_client(data)
+            marquer('validation')
+        except ClientInvalide as e:
+            g.erreur = e
+            return jsonify({'success': False, 'error': str(e)})
 
         # ==================== PRÉDICTION DES FRAIS ====================
-        client_data = prepare_client_data(age, bmi, children, sex, smoker, region)
-        frais_predits = modele_final.predict(xgb.DMatrix(client_data))[0]
-        frais_formatted = f"${frais_predits:,.2f}"
+        frais_predits = predire_frais(*client)
 
-        # ==================== ÉVALUATION DU RISQUE ET PACK ====================
-        risk_data = predict_risk_and_pack(age, bmi, children, smoker)
-        
-        # ==================== CRÉATION DU GRAPHIQUE ====================
-        graph_json = create_risk_gauge(risk_data['taux_remboursement'], risk_data['color'], risk_data['label'])
+        reponse = jsonify(reponse_prediction(client, frais_predits, rendu_jauge_demande()))
+        marquer('jsonify')
+        return reponse
+
+    except Exception as e:
+        g.erreur = e
+        return jsonify({'success': False, 'error': f"Erreur lors de l'analyse: {str(e)}"})
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Scoring par lot pour la re-tarification du portefeuille.
+    Accepte un tableau JSON de clients ou un flux NDJSON (application/x-ndjson).
+    La taille des paquets est réglable via ?chunk_size=.
+    """
+    if not registry.pret:
+        return jsonify({'success': False, 'error': "Système temporairement indisponible"})
+
+    try:
+        taille = int(request.args.get('chunk_size', app.config['BATCH_CHUNK_SIZE']))
+    except ValueError:
+        return jsonify({'success': False, 'error': "chunk_size invalide"})
+    taille = max(1, min(taille, app.config['BATCH_MAX_CHUNK_SIZE']))
+
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        lignes = lire_ndjson(request.stream)
+
+        def generer():
+            for paquet in iterer_paquets(lignes, taille):
+                illisibles = [(i, d) for i, d in paquet if isinstance(d, Exception)]
+                valides = [(i, d) for i, d in paquet if not isinstance(d, Exception)]
+                resultats, erreurs = scorer_paquet(valides)
+                erreurs += [{'index': i, 'error': f"JSON invalide: {e}"} for i, e in illisibles]
+                lignes_sortie = [dict(r, success=True) for r in resultats]
+                lignes_sortie += [dict(e, success=False) for e in erreurs]
+                lignes_sortie.sort(key=lambda r: r['index'])
+                # Même codec que jsonify (orjson si disponible)
+                yield ''.join(app.json.dumps(r) + '\n' for r in lignes_sortie)
+
+        return Response(stream_with_context(generer()), mimetype='application/x-ndjson')
+
+    try:
+        clients = request.get_json()
+        if not isinstance(clients, list):
+            return jsonify({'success': False, 'error': "Un tableau JSON de clients est attendu"})
+
+        resultats, erreurs = [], []
+        for paquet in iterer_paquets(enumerate(clients), taille):
+            r, e = scorer_paquet(paquet)
+            resultats += r
+            erreurs += e
 
         return jsonify({
             'success': True,
-            'frais_predits': frais_formatted,
-            'risk_data': risk_data,
-            'graph_json': graph_json
+            'count': len(clients),
+            'results': resultats,
+            'errors': erreurs
         })
 
     except Exception as e:
-        logging.error(f"Erreur prédiction: {e}")
-        return jsonify({'success': False, 'error': f"Erreur lors de l'analyse: {str(e)}"})
+        g.erreur = e
+        return jsonify({'success': False, 'error': f"Erreur lors de l'analyse du lot: {str(e)}"})
 
-@app.route('/pack', methods=['POST'])
+@app.route('/pack', methods=['GET', 'POST'])
 def pack():
-    """Route pour obtenir les détails du pack"""
+    """Route pour obtenir les détails du pack (POST JSON, ou GET cacheable : voir pack_get)"""
+    if request.method == 'GET':
+        return pack_get()
+
     try:
         data = request.json
+        marquer('json')
         
         age = int(data['age'])
         bmi = float(data['bmi'])
         children = int(data['children'])
         smoker = data['smoker']
+        marquer('validation')
 
         # ==================== ÉVALUATION DU RISQUE ET PACK ====================
-        risk_data = predict_risk_and_pack(age, bmi, children, smoker)
+        pack_data = pack_engine.lookup_pack(age, bmi, children, smoker)
+        marquer('pack')
 
-        return jsonify({
+        reponse = jsonify({
             'success': True,
-            'pack_data': {
-                'pack': risk_data['pack'],
-                'type_client': risk_data['type_client'],
-                'profil': risk_data['profil'],
-                'remboursement_class': risk_data['remboursement_class'],
-                'taux_remboursement': risk_data['taux_remboursement'],
-                'features': risk_data['features'],
-                'description': risk_data['description'],
-                'label': risk_data['label']
-            }
+            'pack_data': dict(pack_data)
         })
+        marquer('jsonify')
+        return reponse
 
     except Exception as e:
-        logging.error(f"Erreur pack: {e}")
+        g.erreur = e
         return jsonify({'success': False, 'error': f"Erreur lors de la détermination du pack: {str(e)}"})
 
+def lire_parametres_pack(args):
+    """Paramètres de GET /pack convertis et validés, lève ClientInvalide si invalides"""
+    try:
+        age = int(args['age'])
+        bmi = float(args['bmi'])
+        children = int(args['children'])
+    except (KeyError, ValueError):
+        raise ClientInvalide("Paramètres attendus: age (entier), bmi (nombre), children (entier), smoker (yes|no)")
+    smoker = args.get('smoker')
+    if smoker not in ('yes', 'no'):
+        raise ClientInvalide("smoker doit valoir 'yes' ou 'no'")
+    if not math.isfinite(bmi):
+        raise ClientInvalide("BMI invalide")
+    return age, bmi, children, smoker
+
+def requete_pack_canonique(age, bmi, children, smoker):
+    """Query string canonique de GET /pack : ordre fixe, nombres normalisés (une seule URL par client)"""
+    return urlencode((('age', age), ('bmi', repr(bmi)), ('children', children), ('smoker', smoker)))
+
+def pack_get():
+    """
+    GET /pack?age=..&bmi=..&children=..&smoker=.. : même corps que POST /pack,
+    cacheable par les navigateurs, le CDN et les reverse proxys. Les autres formes
+    de la query string sont redirigées (301) vers la forme canonique ; l'ETag ne
+    dépend que de la cellule (bandes d'entrée) et de la version des règles.
+    """
+    try:
+        age, bmi, children, smoker = lire_parametres_pack(request.args)
+    except ClientInvalide as e:
+        g.erreur = e
+        reponse = jsonify({'success': False, 'error': str(e)})
+        reponse.status_code = 400
+        reponse.headers['Cache-Control'] = 'no-store'
+        return reponse
+    marquer('validation')
+
+    cache_control = f"public, max-age={app.config['PACK_CACHE_MAX_AGE']}"
+    canonique = requete_pack_canonique(age, bmi, children, smoker)
+    if request.query_string.decode('latin-1') != canonique:
+        reponse = redirect(f"{request.path}?{canonique}", code=301)
+        reponse.headers['Cache-Control'] = cache_control
+        return reponse
+
+    cellule = pack_engine.cellule(age, bmi, children, smoker)
+    etag = pack_engine.etag_pack(cellule)
+    marquer('pack')
+
+    # Réponses équivalentes mais pas forcément identiques à l'octet près (codec JSON) : ETag faible
+    if request.if_none_match.contains_weak(etag):
+        reponse = Response(status=304)
+    else:
+        reponse = jsonify({
+            'success': True,
+            'pack_data': dict(pack_engine.table_pack[cellule])
+        })
+    marquer('jsonify')
+    reponse.set_etag(etag, weak=True)
+    reponse.headers['Cache-Control'] = cache_control
+    return reponse
+
+# ==================== CHRONOMÉTRAGE DES ROUTES ====================
+metriques = RegistreMetriques()
+ROUTES_CHRONOMETREES = ('predict', 'pack')
+
+@app.before_request
+def demarrer_chronometre():
+    if app.config['METRICS'] and request.endpoint in ROUTES_CHRONOMETREES:
+        g.chrono = Chronometre(request.endpoint)
+
+@app.after_request
+def enregistrer_chronometre(response):
+    chrono = g.pop('chrono', None)
+    if chrono is not None:
+        chrono.terminer(metriques)
+        if app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = chrono.server_timing()
+    return response
+
+@app.teardown_request
+def liberer_chronometre(exc):
+    # Exception non gérée : after_request n'a pas été appelé
+    chrono = g.pop('chrono', None)
+    if chrono is not None:
+        chrono.abandonner()
+
+# ==================== JOURNAL DES REQUÊTES ====================
+journal_requetes = JournalRequetes(
+    taux_succes=app.config['LOG_SUCCESS_SAMPLE'],
+    cle=app.config['LOG_HASH_KEY'],
+    erreurs_client=(ClientInvalide,),
+    payload_erreurs=app.config['LOG_ERROR_PAYLOAD']
+)
+ROUTES_JOURNALISEES = ('predict', 'predict_batch', 'pack')
+
+@app.before_request
+def debut_requete():
+    if request.endpoint in ROUTES_JOURNALISEES:
+        g.debut = time.perf_counter()
+
+@app.after_request
+def noter_statut(response):
+    g.statut = response.status_code
+    return response
+
+@app.teardown_request
+def journaliser_requete(exc):
+    # Appelé aussi après une exception non gérée (exc) et à la fin d'une réponse en flux
+    debut = g.pop('debut', None)
+    if debut is not None:
+        journal_requetes.requete(
+            request.endpoint, g.pop('statut', 500), debut,
+            payload=lambda: request.get_json(silent=True),
+            erreur=g.pop('erreur', None) or exc
+        )
+
+@app.route('/metrics')
+def metrics():
+    """Histogrammes des durées par route et par étape, format texte Prometheus"""
+    return Response(metriques.exposition(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/health/live')
+def health_live():
+    """Le processus répond (indépendamment du chargement des modèles)"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/health/ready')
+def health_ready():
+    """Prêt uniquement quand tous les artefacts sont chargés et validés"""
+    etat = registry.etat()
+    return jsonify(etat), (200 if etat['ready'] else 503)
+
+@app.route('/health/memory')
+def health_memory():
+    """RSS / USS du worker qui répond (pour vérifier le partage copy-on-write)"""
+    return jsonify(mesurer_memoire())
+
+@app.route('/stats/cache')
+def cache_stats():
+    """Statistiques des caches : jauges (temps de sérialisation économisé) et prédictions"""
+    return jsonify({
+        'gauge_cache': gauge_cache.stats(),
+        'prediction_cache': prediction_cache.stats() if prediction_cache is not None else None
+    })
+
 if __name__ == '__main__':
-    print("🚀 Application Flask démarrée")
-    print("📍 http://localhost:5000")
-    app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
\ No newline at end of file
+    # Serveur de développement, sans débogueur ; en production : python serve.py
+    logging.info("Application Flask démarrée sur http://localhost:5000")
+    app.run(debug=False, host='0.0.0.0', port=5000, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,272 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+
+import app2
+from metrics import Chronometre, marquer
+
+# =============================================================================
+# POINT D'ENTRÉE ASGI AVEC MICRO-BATCHING DE /predict
+# =============================================================================
+# uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+#
+# Les requêtes POST /predict concurrentes sont regroupées en lots bornés par
+# MICROBATCH_MAX_SIZE et MICROBATCH_MAX_WAIT_MS, scorés par un seul appel au
+# booster (app2.predire_frais_lot) dans un thread dédié, puis chaque requête
+# reçoit sa ligne. La réponse est construite par app2.reponse_prediction, comme
+# dans la route Flask. Toutes les autres routes sont servies par l'application
+# Flask via a2wsgi (WSGI dans un pool de threads).
+
+
+class MicroBatcher:
+    """File d'attente asyncio qui regroupe les clients en lots scorés en un appel"""
+
+    def __init__(self, scorer, taille_max=64, attente_max_ms=2.0):
+        self.scorer = scorer
+        self.taille_max = taille_max
+        self.attente_max = attente_max_ms / 1000
+
+        self._file = None
+        self._tache = None
+        # Un seul thread : les lots sont scorés l'un après l'autre, le suivant se remplit pendant ce temps
+        self._executeur = ThreadPoolExecutor(max_workers=1, thread_name_prefix='microbatch')
+
+        # Requêtes /predict en cours côté HTTP (tenu à jour par l'application ASGI) :
+        # inutile d'attendre l'échéance si toutes sont déjà dans le lot
+        self.en_cours = 0
+
+        self.lots = 0
+        self.requetes = 0
+        self.lots_pleins = 0
+        self._temps_scoring = 0.0
+
+    def demarrer(self):
+        """Lance la boucle de regroupement sur la boucle asyncio courante (idempotent)"""
+        if self._tache is None:
+            self._file = asyncio.Queue()
+            self._tache = asyncio.get_running_loop().create_task(self._boucle())
+
+    async def arreter(self):
+        if self._tache is not None:
+            self._tache.cancel()
+            try:
+                await self._tache
+            except asyncio.CancelledError:
+                pass
+            self._tache = None
+        self._executeur.shutdown(wait=False)
+
+    async def soumettre(self, client):
+        """Ajoute un client (age, bmi, children, sex, smoker, region) et attend ses frais"""
+        self.demarrer()
+        futur = asyncio.get_running_loop().create_future()
+        await self._file.put((client, futur))
+        return await futur
+
+    async def _collecter(self):
+        """Attend un premier client puis remplit le lot jusqu'à la taille ou l'échéance"""
+        loop = asyncio.get_running_loop()
+        lot = [await self._file.get()]
+        echeance = loop.time() + self.attente_max
+
+        while len(lot) < self.taille_max:
+            # Clients déjà en file : pris sans attendre
+            if not self._file.empty():
+                lot.append(self._file.get_nowait())
+                continue
+            restant = echeance - loop.time()
+            if restant <= 0 or len(lot) >= self.en_cours:
+                break
+            try:
+                lot.append(await asyncio.wait_for(self._file.get(), restant))
+            except asyncio.TimeoutError:
+                break
+        return lot
+
+    async def _boucle(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lot = await self._collecter()
+            colonnes = tuple(zip(*(client for client, _ in lot)))
+
+            debut = time.perf_counter()
+            try:
+                frais = await loop.run_in_executor(self._executeur, self.scorer, colonnes)
+            except Exception as e:
+                if len(lot) == 1:
+                    if not lot[0][1].done():
+                        lot[0][1].set_exception(e)
+                    continue
+                # Un client fautif ne doit pas faire échouer les autres : chacun est rescoré seul
+                await self._scorer_isolement(lot)
+                continue
+            self._temps_scoring += time.perf_counter() - debut
+
+            self.lots += 1
+            self.requetes += len(lot)
+            self.lots_pleins += len(lot) == self.taille_max
+            for (_, futur), frais_predits in zip(lot, frais):
+                # Le client a pu se déconnecter pendant le scoring
+                if not futur.done():
+                    futur.set_result(frais_predits)
+
+    async def _scorer_isolement(self, lot):
+        """Repli après l'échec d'un lot : un appel par client, l'erreur ne touche que le sien"""
+        loop = asyncio.get_running_loop()
+        for client, futur in lot:
+            try:
+                frais = await loop.run_in_executor(self._executeur, self.scorer, tuple((v,) for v in client))
+            except Exception as e:
+                if not futur.done():
+                    futur.set_exception(e)
+                continue
+            self.requetes += 1
+            if not futur.done():
+                futur.set_result(frais[0])
+
+    def stats(self):
+        return {
+            'lots': self.lots,
+            'requetes': self.requetes,
+            'taille_moyenne': round(self.requetes / self.lots, 2) if self.lots else 0.0,
+            'lots_pleins': self.lots_pleins,
+            'scoring_moyen_ms': round(self._temps_scoring / self.lots * 1000, 3) if self.lots else 0.0,
+            'taille_max': self.taille_max,
+            'attente_max_ms': self.attente_max * 1000,
+        }
+
+
+class ApplicationAsgi:
+    """POST /predict micro-batché, GET /stats/microbatch ; le reste est délégué à Flask"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=flask_app.config['ASGI_WSGI_THREADS'])
+        self.batcher = MicroBatcher(
+            app2.predire_frais_lot,
+            taille_max=flask_app.config['MICROBATCH_MAX_SIZE'],
+            attente_max_ms=flask_app.config['MICROBATCH_MAX_WAIT_MS']
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['path'] == '/predict' and scope['method'] == 'POST':
+            await self._predict(scope, receive, send)
+        elif scope['type'] == 'http' and scope['path'] == '/stats/microbatch':
+            await self._envoyer(send, self._serialiser(self.batcher.stats()))
+        else:
+            await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.batcher.demarrer()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.batcher.arreter()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def _lire_corps(receive):
+        morceaux = []
+        while True:
+            message = await receive()
+            morceaux.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(morceaux)
+
+    def _serialiser(self, corps):
+        """Même sérialisation que jsonify (fournisseur JSON de l'application Flask, json_codec.py)"""
+        return self.flask_app.json.response(corps).get_data()
+
+    @staticmethod
+    async def _envoyer(send, contenu, entetes=()):
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(contenu)).encode()), *entetes],
+        })
+        await send({'type': 'http.response.body', 'body': contenu})
+
+    async def _frais(self, client):
+        """Table de prix ou cache s'ils sont actifs, sinon le lot en cours de constitution"""
+        if app2.table_prix is not None:
+            frais = app2.table_prix.prix(*client)
+            if frais is not None:
+                return frais
+
+        cache = app2.prediction_cache
+        if cache is None:
+            return await self.batcher.soumettre(client)
+        cle = cache.canonique(*client)
+        if cle is None:
+            return await self.batcher.soumettre(client)
+        frais = cache.get(cle, app2.empreinte_modele)
+        if frais is None:
+            frais = await self.batcher.soumettre(cle)
+            cache.put(cle, frais, app2.empreinte_modele)
+        return frais
+
+    async def _predict(self, scope, receive, send):
+        """Équivalent de la route Flask /predict, même corps de réponse"""
+        debut = time.perf_counter()
+        chrono = Chronometre('predict') if self.flask_app.config['METRICS'] else None
+        self.batcher.en_cours += 1
+        try:
+            reponse, data, erreur = await self._traiter_predict(scope, receive)
+        except BaseException:
+            if chrono is not None:
+                chrono.abandonner()
+            raise
+        finally:
+            self.batcher.en_cours -= 1
+
+        entetes = []
+        contenu = self._serialiser(reponse)
+        marquer('jsonify')
+        if chrono is not None:
+            chrono.terminer(app2.metriques)
+            if self.flask_app.config['SERVER_TIMING']:
+                entetes.append((b'server-timing', chrono.server_timing().encode('latin-1')))
+        await self._envoyer(send, contenu, entetes)
+        app2.journal_requetes.requete('predict', 200, debut, payload=lambda: data, erreur=erreur)
+
+    async def _traiter_predict(self, scope, receive):
+        """Corps de réponse de /predict (succès ou erreur), payload décodé et erreur éventuelle"""
+        corps = await self._lire_corps(receive)
+        if not app2.registry.pret:
+            return {'success': False, 'error': "Système temporairement indisponible"}, None, None
+
+        data = None
+        try:
+            data = self.flask_app.json.loads(corps)
+            marquer('json')
+
+            try:
+                client = app2.valider_client(data)
+                marquer('validation')
+            except app2.ClientInvalide as e:
+                return {'success': False, 'error': str(e)}, data, e
+
+            # Attente du lot + scoring (le thread du lot n'hérite pas du chronomètre)
+            frais_predits = await self._frais(client)
+            marquer('microbatch')
+
+            parametres = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+            entetes = dict(scope.get('headers', []))
+            rendu = app2.choisir_rendu_jauge(
+                parametres.get('gauge', [None])[0], entetes.get(b'accept', b'').decode('latin-1')
+            )
+            return app2.reponse_prediction(client, frais_predits, rendu), data, None
+
+        except Exception as e:
+            return {'success': False, 'error': f"Erreur lors de l'analyse: {str(e)}"}, data, e
+
+app = ApplicationAsgi(app2.app)
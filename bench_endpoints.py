@@ -0,0 +1,331 @@
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+# =============================================================================
+# BENCHMARK DE CHARGE DES ROUTES FLASK (/predict, /pack, /)
+# =============================================================================
+# Deux modes :
+# - client  : app2 importé dans le processus, Flask test_client (un par thread) ;
+#             mesure le coût applicatif sans réseau.
+# - serveur : vrai serveur lancé par serve.py (ou --url existante), clients HTTP/1.1
+#             keep-alive en asyncio ; mesure réseau + serveur.
+# Les corps de requête sont tirés de dataAssurance.csv. Résultats en JSON, comparables
+# d'un commit à l'autre :
+#
+#   python bench_endpoints.py run --mode client --concurrence 1,8 -o bench.json
+#   python bench_endpoints.py run --mode serveur --workers 2 --asgi -o bench_asgi.json
+#   python bench_endpoints.py compare reference.json bench.json --tolerance 0.10
+
+ROUTES = {
+    'predict': ('POST', '/predict?gauge=client'),
+    'pack': ('POST', '/pack'),
+    'index': ('GET', '/'),
+}
+
+
+def charger_clients(chemin='dataAssurance.csv'):
+    """Clients complets du jeu de données, au format attendu par /predict et /pack"""
+    clients = []
+    with open(chemin, newline='', encoding='utf-8') as f:
+        for ligne in csv.DictReader(f):
+            # Lignes incomplètes ignorées (valeurs manquantes du jeu de données)
+            if not all(ligne.get(champ) for champ in ('sex', 'smoker', 'region')):
+                continue
+            try:
+                clients.append({
+                    'age': int(float(ligne['age'])),
+                    'bmi': float(ligne['bmi']),
+                    'children': int(float(ligne['children'])),
+                    'sex': ligne['sex'],
+                    'smoker': ligne['smoker'],
+                    'region': ligne['region'],
+                })
+            except (KeyError, ValueError):
+                continue
+    return clients
+
+
+def resumer(latences, erreurs, duree, endpoint, mode, concurrence):
+    """Débit et percentiles (ms) d'un palier"""
+    latences = sorted(latences)
+    n = len(latences)
+
+    def centile(p):
+        return round(latences[min(n - 1, int(p * n))] * 1000, 3) if n else None
+
+    return {
+        'endpoint': endpoint,
+        'mode': mode,
+        'concurrence': concurrence,
+        'requetes': n,
+        'erreurs': erreurs,
+        'duree_s': round(duree, 3),
+        'debit_rps': round(n / duree, 1) if duree else 0.0,
+        'p50_ms': centile(0.50),
+        'p95_ms': centile(0.95),
+        'p99_ms': centile(0.99),
+        'max_ms': round(latences[-1] * 1000, 3) if n else None,
+        'moyenne_ms': round(statistics.fmean(latences) * 1000, 3) if n else None,
+    }
+
+
+# ==================== MODE CLIENT (in-process) ====================
+
+def palier_client(app, endpoint, clients, concurrence, duree, graine):
+    methode, chemin = ROUTES[endpoint]
+    latences, erreurs = [], [0]
+    verrou = threading.Lock()
+    fin = time.perf_counter() + duree
+
+    def travailleur(i):
+        rng = random.Random(graine + i)
+        test_client = app.test_client()
+        locales, ko = [], 0
+        while time.perf_counter() < fin:
+            corps = rng.choice(clients)
+            debut = time.perf_counter()
+            if methode == 'POST':
+                reponse = test_client.post(chemin, json=corps)
+            else:
+                reponse = test_client.get(chemin)
+            locales.append(time.perf_counter() - debut)
+            if reponse.status_code != 200 or (methode == 'POST' and not reponse.get_json().get('success')):
+                ko += 1
+        with verrou:
+            latences.extend(locales)
+            erreurs[0] += ko
+
+    debut = time.perf_counter()
+    threads = [threading.Thread(target=travailleur, args=(i,)) for i in range(concurrence)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return resumer(latences, erreurs[0], time.perf_counter() - debut, endpoint, 'client', concurrence)
+
+
+# ==================== MODE SERVEUR (HTTP réel) ====================
+
+async def _connexion_http(hote, port, endpoint, clients, fin, rng, latences, erreurs):
+    methode, chemin = ROUTES[endpoint]
+    lecteur, ecrivain = await asyncio.open_connection(hote, port)
+    try:
+        while time.perf_counter() < fin:
+            corps = json.dumps(rng.choice(clients)).encode() if methode == 'POST' else b''
+            requete = (
+                f"{methode} {chemin} HTTP/1.1\r\nHost: {hote}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(corps)}\r\n\r\n"
+            ).encode() + corps
+
+            debut = time.perf_counter()
+            ecrivain.write(requete)
+            await ecrivain.drain()
+            entete = await lecteur.readuntil(b"\r\n\r\n")
+            champs = {}
+            for ligne in entete.split(b"\r\n")[1:]:
+                if b":" in ligne:
+                    nom, valeur = ligne.split(b":", 1)
+                    champs[nom.strip().lower()] = valeur.strip()
+            longueur = champs.get(b'content-length')
+            contenu = await lecteur.readexactly(int(longueur)) if longueur is not None else b''
+            latences.append(time.perf_counter() - debut)
+
+            if not entete.startswith(b"HTTP/1.1 200") or (methode == 'POST' and b'"success":true' not in contenu):
+                erreurs[0] += 1
+            # Réponse sans longueur (erreur en chunked) ou fermeture annoncée : nouvelle connexion
+            if longueur is None or champs.get(b'connection', b'').lower() == b'close':
+                ecrivain.close()
+                lecteur, ecrivain = await asyncio.open_connection(hote, port)
+    finally:
+        ecrivain.close()
+
+
+def palier_serveur(hote, port, endpoint, clients, concurrence, duree, graine):
+    latences, erreurs = [], [0]
+
+    async def lancer():
+        fin = time.perf_counter() + duree
+        await asyncio.gather(*(
+            _connexion_http(hote, port, endpoint, clients, fin, random.Random(graine + i), latences, erreurs)
+            for i in range(concurrence)
+        ))
+
+    debut = time.perf_counter()
+    asyncio.run(lancer())
+    return resumer(latences, erreurs[0], time.perf_counter() - debut, endpoint, 'serveur', concurrence)
+
+
+def demarrer_serveur(port, workers, threads, asgi):
+    """Lance serve.py dans son propre groupe de processus et attend /health/ready"""
+    commande = [sys.executable, 'serve.py', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+                '--threads', str(threads), '--log-level', 'warning']
+    if asgi:
+        commande.append('--asgi')
+    processus = subprocess.Popen(commande, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                 start_new_session=True)
+    limite = time.time() + 120
+    while time.time() < limite:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/health/ready', timeout=1) as r:
+                if r.status == 200:
+                    return processus
+        except OSError:
+            pass
+        if processus.poll() is not None:
+            raise RuntimeError("Le serveur s'est arrêté au démarrage")
+        time.sleep(0.5)
+    arreter_serveur(processus)
+    raise RuntimeError("Serveur non prêt après 120 s")
+
+
+def arreter_serveur(processus):
+    try:
+        os.killpg(processus.pid, signal.SIGTERM)
+        processus.wait(timeout=30)
+    except (ProcessLookupError, subprocess.TimeoutExpired):
+        os.killpg(processus.pid, signal.SIGKILL)
+
+
+# ==================== EXÉCUTION / COMPARAISON ====================
+
+def commit_courant():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executer(args):
+    clients = charger_clients(args.donnees)
+    endpoints = args.endpoints.split(',')
+    concurrences = [int(c) for c in args.concurrence.split(',')]
+    resultats = []
+
+    processus = None
+    if args.mode == 'client':
+        import app2
+        app2.registry.attendre()
+        palier = lambda e, c, d: palier_client(app2.app, e, clients, c, d, args.graine)
+    else:
+        if args.url:
+            hote, _, port = args.url.replace('http://', '').rstrip('/').partition(':')
+            port = int(port or 80)
+        else:
+            hote, port = '127.0.0.1', args.port
+            processus = demarrer_serveur(port, args.workers, args.threads, args.asgi)
+        palier = lambda e, c, d: palier_serveur(hote, port, e, clients, c, d, args.graine)
+
+    try:
+        for endpoint in endpoints:
+            for concurrence in concurrences:
+                if args.echauffement:
+                    palier(endpoint, concurrence, args.echauffement)
+                r = palier(endpoint, concurrence, args.duree)
+                resultats.append(r)
+                print(f"{endpoint:>8} {args.mode:<8} c={concurrence:<4} {r['debit_rps']:>9} req/s  "
+                      f"p50 {r['p50_ms']} ms  p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  erreurs {r['erreurs']}")
+    finally:
+        if processus is not None:
+            arreter_serveur(processus)
+
+    rapport = {
+        'meta': {
+            'commit': commit_courant(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'cpu': os.cpu_count(),
+            'mode': args.mode,
+            'serveur': None if args.mode == 'client' else {
+                'url': args.url, 'workers': args.workers, 'threads': args.threads, 'asgi': args.asgi
+            },
+            'duree_s': args.duree,
+            'clients_csv': len(clients),
+        },
+        'resultats': resultats,
+    }
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as f:
+            json.dump(rapport, f, indent=2)
+        print(f"✅ Résultats: {args.sortie}")
+    return rapport
+
+
+def comparer(reference, candidat, tolerance, tolerance_p99):
+    """
+    Régressions du candidat sur un même (endpoint, mode, concurrence) : débit en baisse
+    de plus de `tolerance`, p99 en hausse de plus de `tolerance_p99` (fractions), ou
+    davantage d'erreurs. Le p99 est plus bruité que le débit, d'où sa tolérance propre.
+    """
+    index = {(r['endpoint'], r['mode'], r['concurrence']): r for r in reference['resultats']}
+    lignes, regressions = [], []
+    for r in candidat['resultats']:
+        ref = index.get((r['endpoint'], r['mode'], r['concurrence']))
+        if ref is None:
+            continue
+        delta_debit = (r['debit_rps'] - ref['debit_rps']) / ref['debit_rps'] if ref['debit_rps'] else 0.0
+        delta_p99 = (r['p99_ms'] - ref['p99_ms']) / ref['p99_ms'] if ref['p99_ms'] else 0.0
+        regression = delta_debit < -tolerance or delta_p99 > tolerance_p99 or r['erreurs'] > ref['erreurs']
+        lignes.append((r, delta_debit, delta_p99, regression))
+        if regression:
+            regressions.append(r)
+    return lignes, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de charge de /predict, /pack et /")
+    sous = parser.add_subparsers(dest='commande', required=True)
+
+    run = sous.add_parser('run', help="exécute le benchmark")
+    run.add_argument('--mode', choices=('client', 'serveur'), default='client')
+    run.add_argument('--endpoints', default='predict,pack,index')
+    run.add_argument('--concurrence', default='1,8', help="paliers séparés par des virgules")
+    run.add_argument('--duree', type=float, default=5.0, help="secondes par palier")
+    run.add_argument('--echauffement', type=float, default=1.0, help="secondes avant chaque palier")
+    run.add_argument('--donnees', default='dataAssurance.csv')
+    run.add_argument('--graine', type=int, default=0)
+    run.add_argument('--url', help="serveur déjà lancé (mode serveur), ex. http://127.0.0.1:5000")
+    run.add_argument('--port', type=int, default=8099)
+    run.add_argument('--workers', type=int, default=1)
+    run.add_argument('--threads', type=int, default=2)
+    run.add_argument('--asgi', action='store_true')
+    run.add_argument('-o', '--sortie', help="fichier JSON des résultats")
+
+    cmp = sous.add_parser('compare', help="compare deux fichiers de résultats (porte de régression)")
+    cmp.add_argument('reference')
+    cmp.add_argument('candidat')
+    cmp.add_argument('--tolerance', type=float, default=0.10, help="baisse de débit tolérée")
+    cmp.add_argument('--tolerance-p99', type=float, default=0.25, help="hausse de p99 tolérée")
+
+    args = parser.parse_args()
+    if args.commande == 'run':
+        executer(args)
+    else:
+        with open(args.reference, encoding='utf-8') as f:
+            reference = json.load(f)
+        with open(args.candidat, encoding='utf-8') as f:
+            candidat = json.load(f)
+        lignes, regressions = comparer(reference, candidat, args.tolerance, args.tolerance_p99)
+        print(f"référence {reference['meta']['commit']} -> candidat {candidat['meta']['commit']} "
+              f"(tolérance débit {args.tolerance:.0%}, p99 {args.tolerance_p99:.0%})")
+        if not lignes:
+            raise SystemExit("❌ Aucun palier commun entre les deux fichiers (mode, endpoints, concurrence)")
+        for r, delta_debit, delta_p99, regression in lignes:
+            print(f"{'❌' if regression else '✅'} {r['endpoint']:>8} {r['mode']:<8} c={r['concurrence']:<4} "
+                  f"débit {delta_debit:+.1%}  p99 {delta_p99:+.1%}")
+        if regressions:
+            raise SystemExit(f"❌ {len(regressions)} régression(s) de performance")
+        print("✅ Aucune régression")
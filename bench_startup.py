@@ -0,0 +1,62 @@
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# =============================================================================
+# BENCHMARK DU DÉMARRAGE : PICKLE (joblib) VS FORMATS NATIFS (UBJSON + NumPy)
+# =============================================================================
+# Chaque mesure tourne dans un processus neuf. L'import de xgboost (qui importe
+# lui-même scikit-learn s'il est installé) est mesuré à part, commun aux deux chemins.
+
+CODE_MESURE = r'''
+import json, resource, sys, time, warnings
+warnings.filterwarnings('ignore')
+debut = time.perf_counter()
+import xgboost
+import_xgb = (time.perf_counter() - debut) * 1000
+from model_registry import ModelRegistry, artefacts_a_charger
+registry = ModelRegistry('models', artefacts_a_charger('models', sys.argv[1]))
+registry.charger()
+if registry.erreur is not None:
+    raise registry.erreur
+duree = (time.perf_counter() - debut) * 1000
+print(json.dumps({
+    'total_ms': duree,
+    'import_xgboost_ms': import_xgb,
+    'chargement_ms': registry.duree_totale,
+    'booster_ms': registry.durees['modele_final'],
+    'rss_max_mo': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+'''
+
+
+def mesurer(format_modeles, repetitions):
+    mesures = []
+    for _ in range(repetitions):
+        sortie = subprocess.run(
+            [sys.executable, '-c', CODE_MESURE, format_modeles],
+            capture_output=True, text=True, check=True
+        )
+        mesures.append(json.loads(sortie.stdout.strip().splitlines()[-1]))
+    return mesures
+
+
+def resumer(mesures):
+    cles = ('total_ms', 'import_xgboost_ms', 'chargement_ms', 'booster_ms', 'rss_max_mo')
+    return {cle: round(statistics.median(m[cle] for m in mesures), 1) for cle in cles}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare le démarrage pickle vs natif")
+    parser.add_argument('--repetitions', type=int, default=5)
+    args = parser.parse_args()
+
+    resultats = {f: resumer(mesurer(f, args.repetitions)) for f in ('pickle', 'native')}
+
+    print(f"{'format':<8} {'total':>8} {'import xgb':>11} {'chargement':>11} {'booster':>8} "
+          f"{'RSS max':>8}  (médianes, ms / Mo)")
+    for format_modeles, r in resultats.items():
+        print(f"{format_modeles:<8} {r['total_ms']:>8} {r['import_xgboost_ms']:>11} {r['chargement_ms']:>11} "
+              f"{r['booster_ms']:>8} {r['rss_max_mo']:>8}")
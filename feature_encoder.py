@@ -0,0 +1,217 @@
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+# =============================================================================
+# ENCODEUR DE FEATURES COMPILÉ (remplace la construction d'un DataFrame pandas)
+# =============================================================================
+
+# Colonnes numériques puis groupes one-hot, dans l'ordre de X_transformed
+COLONNES_NUMERIQUES = ['age', 'bmi', 'children']
+GROUPES_CATEGORIELS = ['sex', 'smoker', 'region']
+
+# Vocabulaires par défaut (identiques aux colonnes one-hot de X_transformed)
+VOCABULAIRES_PAR_DEFAUT = {
+    'sex': ['female', 'male'],
+    'smoker': ['no', 'yes'],
+    'region': ['northeast', 'northwest', 'southeast', 'southwest'],
+}
+
+# Version du format de models/feature_schema.json
+VERSION_SCHEMA = 1
+FICHIER_SCHEMA = 'models/feature_schema.json'
+
+
+class SchemaIncompatible(RuntimeError):
+    """Le schéma de features ne correspond pas au modèle chargé"""
+
+
+# =============================================================================
+# SCHÉMA DE FEATURES (contrat entraînement / service)
+# =============================================================================
+
+def hash_colonnes(colonnes):
+    """Empreinte SHA-256 de l'ordre des colonnes (comparée aux feature_names du booster)"""
+    return hashlib.sha256('\n'.join(colonnes).encode('utf-8')).hexdigest()
+
+def construire_schema(scaler, colonnes):
+    """
+    Construit le schéma à partir du MinMaxScaler entraîné et des colonnes de X_transformed :
+    ordre des colonnes, dtypes, min/max du scaler et vocabulaires des catégories.
+    """
+    colonnes = [str(c) for c in colonnes]
+    noms_scaler = list(getattr(scaler, 'feature_names_in_', COLONNES_NUMERIQUES))
+
+    numeriques = {}
+    for i, nom in enumerate(noms_scaler):
+        numeriques[str(nom)] = {
+            'min': float(scaler.data_min_[i]),
+            'max': float(scaler.data_max_[i]),
+            'scale': float(scaler.scale_[i]),
+            'offset': float(scaler.min_[i]),
+        }
+
+    vocabulaires = {}
+    for groupe in GROUPES_CATEGORIELS:
+        prefixe = f"{groupe}_"
+        vocabulaires[groupe] = [c[len(prefixe):] for c in colonnes if c.startswith(prefixe)]
+
+    return {
+        'version': VERSION_SCHEMA,
+        'colonnes': colonnes,
+        'dtypes': {c: 'float32' for c in colonnes},
+        'numeriques': numeriques,
+        'vocabulaires': vocabulaires,
+        'hash': hash_colonnes(colonnes),
+    }
+
+def sauvegarder_schema(schema, chemin=FICHIER_SCHEMA):
+    """Écrit le schéma à côté des fichiers .pkl"""
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump(schema, f, ensure_ascii=False, indent=2)
+
+def charger_schema(chemin=FICHIER_SCHEMA):
+    """Charge le schéma et vérifie sa version et son hash"""
+    with open(chemin, encoding='utf-8') as f:
+        schema = json.load(f)
+
+    if schema.get('version') != VERSION_SCHEMA:
+        raise SchemaIncompatible(f"Version de schéma non supportée: {schema.get('version')}")
+    if schema['hash'] != hash_colonnes(schema['colonnes']):
+        raise SchemaIncompatible("Hash du schéma corrompu")
+    return schema
+
+def verifier_schema_modele(schema, booster):
+    """Échoue immédiatement si les colonnes du schéma diffèrent des feature_names du booster"""
+    noms = booster.feature_names or []
+    if hash_colonnes(noms) != schema['hash']:
+        raise SchemaIncompatible(
+            f"Schéma de features incompatible avec le modèle: {schema['colonnes']} != {noms}"
+        )
+
+
+class FeatureEncoder:
+    """
+    Encodeur compilé une seule fois à partir des listes de catégories.
+    Écrit directement dans un buffer float32 préalloué, colonnes dans un ordre fixe.
+    Si une mise à l'échelle est fournie, les colonnes numériques sont transformées
+    comme par le MinMaxScaler de l'entraînement (X * scale + offset, en float64).
+    """
+
+    def __init__(self, vocabulaires=None, mise_a_echelle=None):
+        vocabulaires = vocabulaires or VOCABULAIRES_PAR_DEFAUT
+
+        self.colonnes = list(COLONNES_NUMERIQUES)
+        # Pour chaque groupe : {catégorie: indice de colonne}
+        self.index_categories = {}
+        for groupe in GROUPES_CATEGORIELS:
+            index = {}
+            for categorie in vocabulaires[groupe]:
+                index[categorie] = len(self.colonnes)
+                self.colonnes.append(f"{groupe}_{categorie}")
+            self.index_categories[groupe] = index
+
+        self.n_colonnes = len(self.colonnes)
+        self._debut_one_hot = len(COLONNES_NUMERIQUES)
+
+        # Sans mise à l'échelle : identité (valeurs brutes)
+        scale = [1.0] * len(COLONNES_NUMERIQUES)
+        offset = [0.0] * len(COLONNES_NUMERIQUES)
+        if mise_a_echelle:
+            for i, nom in enumerate(COLONNES_NUMERIQUES):
+                scale[i], offset[i] = mise_a_echelle[nom]
+        self._scale = np.array(scale, dtype=np.float64)
+        self._offset = np.array(offset, dtype=np.float64)
+
+        self._local = threading.local()
+
+    @classmethod
+    def depuis_schema(cls, schema):
+        """Construit l'encodeur (catégories + mise à l'échelle) à partir du schéma de features"""
+        mise_a_echelle = {
+            nom: (params['scale'], params['offset'])
+            for nom, params in schema['numeriques'].items()
+        }
+        encodeur = cls(schema['vocabulaires'], mise_a_echelle)
+        if encodeur.colonnes != schema['colonnes']:
+            raise SchemaIncompatible(
+                f"Ordre des colonnes inattendu dans le schéma: {schema['colonnes']}"
+            )
+        return encodeur
+
+    def _echelle(self, brut):
+        """Transformation MinMax vectorisée, en place, sur une matrice float64 (n, 3)"""
+        np.multiply(brut, self._scale, out=brut)
+        np.add(brut, self._offset, out=brut)
+        return brut
+
+    def _buffers_ligne(self):
+        """Buffers (1, n_colonnes) et (1, 3) propres à chaque thread, alloués une seule fois"""
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = (
+                np.zeros((1, self.n_colonnes), dtype=np.float32),
+                np.zeros((1, len(COLONNES_NUMERIQUES)), dtype=np.float64),
+            )
+            self._local.buffers = buffers
+        return buffers
+
+    def encode(self, age, bmi, children, sex, smoker, region, out=None):
+        """
+        Encode un client dans `out` (ou dans le buffer du thread courant).
+        Le buffer est réutilisé à l'appel suivant : le consommer avant de ré-encoder.
+        """
+        buffer, brut = self._buffers_ligne()
+        if out is None:
+            out = buffer
+        ligne = out[0]
+
+        brut[0, 0] = age
+        brut[0, 1] = bmi
+        brut[0, 2] = children
+        ligne[:self._debut_one_hot] = self._echelle(brut)[0]
+        ligne[self._debut_one_hot:] = 0
+
+        # Une catégorie inconnue laisse son groupe à zéro, comme l'ancien encodage manuel
+        for groupe, valeur in (('sex', sex), ('smoker', smoker), ('region', region)):
+            colonne = self.index_categories[groupe].get(valeur)
+            if colonne is not None:
+                ligne[colonne] = 1
+
+        return out
+
+    def encode_batch(self, ages, bmis, children, sexes, smokers, regions, out=None):
+        """Encode un lot de clients colonne par colonne dans une matrice (n, n_colonnes)"""
+        n = len(ages)
+        if out is None:
+            out = np.empty((n, self.n_colonnes), dtype=np.float32)
+        else:
+            out = out[:n]
+        if n == 0:
+            return out
+
+        brut = np.empty((n, len(COLONNES_NUMERIQUES)), dtype=np.float64)
+        brut[:, 0] = ages
+        brut[:, 1] = bmis
+        brut[:, 2] = children
+        out[:, :self._debut_one_hot] = self._echelle(brut)
+
+        for groupe, valeurs in (('sex', sexes), ('smoker', smokers), ('region', regions)):
+            valeurs = np.asarray(valeurs, dtype=object)
+            for categorie, colonne in self.index_categories[groupe].items():
+                out[:, colonne] = valeurs == categorie
+
+        return out
+
+
+if __name__ == '__main__':
+    # Génère models/feature_schema.json à partir des artefacts .pkl existants
+    import joblib
+
+    scaler = joblib.load('models/scaler.pkl')
+    modele_final = joblib.load('models/modele_final.pkl')
+    schema = construire_schema(scaler, modele_final.feature_names)
+    sauvegarder_schema(schema)
+    print(f"✅ Schéma sauvegardé: {FICHIER_SCHEMA} ({schema['hash'][:12]})")
@@ -0,0 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
+# =============================================================================
+# CACHE DES FIGURES PLOTLY PRÉ-SÉRIALISÉES
+# =============================================================================
+
+
+class FigureCache:
+    """
+    Cache des figures déjà sérialisées en JSON, indexé par les paramètres de la figure.
+    Les entrées préchauffées au démarrage sont permanentes ; les autres passent par
+    un LRU borné. Le temps de sérialisation évité est comptabilisé.
+    """
+
+    def __init__(self, construire, taille_max=64):
+        self.construire = construire
+        self.taille_max = taille_max
+
+        self._permanentes = {}
+        self._lru = OrderedDict()
+        self._verrou = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self._temps_construction = 0.0
+        self._nb_constructions = 0
+        self._temps_economise = 0.0
+
+    def _construire(self, cle):
+        """Construit et sérialise la figure en mesurant le coût"""
+        debut = time.perf_counter()
+        figure_json = self.construire(*cle)
+        duree = time.perf_counter() - debut
+
+        with self._verrou:
+            self._temps_construction += duree
+            self._nb_constructions += 1
+        return figure_json
+
+    def _cout_moyen(self):
+        if self._nb_constructions == 0:
+            return 0.0
+        return self._temps_construction / self._nb_constructions
+
+    def prechauffer(self, cles):
+        """Construit les figures connues au démarrage (jamais évincées)"""
+        for cle in cles:
+            cle = tuple(cle)
+            if cle not in self._permanentes:
+                self._permanentes[cle] = self._construire(cle)
+
+    def get(self, *cle):
+        """Retourne la chaîne JSON finale de la figure, construite au plus une fois"""
+        figure_json = self._permanentes.get(cle)
+        if figure_json is None:
+            with self._verrou:
+                figure_json = self._lru.get(cle)
+                if figure_json is not None:
+                    self._lru.move_to_end(cle)
+
+        if figure_json is not None:
+            with self._verrou:
+                self.hits += 1
+                self._temps_economise += self._cout_moyen()
+            return figure_json
+
+        figure_json = self._construire(cle)
+        with self._verrou:
+            self.misses += 1
+            self._lru[cle] = figure_json
+            self._lru.move_to_end(cle)
+            while len(self._lru) > self.taille_max:
+                self._lru.popitem(last=False)
+        return figure_json
+
+    def stats(self):
+        """Compteurs du cache, dont le temps de sérialisation économisé"""
+        with self._verrou:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entrees_permanentes': len(self._permanentes),
+                'entrees_lru': len(self._lru),
+                'taille_max_lru': self.taille_max,
+                'cout_moyen_ms': round(self._cout_moyen() * 1000, 3),
+                'temps_economise_ms': round(self._temps_economise * 1000, 3),
+            }
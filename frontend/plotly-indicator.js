@@ -0,0 +1,9 @@
+// Cœur de Plotly + la seule trace utilisée par la page : indicator (jauge).
+// Même version que le plotly.min.js embarqué par le paquet Python plotly.
+var Plotly = require('plotly.js/lib/core');
+
+Plotly.register([
+    require('plotly.js/lib/indicator')
+]);
+
+module.exports = Plotly;
@@ -0,0 +1,48 @@
+import gc
+import logging
+import os
+
+# =============================================================================
+# CONFIGURATION GUNICORN : MODÈLES CHARGÉS UNE FOIS DANS LE MAÎTRE
+# =============================================================================
+# gunicorn -c gunicorn.conf.py app2:app
+#
+# - preload_app : app2 est importé dans le maître, qui charge les modèles une seule
+#   fois ; les workers les héritent par fork (pages partagées en copy-on-write).
+# - Le GC est désactivé pendant le chargement puis gc.freeze() déplace tous les objets
+#   existants dans une génération permanente : le GC des workers ne réécrit plus leurs
+#   en-têtes, ce qui évite de dupliquer les pages héritées.
+# - Les tableaux d'arbres de models/partage/ sont mappés en lecture seule (mmap).
+# - GET /health/memory renvoie RSS / USS du worker qui répond.
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WORKERS', 4))
+threads = int(os.environ.get('THREADS', 1))
+# gthread même avec un seul thread : le worker sync ignore keepalive
+worker_class = 'gthread'
+keepalive = int(os.environ.get('KEEPALIVE', 5))
+# PRELOAD=0 : chaque worker charge ses propres copies (utile pour comparer la mémoire)
+preload_app = os.environ.get('PRELOAD', '1') == '1'
+
+
+# Ce fichier est exécuté avant Arbiter.setup(), qui importe app2 quand preload_app est
+# actif (on_starting arrive après) : pas de collecte pendant le chargement des modèles,
+# les objets ne bougent pas avant le freeze
+if preload_app:
+    gc.disable()
+
+
+def when_ready(server):
+    if not server.cfg.preload_app:
+        return
+    import app2
+
+    # Les workers ne doivent pas être forkés avant la fin du chargement des modèles
+    app2.registry.attendre()
+    gc.freeze()
+    gc.enable()
+    logging.info("Modèles partagés entre workers : %s objets gelés", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    gc.enable()
@@ -0,0 +1,211 @@
+import argparse
+import json
+import math
+import time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# =============================================================================
+# CODEC JSON DE L'APPLICATION (orjson si disponible, sinon bibliothèque standard)
+# =============================================================================
+# app.json = FournisseurJson(app) : jsonify, request.json / get_json et le
+# point d'entrée ASGI (app.json.response) passent tous par ce fournisseur.
+# JSON_CODEC=auto|orjson|stdlib ; même sortie que le fournisseur par défaut de
+# Flask (clés triées, séparateurs compacts), au codage des non-ASCII près (UTF-8
+# brut avec orjson, échappements \uXXXX avec la bibliothèque standard).
+#
+# Flottants non finis (NaN, ±inf) : null avec les deux codecs, comme orjson (le
+# NaN de la bibliothèque standard n'est pas du JSON valide).
+#
+# FragmentJson marque un texte déjà sérialisé (figure Plotly du cache de jauges)
+# à insérer tel quel dans le document au lieu d'être ré-échappé comme chaîne.
+#
+#   python json_codec.py      # coût encodage / décodage par route, stdlib vs orjson
+
+
+class FragmentJson:
+    """Texte JSON déjà sérialisé, inséré tel quel par le fournisseur"""
+
+    __slots__ = ('json',)
+
+    def __init__(self, texte):
+        self.json = texte
+
+    def __repr__(self):
+        return f'FragmentJson({self.json[:40]!r}...)'
+
+
+def _marque_fragment(i):
+    # Chaîne qu'aucune donnée réelle ne contient (octets NUL), échappée à l'identique par les deux codecs
+    return f'\x00fragment{i}\x00'
+
+
+def _marque_echappee(i):
+    return f'"\\u0000fragment{i}\\u0000"'
+
+
+def orjson_fragments_natifs():
+    """orjson >= 3.9 insère les fragments lui-même (orjson.Fragment)"""
+    return orjson is not None and hasattr(orjson, 'Fragment')
+
+
+def _sans_non_finis(obj):
+    """Copie de obj où les flottants non finis deviennent None (null)"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {cle: _sans_non_finis(valeur) for cle, valeur in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_sans_non_finis(valeur) for valeur in obj]
+    return obj
+
+
+class FournisseurJson(DefaultJSONProvider):
+    """Fournisseur JSON Flask : orjson quand il est disponible, repli sur la bibliothèque standard"""
+
+    def __init__(self, app, codec='auto'):
+        super().__init__(app)
+        if codec == 'orjson' and orjson is None:
+            raise ImportError("JSON_CODEC=orjson mais orjson n'est pas installé")
+        self.codec = 'orjson' if codec in ('auto', 'orjson') and orjson is not None else 'stdlib'
+        self._fragments_natifs = self.codec == 'orjson' and orjson_fragments_natifs()
+
+    # ---------------------------------------------------------------- encodage
+    def _encoder_orjson(self, obj, indent=None):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+
+        fragments = []
+
+        def defaut(o):
+            if isinstance(o, FragmentJson):
+                if self._fragments_natifs:
+                    return orjson.Fragment(o.json)
+                fragments.append(o.json)
+                return _marque_fragment(len(fragments) - 1)
+            # Dates, Decimal, UUID, dataclasses... : mêmes règles que Flask
+            return self.default(o)
+
+        sortie = orjson.dumps(obj, default=defaut, option=options)
+        for i, fragment in enumerate(fragments):
+            sortie = sortie.replace(_marque_echappee(i).encode('ascii'), fragment.encode('utf-8'), 1)
+        return sortie
+
+    def _encoder_stdlib(self, obj, **kwargs):
+        fragments = []
+
+        def defaut(o):
+            if isinstance(o, FragmentJson):
+                fragments.append(o.json)
+                return _marque_fragment(len(fragments) - 1)
+            return self.default(o)
+
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        try:
+            sortie = json.dumps(obj, default=defaut, allow_nan=False, **kwargs)
+        except ValueError:
+            # NaN / inf : null comme orjson (copie seulement dans ce cas)
+            fragments.clear()
+            sortie = json.dumps(_sans_non_finis(obj), default=defaut, allow_nan=False, **kwargs)
+        for i, fragment in enumerate(fragments):
+            sortie = sortie.replace(_marque_echappee(i), fragment, 1)
+        return sortie
+
+    def dumps(self, obj, **kwargs):
+        if self.codec == 'orjson' and set(kwargs) <= {'indent', 'separators'}:
+            return self._encoder_orjson(obj, kwargs.get('indent')).decode('utf-8')
+        return self._encoder_stdlib(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Comme jsonify ; avec orjson, le corps est construit directement en octets"""
+        if self.codec != 'orjson':
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encoder_orjson(obj, indent) + b'\n', mimetype=self.mimetype)
+
+    # ---------------------------------------------------------------- décodage
+    def loads(self, s, **kwargs):
+        if self.codec == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
+# =============================================================================
+# MICRO-BENCHMARK PAR ROUTE
+# =============================================================================
+
+def mesurer(fonction, repetitions):
+    """Durée médiane d'un appel (µs) sur 5 séries"""
+    series = []
+    for _ in range(5):
+        debut = time.perf_counter()
+        for _ in range(repetitions):
+            fonction()
+        series.append((time.perf_counter() - debut) / repetitions * 1e6)
+    return sorted(series)[2]
+
+
+def documents_par_route():
+    """Corps de requête et de réponse représentatifs, construits avec le code de l'application"""
+    import app2
+
+    app2.registry.attendre()
+    client = {'age': 45, 'bmi': 31.2, 'children': 2, 'sex': 'female', 'smoker': 'yes', 'region': 'northwest'}
+    valide = app2.valider_client(client)
+    frais = app2.predire_frais(*valide)
+    lot = [dict(client, age=18 + i % 80) for i in range(1000)]
+    resultats, erreurs = app2.scorer_paquet(list(enumerate(lot)))
+
+    reponse_serveur = app2.reponse_prediction(valide, frais, 'server')
+    # Ancien format : figure embarquée comme chaîne JSON (échappée une seconde fois)
+    reponse_chaine = dict(reponse_serveur, graph_json=reponse_serveur['graph_json'].json)
+    return app2.app, {
+        'predict (jauge serveur, chaîne)': (client, reponse_chaine),
+        'predict (jauge serveur, fragment)': (client, reponse_serveur),
+        'predict (jauge client)': (client, app2.reponse_prediction(valide, frais, 'client')),
+        'pack': (client, {'success': True, 'pack_data': dict(app2.pack_engine.lookup_pack(45, 31.2, 2, 'yes'))}),
+        'predict/batch (1000 lignes)': (lot, {'success': True, 'count': len(lot), 'results': resultats,
+                                              'errors': erreurs}),
+    }
+
+
+def benchmark(repetitions=2000):
+    app, documents = documents_par_route()
+    codecs = ['stdlib'] + (['orjson'] if orjson is not None else [])
+    fournisseurs = {codec: FournisseurJson(app, codec) for codec in codecs}
+
+    lignes = []
+    with app.app_context():
+        for route, (requete, reponse) in documents.items():
+            n = max(20, repetitions // (100 if isinstance(requete, list) else 1))
+            corps_requete = json.dumps(requete).encode('utf-8')
+            mesures = {'route': route, 'octets_reponse': len(fournisseurs['stdlib'].response(reponse).get_data())}
+            for codec, fournisseur in fournisseurs.items():
+                mesures[f'decodage_{codec}_us'] = round(mesurer(lambda: fournisseur.loads(corps_requete), n), 2)
+                mesures[f'encodage_{codec}_us'] = round(mesurer(lambda: fournisseur.response(reponse), n), 2)
+            lignes.append(mesures)
+    return lignes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Coût encodage / décodage JSON par route")
+    parser.add_argument('--repetitions', type=int, default=2000)
+    args = parser.parse_args()
+
+    # app2 importe le module json_codec : ses FragmentJson ne sont pas ceux de __main__
+    from json_codec import benchmark, orjson_fragments_natifs
+
+    print(f"orjson: {orjson.__version__ if orjson is not None else 'absent'}"
+          f" (fragments natifs: {orjson_fragments_natifs()})")
+    for mesures in benchmark(args.repetitions):
+        print(mesures)
@@ -0,0 +1,142 @@
+import contextvars
+import threading
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+# =============================================================================
+# CHRONOMÉTRAGE PAR ÉTAPE ET EXPOSITION PROMETHEUS
+# =============================================================================
+# Un Chronometre est attaché au contexte de la requête (contextvars : fonctionne
+# avec les threads Flask et asyncio). Le code métier pose un repère à la fin de
+# chaque étape avec marquer('booster') : la durée de l'étape est le temps écoulé
+# depuis le repère précédent (ou le début de la requête), si bien que les étapes
+# couvrent toute la requête sans trou. Hors requête chronométrée, marquer() ne fait rien.
+#
+# Pour rester sous 1 % du temps d'une requête, le chemin critique se limite à un
+# perf_counter et deux append par repère ; les instants sont mis en tampon et
+# convertis en durées puis répartis dans les histogrammes par lots (NumPy), au plus
+# tard à la lecture de /metrics.
+
+# Bornes des histogrammes (secondes), de 50 µs à 2.5 s
+BORNES = np.array([0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5])
+
+PREFIXE = 'assurance'
+
+_chrono_courant = contextvars.ContextVar('chrono_courant', default=None)
+
+
+class Histogramme:
+    """Histogramme cumulatif à bornes fixes (compteurs par intervalle, somme, total)"""
+
+    __slots__ = ('compteurs', 'somme', 'total')
+
+    def __init__(self):
+        self.compteurs = np.zeros(len(BORNES) + 1, dtype=np.int64)
+        self.somme = 0.0
+        self.total = 0
+
+    def observer_lot(self, valeurs):
+        valeurs = np.asarray(valeurs, dtype=np.float64)
+        # side='left' : une valeur égale à une borne compte dans cette borne (le="...")
+        self.compteurs += np.bincount(np.searchsorted(BORNES, valeurs, side='left'),
+                                      minlength=len(BORNES) + 1)
+        self.somme += float(valeurs.sum())
+        self.total += len(valeurs)
+
+
+class RegistreMetriques:
+    """Histogrammes des durées par (route, étape), alimentés par lots depuis un tampon"""
+
+    def __init__(self, taille_tampon=1024):
+        self.taille_tampon = taille_tampon
+        self._tampon = deque()
+        self._histogrammes = {}
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, route, noms, temps):
+        """
+        Met en tampon les repères d'une requête : noms des étapes et instants
+        (temps[0] = début, temps[i + 1] = fin de l'étape noms[i], dernier = fin de la requête).
+        """
+        self._tampon.append(((route, noms), temps))
+        if len(self._tampon) >= self.taille_tampon:
+            self._agreger()
+
+    def _agreger(self):
+        """Vide le tampon dans les histogrammes (append / popleft de deque sont atomiques)"""
+        with self._verrou:
+            # Les requêtes d'une même route passent presque toutes par les mêmes étapes :
+            # regroupées par séquence d'étapes, leurs durées se calculent en une matrice
+            par_sequence = {}
+            for _ in range(len(self._tampon)):
+                cle, temps = self._tampon.popleft()
+                par_sequence.setdefault(cle, []).append(temps)
+
+            for (route, noms), lignes in par_sequence.items():
+                temps = np.array(lignes, dtype=np.float64)
+                durees = np.diff(temps[:, :-1], axis=1)
+                colonnes = [(nom, durees[:, i]) for i, nom in enumerate(noms)]
+                colonnes.append(('total', temps[:, -1] - temps[:, 0]))
+                for nom, valeurs in colonnes:
+                    histogramme = self._histogrammes.get((route, nom))
+                    if histogramme is None:
+                        histogramme = self._histogrammes[(route, nom)] = Histogramme()
+                    histogramme.observer_lot(valeurs)
+
+    def exposition(self):
+        """Texte au format d'exposition Prometheus (version 0.0.4)"""
+        self._agreger()
+        nom = f'{PREFIXE}_etape_duree_secondes'
+        lignes = [
+            f'# HELP {nom} Durée de chaque étape du traitement des requêtes',
+            f'# TYPE {nom} histogram',
+        ]
+        with self._verrou:
+            for (route, etape), h in sorted(self._histogrammes.items()):
+                etiquettes = f'route="{route}",etape="{etape}"'
+                for borne, cumul in zip(BORNES.tolist(), np.cumsum(h.compteurs).tolist()):
+                    lignes.append(f'{nom}_bucket{{{etiquettes},le="{borne}"}} {cumul}')
+                lignes.append(f'{nom}_bucket{{{etiquettes},le="+Inf"}} {h.total}')
+                lignes.append(f'{nom}_sum{{{etiquettes}}} {h.somme:.9f}')
+                lignes.append(f'{nom}_count{{{etiquettes}}} {h.total}')
+        return '\n'.join(lignes) + '\n'
+
+
+class Chronometre:
+    """Repères d'une requête ; chaque étape dure depuis le repère précédent"""
+
+    __slots__ = ('route', 'noms', 'temps', '_jeton')
+
+    def __init__(self, route):
+        self.route = route
+        self.noms = []
+        self.temps = [perf_counter()]
+        self._jeton = _chrono_courant.set(self)
+
+    def terminer(self, registre):
+        """Détache le chronomètre du contexte et enregistre ses durées (total compris)"""
+        _chrono_courant.reset(self._jeton)
+        self.temps.append(perf_counter())
+        registre.enregistrer(self.route, tuple(self.noms), self.temps)
+
+    def abandonner(self):
+        """Détache le chronomètre sans enregistrer (requête interrompue)"""
+        _chrono_courant.reset(self._jeton)
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing (durées en ms, après terminer())"""
+        t = self.temps
+        etapes = [(nom, t[i + 1] - t[i]) for i, nom in enumerate(self.noms)]
+        etapes.append(('total', t[-1] - t[0]))
+        return ', '.join(f'{nom};dur={duree * 1000:.3f}' for nom, duree in etapes)
+
+
+def marquer(nom):
+    """Clôt l'étape `nom` de la requête courante (sans effet hors requête chronométrée)"""
+    chrono = _chrono_courant.get()
+    if chrono is not None:
+        chrono.noms.append(nom)
+        chrono.temps.append(perf_counter())
@@ -0,0 +1,163 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from feature_encoder import charger_schema
+from native_export import (
+    FICHIER_BOOSTER, FICHIER_PREPROCESSING,
+    charger_booster, charger_encoder, charger_scaler, charger_arbre
+)
+from shared_models import DOSSIER_PARTAGE, attacher_arbre
+
+# =============================================================================
+# REGISTRE DES MODÈLES (chargement parallèle en arrière-plan)
+# =============================================================================
+
+
+# L'unpickling importe les modules scikit-learn à la volée : des imports concurrents
+# depuis plusieurs threads peuvent lever _DeadlockError, on sérialise donc ce chemin.
+_verrou_pickle = threading.Lock()
+
+def charger_pickle(chemin):
+    """Chargement joblib (format historique) ; joblib n'est importé que dans ce cas"""
+    import joblib
+    with _verrou_pickle:
+        return joblib.load(chemin)
+
+def artefacts_a_charger(dossier='models', format_modeles=None):
+    """
+    Choisit les artefacts à charger : formats natifs (UBJSON + NumPy, sans pickle)
+    s'ils existent, sinon les .pkl. MODEL_FORMAT=native|pickle force un format.
+    """
+    format_modeles = format_modeles or os.environ.get('MODEL_FORMAT', 'auto')
+    natif_present = all(
+        os.path.exists(os.path.join(dossier, f)) for f in (FICHIER_BOOSTER, FICHIER_PREPROCESSING)
+    )
+
+    if format_modeles == 'native' or (format_modeles == 'auto' and natif_present):
+        # Tableaux de l'arbre en mémoire mappée (partagés entre workers) s'ils ont été exportés
+        if os.path.isdir(os.path.join(dossier, DOSSIER_PARTAGE)):
+            arbre = (DOSSIER_PARTAGE, attacher_arbre)
+        else:
+            arbre = (FICHIER_PREPROCESSING, charger_arbre)
+        return {
+            'modele_final': (FICHIER_BOOSTER, charger_booster),
+            'encoder': (FICHIER_PREPROCESSING, charger_encoder),
+            'scaler': (FICHIER_PREPROCESSING, charger_scaler),
+            'clf': arbre,
+            'feature_schema': ('feature_schema.json', charger_schema),
+        }
+
+    return {
+        'modele_final': ('modele_final.pkl', charger_pickle),
+        'encoder': ('encoder.pkl', charger_pickle),
+        'scaler': ('scaler.pkl', charger_pickle),
+        'clf': ('clf.pkl', charger_pickle),
+        'feature_schema': ('feature_schema.json', charger_schema),
+    }
+
+
+class ModelRegistry:
+    """
+    Charge les artefacts du dossier models/ en parallèle dans un pool de threads,
+    sans bloquer le démarrage de Flask. Les formats natifs et le schéma JSON se chargent
+    en parallèle ; les .pkl passent par charger_pickle, qui les charge l'un après l'autre.
+    Expose l'état de chaque artefact et sa durée de chargement ; `pret` ne passe à True
+    qu'une fois tous les artefacts utilisables.
+
+    artefacts : {nom: (fichier, fonction_de_chargement)}
+    preparer  : fonction appelée avec {nom: objet} une fois tout chargé (validation,
+                construction des objets de service) ; une exception la rend non prête.
+    """
+
+    def __init__(self, dossier, artefacts, preparer=None, max_workers=None):
+        self.dossier = dossier
+        self.artefacts = dict(artefacts)
+        self.preparer = preparer
+        self.max_workers = max_workers or len(self.artefacts)
+
+        self.objets = {}
+        self.durees = {}
+        self.etats = {nom: 'en_attente' for nom in self.artefacts}
+        self.erreur = None
+        self.duree_totale = None
+
+        self._termine = threading.Event()
+        self._pret = False
+        self._thread = None
+
+    @property
+    def pret(self):
+        return self._pret
+
+    def get(self, nom):
+        return self.objets.get(nom)
+
+    def demarrer(self):
+        """Lance le chargement en arrière-plan (sans effet si déjà lancé)"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.charger, name='model-registry', daemon=True)
+            self._thread.start()
+        return self
+
+    def _charger_un(self, nom):
+        fichier, chargeur = self.artefacts[nom]
+        chemin = os.path.join(self.dossier, fichier)
+        self.etats[nom] = 'chargement'
+        debut = time.perf_counter()
+        try:
+            if not os.path.exists(chemin):
+                raise FileNotFoundError(f"Fichier manquant: {chemin}")
+            objet = chargeur(chemin)
+        except Exception:
+            self.etats[nom] = 'erreur'
+            raise
+        finally:
+            self.durees[nom] = round((time.perf_counter() - debut) * 1000, 2)
+        self.etats[nom] = 'charge'
+        return objet
+
+    def charger(self):
+        """Charge tous les artefacts en parallèle puis appelle `preparer`"""
+        debut = time.perf_counter()
+        logging.info("Chargement des modèles...")
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='model-load') as pool:
+                futures = {nom: pool.submit(self._charger_un, nom) for nom in self.artefacts}
+                objets = {nom: future.result() for nom, future in futures.items()}
+
+            if self.preparer is not None:
+                self.preparer(objets)
+
+            self.objets = objets
+            self._pret = True
+            logging.info("Modèles chargés avec succès (%s)", self.durees)
+        except Exception as e:
+            self.erreur = e
+            logging.critical("Échec du chargement des modèles: %s", e)
+        finally:
+            self.duree_totale = round((time.perf_counter() - debut) * 1000, 2)
+            self._termine.set()
+
+    def attendre(self, timeout=None):
+        """Bloque jusqu'à la fin du chargement ; relève l'erreur éventuelle"""
+        self.demarrer()
+        if not self._termine.wait(timeout):
+            raise TimeoutError("Chargement des modèles non terminé")
+        if self.erreur is not None:
+            raise self.erreur
+        return self
+
+    def etat(self):
+        """Résumé pour /health/ready"""
+        return {
+            'ready': self._pret,
+            'artefacts': {
+                nom: {'etat': self.etats[nom], 'duree_ms': self.durees.get(nom)}
+                for nom in self.artefacts
+            },
+            'duree_totale_ms': self.duree_totale,
+            'erreur': str(self.erreur) if self.erreur is not None else None,
+        }
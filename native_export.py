@@ -0,0 +1,136 @@
+import os
+import threading
+
+import numpy as np
+
+# =============================================================================
+# EXPORT / CHARGEMENT DES MODÈLES SANS PICKLE
+# =============================================================================
+# - modele_final.ubj    : booster XGBoost au format natif UBJSON (Booster.save_model)
+# - preprocessing.npz   : paramètres de encoder, scaler et clf (tableaux + vocabulaires)
+# Le chargement n'utilise que xgboost et NumPy (allow_pickle=False).
+
+FICHIER_BOOSTER = 'modele_final.ubj'
+FICHIER_PREPROCESSING = 'preprocessing.npz'
+
+# Attributs de l'arbre scikit-learn conservés pour l'inférence
+ATTRIBUTS_ARBRE = ('children_left', 'children_right', 'feature', 'threshold', 'value')
+
+
+class ParametresEncoder:
+    """Remplaçant léger de OneHotEncoder : vocabulaires uniquement"""
+
+    def __init__(self, feature_names_in_, categories_):
+        self.feature_names_in_ = feature_names_in_
+        self.categories_ = categories_
+
+
+class ParametresScaler:
+    """Remplaçant léger de MinMaxScaler : transform() = X * scale_ + min_"""
+
+    def __init__(self, feature_names_in_, data_min_, data_max_, scale_, min_):
+        self.feature_names_in_ = feature_names_in_
+        self.data_min_ = data_min_
+        self.data_max_ = data_max_
+        self.scale_ = scale_
+        self.min_ = min_
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) * self.scale_ + self.min_
+
+
+class ParametresArbre:
+    """Tableaux d'un DecisionTreeClassifier entraîné (structure de tree_)"""
+
+    def __init__(self, classes_, feature_names_in_, **tableaux):
+        self.classes_ = classes_
+        self.feature_names_in_ = feature_names_in_
+        for nom in ATTRIBUTS_ARBRE:
+            setattr(self, nom, tableaux[nom])
+
+
+def exporter_natif(modele_final, encoder, scaler, clf, dossier='models'):
+    """Exporte le booster au format UBJSON et les objets scikit-learn en tableaux NumPy"""
+    os.makedirs(dossier, exist_ok=True)
+    modele_final.save_model(os.path.join(dossier, FICHIER_BOOSTER))
+
+    tableaux = {
+        'encoder_features': np.array([str(n) for n in encoder.feature_names_in_]),
+        'scaler_features': np.array([str(n) for n in scaler.feature_names_in_]),
+        'scaler_data_min': scaler.data_min_,
+        'scaler_data_max': scaler.data_max_,
+        'scaler_scale': scaler.scale_,
+        'scaler_min': scaler.min_,
+        'clf_classes': np.array([str(c) for c in clf.classes_]),
+        'clf_features': np.array([str(n) for n in clf.feature_names_in_]),
+    }
+    for i, categories in enumerate(encoder.categories_):
+        tableaux[f'encoder_categories_{i}'] = np.array([str(c) for c in categories])
+    for nom in ATTRIBUTS_ARBRE:
+        tableaux[f'clf_{nom}'] = getattr(clf.tree_, nom)
+
+    np.savez_compressed(os.path.join(dossier, FICHIER_PREPROCESSING), **tableaux)
+
+    # Copie non compressée des tableaux de l'arbre, mappable par les workers pré-forkés
+    from shared_models import exporter_tableaux_partages
+    arbre = ParametresArbre(
+        tableaux['clf_classes'], tableaux['clf_features'],
+        **{nom: tableaux[f'clf_{nom}'] for nom in ATTRIBUTS_ARBRE}
+    )
+    exporter_tableaux_partages(arbre, dossier)
+
+def charger_booster(chemin):
+    """Charge le booster natif avec Booster.load_model (aucun unpickling)"""
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(chemin)
+    return booster
+
+# preprocessing.npz est lu une seule fois par version du fichier : les chargeurs de
+# encoder, scaler et clf (threads du registre) partagent les mêmes tableaux
+_verrou_preprocessing = threading.Lock()
+_preprocessing = {}
+
+def lire_preprocessing(chemin):
+    """Tableaux de preprocessing.npz, indexés par nom (lecture unique, partagée)"""
+    cle = (os.path.abspath(chemin), os.stat(chemin).st_mtime_ns)
+    with _verrou_preprocessing:
+        if cle not in _preprocessing:
+            with np.load(chemin, allow_pickle=False) as npz:
+                tableaux = {nom: npz[nom] for nom in npz.files}
+            _preprocessing.clear()
+            _preprocessing[cle] = tableaux
+        return _preprocessing[cle]
+
+def charger_encoder(chemin):
+    npz = lire_preprocessing(chemin)
+    noms = npz['encoder_features'].tolist()
+    categories = [npz[f'encoder_categories_{i}'] for i in range(len(noms))]
+    return ParametresEncoder(np.array(noms, dtype=object), categories)
+
+def charger_scaler(chemin):
+    npz = lire_preprocessing(chemin)
+    return ParametresScaler(
+        npz['scaler_features'].astype(object), npz['scaler_data_min'],
+        npz['scaler_data_max'], npz['scaler_scale'], npz['scaler_min']
+    )
+
+def charger_arbre(chemin):
+    npz = lire_preprocessing(chemin)
+    tableaux = {nom: npz[f'clf_{nom}'] for nom in ATTRIBUTS_ARBRE}
+    return ParametresArbre(
+        npz['clf_classes'].astype(object), npz['clf_features'].astype(object), **tableaux
+    )
+
+if __name__ == '__main__':
+    # Convertit les artefacts .pkl existants vers les formats natifs
+    import joblib
+
+    exporter_natif(
+        joblib.load('models/modele_final.pkl'),
+        joblib.load('models/encoder.pkl'),
+        joblib.load('models/scaler.pkl'),
+        joblib.load('models/clf.pkl'),
+    )
+    print(f"✅ Modèles exportés: models/{FICHIER_BOOSTER}, models/{FICHIER_PREPROCESSING}")
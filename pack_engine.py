@@ -0,0 +1,137 @@
+import hashlib
+import json
+from bisect import bisect_left
+from types import MappingProxyType
+
+import numpy as np
+
+# =============================================================================
+# MOTEUR DE PACKS PRÉCALCULÉ
+# =============================================================================
+# predict_risk_and_pack est constante par morceaux : elle ne dépend que de la
+# bande de BMI, de la bande d'âge, de children > 3 et du statut fumeur.
+# Les seuils ci-dessous réunissent ceux de definir_pack_auto,
+# assign_reimbursement_class_dynamic et du profil (comparaisons strictes « > »).
+
+SEUILS_BMI = (25, 30, 35)
+SEUILS_AGE = (30, 40, 45, 55, 60)
+SEUILS_ENFANTS = (3,)
+
+# Incrémenter à chaque modification des règles métier ou des textes de pack
+# (fait partie des ETag de GET /pack, avec une empreinte du contenu de la table)
+VERSION_REGLES = 1
+
+# Sous-ensemble renvoyé par /pack
+CHAMPS_PACK = (
+    'pack', 'type_client', 'profil', 'remboursement_class',
+    'taux_remboursement', 'features', 'description', 'label'
+)
+
+
+def _figer(resultat):
+    """Rend un résultat de règle immuable (listes -> tuples, dict -> MappingProxyType)"""
+    return MappingProxyType({
+        cle: tuple(valeur) if isinstance(valeur, list) else valeur
+        for cle, valeur in resultat.items()
+    })
+
+def _bande(seuils, valeur):
+    """Indice de bande (intervalles fermés à droite) : valeur <= seuils[0] -> 0"""
+    return bisect_left(seuils, valeur)
+
+def _representants(seuils):
+    """Deux points par bande : juste au-dessus de la borne basse et la borne haute"""
+    points = []
+    for i in range(len(seuils) + 1):
+        haut = seuils[i] if i < len(seuils) else seuils[-1] + 1
+        bas = np.nextafter(float(seuils[i - 1]), np.inf) if i > 0 else haut - 1
+        points.append((float(bas), float(haut)))
+    return points
+
+
+class PackEngine:
+    """
+    Compile les règles de pack en une table indexée par bandes au démarrage.
+    lookup() répond en temps constant avec des objets partagés et immuables ;
+    classify_many() classe des lots entiers avec NumPy.
+    """
+
+    def __init__(self, regle, seuils_bmi=SEUILS_BMI, seuils_age=SEUILS_AGE,
+                 seuils_enfants=SEUILS_ENFANTS):
+        self.seuils_bmi = tuple(seuils_bmi)
+        self.seuils_age = tuple(seuils_age)
+        self.seuils_enfants = tuple(seuils_enfants)
+
+        self._n_age = len(self.seuils_age) + 1
+        self._n_enfants = len(self.seuils_enfants) + 1
+
+        self.table = []
+        self.table_pack = []
+        self._compiler(regle)
+
+        # ETag par cellule : version des règles + empreinte du contenu de toutes les
+        # cellules (un texte modifié sans changer VERSION_REGLES invalide aussi les caches)
+        contenu = json.dumps([dict(p) for p in self.table_pack], sort_keys=True, ensure_ascii=False)
+        self.empreinte_regles = hashlib.sha256(contenu.encode('utf-8')).hexdigest()[:12]
+        self.etags_pack = [
+            f'pack-v{VERSION_REGLES}-{self.empreinte_regles}-{i}' for i in range(len(self.table_pack))
+        ]
+
+    def _compiler(self, regle):
+        """Évalue la règle sur chaque cellule et vérifie qu'elle y est constante"""
+        for bmi_bas, bmi_haut in _representants(self.seuils_bmi):
+            for age_bas, age_haut in _representants(self.seuils_age):
+                for enf_bas, enf_haut in _representants(self.seuils_enfants):
+                    for smoker in ('no', 'yes'):
+                        resultat = regle(age_haut, bmi_haut, enf_haut, smoker)
+                        controle = regle(age_bas, bmi_bas, enf_bas, smoker)
+                        if controle != resultat:
+                            raise ValueError(
+                                f"Règle non constante sur la bande bmi={bmi_haut}, "
+                                f"age={age_haut}, children={enf_haut}, smoker={smoker} : "
+                                "seuils du moteur de packs désynchronisés"
+                            )
+                        fige = _figer(resultat)
+                        self.table.append(fige)
+                        self.table_pack.append(MappingProxyType(
+                            {champ: fige[champ] for champ in CHAMPS_PACK}
+                        ))
+
+    def cellule(self, age, bmi, children, smoker):
+        """Indice de la cellule de la table pour un client"""
+        i_bmi = _bande(self.seuils_bmi, bmi)
+        i_age = _bande(self.seuils_age, age)
+        i_enf = _bande(self.seuils_enfants, children)
+        fumeur = 1 if smoker == 'yes' else 0
+        return ((i_bmi * self._n_age + i_age) * self._n_enfants + i_enf) * 2 + fumeur
+
+    def lookup(self, age, bmi, children, smoker):
+        """Résultat complet (équivalent à predict_risk_and_pack), partagé et immuable"""
+        return self.table[self.cellule(age, bmi, children, smoker)]
+
+    def lookup_pack(self, age, bmi, children, smoker):
+        """Sous-ensemble renvoyé par /pack, partagé et immuable"""
+        return self.table_pack[self.cellule(age, bmi, children, smoker)]
+
+    def etag_pack(self, cellule):
+        """ETag (opaque, sans guillemets) de la réponse /pack d'une cellule"""
+        return self.etags_pack[cellule]
+
+    def classify_many(self, ages, bmis, children, smokers):
+        """
+        Version vectorisée de cellule() : retourne un tableau d'indices de cellules.
+        Les résultats correspondants sont self.table[i].
+        """
+        bmis = np.asarray(bmis, dtype=np.float64)
+        i_bmi = np.searchsorted(self.seuils_bmi, bmis, side='left')
+        # NaN > seuil est toujours faux : même bande que dans les règles scalaires
+        i_bmi[np.isnan(bmis)] = 0
+        i_age = np.searchsorted(self.seuils_age, np.asarray(ages, dtype=np.float64), side='left')
+        i_enf = np.searchsorted(self.seuils_enfants, np.asarray(children, dtype=np.float64), side='left')
+        fumeur = (np.asarray(smokers, dtype=object) == 'yes').astype(np.intp)
+        return ((i_bmi * self._n_age + i_age) * self._n_enfants + i_enf) * 2 + fumeur
+
+    def resultats(self, cellules):
+        """Résultats partagés pour un tableau d'indices renvoyé par classify_many()"""
+        table = self.table
+        return [table[i] for i in cellules.tolist()]
@@ -0,0 +1,133 @@
+import hashlib
+import math
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# =============================================================================
+# CACHE DES PRÉDICTIONS SUR ENTRÉES QUANTIFIÉES
+# =============================================================================
+# L'espace réel des entrées de /predict est petit : âge et enfants entiers,
+# sex / smoker / region à 2 / 2 / 4 valeurs, BMI saisi au dixième. La clé est le
+# tuple canonique (BMI arrondi au pas configuré) ; la prédiction est calculée sur
+# cette clé canonique, donc identique quel que soit le client qui l'a remplie.
+# Le cache est vidé dès que l'empreinte du modèle chargé change.
+
+# Surcoût approximatif d'une entrée d'OrderedDict (nœud de liste + slot de table)
+OCTETS_PAR_ENTREE = 200
+
+
+def empreinte_booster(booster):
+    """Empreinte SHA-256 du contenu du booster (arbres et paramètres sérialisés)"""
+    return hashlib.sha256(bytes(booster.save_raw(raw_format='ubj'))).hexdigest()
+
+
+class PredictionCache:
+    """
+    Cache LRU des frais prédits, avec durée de vie (TTL), plafond mémoire
+    et compteurs hits / misses / évictions.
+    """
+
+    def __init__(self, taille_max=100000, ttl=3600, pas_bmi=0.1, memoire_max_mo=64):
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self.pas_bmi = pas_bmi
+        self.memoire_max = int(memoire_max_mo * 1024 * 1024)
+
+        self._entrees = OrderedDict()
+        self._octets = 0
+        self._empreinte = None
+        self._verrou = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def canonique(self, age, bmi, children, sex, smoker, region):
+        """Clé canonique : BMI arrondi au pas (pas_bmi=0 : BMI exact) ; None si une valeur n'est pas finie"""
+        # NaN / inf : round() et int() lèveraient une exception, l'appelant calcule sans cache
+        if not all(math.isfinite(v) for v in (age, bmi, children)):
+            return None
+        if self.pas_bmi:
+            bmi = round(round(bmi / self.pas_bmi) * self.pas_bmi, 6)
+        return (int(age), float(bmi), int(children), str(sex), str(smoker), str(region))
+
+    @staticmethod
+    def _taille(cle, valeur):
+        return sys.getsizeof(cle) + sum(sys.getsizeof(v) for v in cle) + sys.getsizeof(valeur) + OCTETS_PAR_ENTREE
+
+    def _verifier_empreinte(self, empreinte):
+        """Vide le cache si le modèle a changé (appelé sous verrou)"""
+        if empreinte != self._empreinte:
+            if self._entrees:
+                self.invalidations += 1
+            self._entrees.clear()
+            self._octets = 0
+            self._empreinte = empreinte
+
+    def _retirer_plus_ancienne(self):
+        cle, (valeur, _) = self._entrees.popitem(last=False)
+        self._octets -= self._taille(cle, valeur)
+
+    def get(self, cle, empreinte):
+        """Retourne la prédiction en cache ou None (absente, expirée ou autre modèle)"""
+        with self._verrou:
+            self._verifier_empreinte(empreinte)
+            entree = self._entrees.get(cle)
+            if entree is not None:
+                valeur, expiration = entree
+                if self.ttl and time.monotonic() >= expiration:
+                    del self._entrees[cle]
+                    self._octets -= self._taille(cle, valeur)
+                    self.expirations += 1
+                else:
+                    self._entrees.move_to_end(cle)
+                    self.hits += 1
+                    return valeur
+            self.misses += 1
+            return None
+
+    def put(self, cle, valeur, empreinte):
+        """Enregistre une prédiction, puis évince (LRU) jusqu'à respecter les plafonds"""
+        with self._verrou:
+            self._verifier_empreinte(empreinte)
+            ancienne = self._entrees.pop(cle, None)
+            if ancienne is not None:
+                self._octets -= self._taille(cle, ancienne[0])
+
+            self._entrees[cle] = (valeur, time.monotonic() + self.ttl)
+            self._octets += self._taille(cle, valeur)
+            while self._entrees and (len(self._entrees) > self.taille_max or self._octets > self.memoire_max):
+                self._retirer_plus_ancienne()
+                self.evictions += 1
+
+    def get_or_compute(self, cle, empreinte, calculer):
+        """Prédiction en cache, sinon calculer(cle) puis mise en cache"""
+        valeur = self.get(cle, empreinte)
+        if valeur is None:
+            valeur = calculer(cle)
+            self.put(cle, valeur, empreinte)
+        return valeur
+
+    def stats(self):
+        """Compteurs du cache et occupation mémoire estimée"""
+        with self._verrou:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'taux_hits': round(self.hits / total, 4) if total else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entrees': len(self._entrees),
+                'taille_max': self.taille_max,
+                'memoire_mo': round(self._octets / (1024 * 1024), 3),
+                'memoire_max_mo': round(self.memoire_max / (1024 * 1024), 3),
+                'ttl_s': self.ttl,
+                'pas_bmi': self.pas_bmi,
+                'empreinte_modele': self._empreinte[:12] if self._empreinte else None,
+            }
@@ -0,0 +1,244 @@
+import argparse
+import json
+import math
+import os
+import time
+from bisect import bisect_right
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder, charger_schema
+
+# =============================================================================
+# TABLE DE PRIX MATÉRIALISÉE (réponses O(1) sans XGBoost)
+# =============================================================================
+# app2.py borne l'âge à 18–100 et les enfants à 0–20 ; sex / smoker / region ont
+# 2 / 2 / 4 valeurs. Seul le BMI est continu, mais le booster ne le lit qu'à travers
+# ses seuils de split : entre deux seuils consécutifs la prédiction est constante.
+# La grille BMI est donc l'ensemble des intervalles entre seuils (un représentant
+# par intervalle) et la règle d'interpolation est « constante par morceaux » :
+# k = nombre de seuils <= BMI mis à l'échelle (float32, comparaison x < seuil de XGBoost).
+#
+# - models/price_table.npy  : float32 (âge, enfants, sex, smoker, region, intervalle BMI)
+# - models/price_table.json : bornes, vocabulaires, seuils BMI, empreinte du booster
+#
+#   python price_table.py              # construit la table (après projetML.py)
+#   python price_table.py --rapport    # précision vs appels directs au booster
+
+FICHIER_TABLE = 'price_table.npy'
+FICHIER_META = 'price_table.json'
+VERSION_TABLE = 1
+
+AGE_MIN, AGE_MAX = 18, 100
+ENFANTS_MIN, ENFANTS_MAX = 0, 20
+
+
+def seuils_feature(booster, nom):
+    """Seuils de split (float32, triés, uniques) utilisés par le booster pour une feature"""
+    indice = booster.feature_names.index(nom)
+    modele = json.loads(bytes(booster.save_raw(raw_format='json')))
+    seuils = []
+    for arbre in modele['learner']['gradient_booster']['model']['trees']:
+        for gauche, feature, seuil in zip(arbre['left_children'], arbre['split_indices'],
+                                          arbre['split_conditions']):
+            if gauche != -1 and feature == indice:
+                seuils.append(seuil)
+    return np.unique(np.array(seuils, dtype=np.float32))
+
+
+def representants_intervalles(seuils):
+    """Une valeur par intervalle [seuil_k-1, seuil_k[ (le premier intervalle est ouvert à gauche)"""
+    premier = np.nextafter(seuils[0], np.float32(-np.inf), dtype=np.float32) if len(seuils) else np.float32(0)
+    return np.concatenate(([premier], seuils)).astype(np.float32)
+
+
+def construire_table(booster, schema):
+    """Score toute la grille en un seul lot vectorisé ; retourne (table, meta)"""
+    import xgboost as xgb
+    from prediction_cache import empreinte_booster
+
+    encodeur = FeatureEncoder.depuis_schema(schema)
+    vocabulaires = {groupe: list(index) for groupe, index in encodeur.index_categories.items()}
+
+    ages = np.arange(AGE_MIN, AGE_MAX + 1)
+    enfants = np.arange(ENFANTS_MIN, ENFANTS_MAX + 1)
+    seuils_bmi = seuils_feature(booster, 'bmi')
+    bmis = representants_intervalles(seuils_bmi)
+
+    # Colonnes numériques mises à l'échelle exactement comme à l'inférence
+    zeros = np.zeros(len(ages))
+    age_s = encodeur.encode_batch(ages, zeros, zeros, [''] * len(ages), [''] * len(ages), [''] * len(ages))[:, 0]
+    zeros = np.zeros(len(enfants))
+    enfants_s = encodeur.encode_batch(zeros, zeros, enfants, [''] * len(enfants), [''] * len(enfants),
+                                      [''] * len(enfants))[:, 2]
+
+    forme = (len(ages), len(enfants), len(vocabulaires['sex']), len(vocabulaires['smoker']),
+             len(vocabulaires['region']), len(bmis))
+    X = np.zeros(forme + (encodeur.n_colonnes,), dtype=np.float32)
+    X[..., 0] = age_s[:, None, None, None, None, None]
+    X[..., 1] = bmis
+    X[..., 2] = enfants_s[None, :, None, None, None, None]
+    for axe, groupe in ((2, 'sex'), (3, 'smoker'), (4, 'region')):
+        for i, categorie in enumerate(vocabulaires[groupe]):
+            selection = [slice(None)] * len(forme)
+            selection[axe] = i
+            X[tuple(selection) + (encodeur.index_categories[groupe][categorie],)] = 1
+
+    debut = time.perf_counter()
+    predictions = booster.predict(xgb.DMatrix(X.reshape(-1, encodeur.n_colonnes),
+                                              feature_names=encodeur.colonnes))
+    duree = time.perf_counter() - debut
+
+    table = predictions.astype(np.float32).reshape(forme)
+    meta = {
+        'version': VERSION_TABLE,
+        'forme': list(forme),
+        'age': [AGE_MIN, AGE_MAX],
+        'children': [ENFANTS_MIN, ENFANTS_MAX],
+        'vocabulaires': vocabulaires,
+        'bmi_scale': schema['numeriques']['bmi']['scale'],
+        'bmi_offset': schema['numeriques']['bmi']['offset'],
+        # float32 -> float64 -> JSON : aller-retour exact
+        'seuils_bmi': [float(s) for s in seuils_bmi],
+        'hash_schema': schema['hash'],
+        'empreinte_modele': empreinte_booster(booster),
+        'duree_construction_s': round(duree, 3),
+    }
+    return table, meta
+
+
+def sauvegarder_table(table, meta, dossier='models'):
+    np.save(os.path.join(dossier, FICHIER_TABLE), table)
+    with open(os.path.join(dossier, FICHIER_META), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+
+class TablePrix:
+    """Table de prix en mémoire mappée ; prix() répond sans appeler XGBoost"""
+
+    def __init__(self, table, meta):
+        self.table = table
+        self.meta = meta
+        self.empreinte_modele = meta['empreinte_modele']
+        self.hash_schema = meta['hash_schema']
+        self._age_min, self._age_max = meta['age']
+        self._enfants_min, self._enfants_max = meta['children']
+        self._scale = meta['bmi_scale']
+        self._offset = meta['bmi_offset']
+        # Seuils float32 gardés en floats Python : bisect évite l'appel NumPy par requête
+        self._seuils = meta['seuils_bmi']
+        self._plat = table.reshape(-1)
+        self._pas = [pas // table.itemsize for pas in table.strides]
+        self._index = {
+            groupe: {categorie: i for i, categorie in enumerate(categories)}
+            for groupe, categories in meta['vocabulaires'].items()
+        }
+
+    def indice_bmi(self, bmi):
+        """Intervalle BMI : nombre de seuils <= BMI mis à l'échelle (comme le MinMaxScaler)"""
+        return bisect_right(self._seuils, float(np.float32(bmi * self._scale + self._offset)))
+
+    def prix(self, age, bmi, children, sex, smoker, region):
+        """Frais prédits lus dans la table, ou None si le client est hors de la grille"""
+        if not (self._age_min <= age <= self._age_max and self._enfants_min <= children <= self._enfants_max):
+            return None
+        if not math.isfinite(bmi):
+            return None
+        try:
+            i_sex = self._index['sex'][sex]
+            i_smoker = self._index['smoker'][smoker]
+            i_region = self._index['region'][region]
+        except KeyError:
+            return None
+        p = self._pas
+        return float(self._plat[(age - self._age_min) * p[0] + (children - self._enfants_min) * p[1]
+                                + i_sex * p[2] + i_smoker * p[3] + i_region * p[4] + self.indice_bmi(bmi) * p[5]])
+
+
+def charger_table(chemin):
+    """Charge price_table.json et mappe price_table.npy en lecture seule"""
+    with open(chemin, encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('version') != VERSION_TABLE:
+        raise ValueError(f"Version de table de prix non supportée: {meta.get('version')}")
+    table = np.load(os.path.join(os.path.dirname(chemin), FICHIER_TABLE), mmap_mode='r')
+    if list(table.shape) != meta['forme']:
+        raise ValueError(f"Table de prix incohérente: {table.shape} != {meta['forme']}")
+    return TablePrix(table, meta)
+
+
+def rapport_precision(table_prix, booster, schema, chemin_csv='dataAssurance.csv', n_aleatoires=100000, graine=0):
+    """Écarts table / booster sur le jeu de données et sur des clients tirés au hasard"""
+    import pandas as pd
+    import xgboost as xgb
+
+    encodeur = FeatureEncoder.depuis_schema(schema)
+    rng = np.random.default_rng(graine)
+    vocabulaires = table_prix.meta['vocabulaires']
+
+    df = pd.read_csv(chemin_csv).dropna(subset=['age', 'bmi', 'children', 'sex', 'smoker', 'region'])
+    jeux = {
+        'dataAssurance.csv': (
+            df['age'].astype(int).values, df['bmi'].values, df['children'].astype(int).values,
+            df['sex'].values, df['smoker'].values, df['region'].values
+        ),
+        'aléatoires': (
+            rng.integers(AGE_MIN, AGE_MAX + 1, n_aleatoires),
+            np.round(rng.uniform(12, 60, n_aleatoires), 1),
+            rng.integers(ENFANTS_MIN, ENFANTS_MAX + 1, n_aleatoires),
+            rng.choice(vocabulaires['sex'], n_aleatoires),
+            rng.choice(vocabulaires['smoker'], n_aleatoires),
+            rng.choice(vocabulaires['region'], n_aleatoires),
+        ),
+    }
+
+    rapport = {}
+    for nom, colonnes in jeux.items():
+        X = encodeur.encode_batch(*colonnes)
+        direct = booster.predict(xgb.DMatrix(X, feature_names=encodeur.colonnes))
+
+        clients = list(zip(*(c.tolist() for c in colonnes)))
+        debut = time.perf_counter()
+        lus = np.array([table_prix.prix(*client) for client in clients], dtype=np.float64)
+        duree_table = (time.perf_counter() - debut) / len(clients)
+
+        debut = time.perf_counter()
+        for ligne in X[:200]:
+            booster.predict(xgb.DMatrix(ligne[None, :], feature_names=encodeur.colonnes))
+        duree_booster = (time.perf_counter() - debut) / min(200, len(X))
+
+        ecarts = np.abs(lus - direct)
+        rapport[nom] = {
+            'lignes': len(clients),
+            'identiques': float(np.mean(ecarts == 0)),
+            'ecart_max': float(ecarts.max()),
+            'ecart_moyen': float(ecarts.mean()),
+            'ecart_p99': float(np.percentile(ecarts, 99)),
+            'table_us': round(duree_table * 1e6, 2),
+            'booster_us': round(duree_booster * 1e6, 1),
+        }
+    return rapport
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Matérialise la table de prix du booster")
+    parser.add_argument('--dossier', default='models')
+    parser.add_argument('--rapport', action='store_true', help="compare la table au booster")
+    parser.add_argument('--aleatoires', type=int, default=100000)
+    args = parser.parse_args()
+
+    from native_export import charger_booster
+
+    schema = charger_schema(os.path.join(args.dossier, 'feature_schema.json'))
+    booster = charger_booster(os.path.join(args.dossier, 'modele_final.ubj'))
+
+    if not args.rapport:
+        table, meta = construire_table(booster, schema)
+        sauvegarder_table(table, meta, args.dossier)
+        print(f"✅ Table de prix: {args.dossier}/{FICHIER_TABLE} {tuple(table.shape)} "
+              f"({table.nbytes / 1024 / 1024:.1f} Mo, {len(meta['seuils_bmi']) + 1} intervalles BMI, "
+              f"{meta['duree_construction_s']} s)")
+
+    table_prix = charger_table(os.path.join(args.dossier, FICHIER_META))
+    for nom, r in rapport_precision(table_prix, booster, schema, n_aleatoires=args.aleatoires).items():
+        print(f"{nom:>18} : {r}")
@@ -0,0 +1,197 @@
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# =============================================================================
+# JOURNALISATION STRUCTURÉE ET ASYNCHRONE DES REQUÊTES
+# =============================================================================
+# Les threads de requête ne font qu'un put_nowait dans une file bornée : un thread
+# dédié (QueueListener) sérialise les enregistrements en lignes JSON et écrit sur
+# la sortie. Les succès sont échantillonnés (LOG_SUCCESS_SAMPLE) ; les erreurs sont
+# toujours journalisées, avec la trace complète.
+#
+# Les corps de requête (âge, BMI, tabagisme...) ne sont jamais écrits : ils sont
+# remplacés par une empreinte HMAC-SHA256 de leur forme canonique. L'espace des
+# clients est petit, un simple SHA-256 se renverserait par énumération : la clé
+# vient de LOG_HASH_KEY (partagée entre workers pour corréler les requêtes) ou,
+# à défaut, est tirée au hasard par processus. LOG_ERROR_PAYLOAD=1 ajoute le corps
+# brut aux lignes d'erreur serveur (diagnostic ponctuel uniquement).
+
+CHAMPS_STANDARDS = frozenset(vars(logging.makeLogRecord({})))
+
+# Logger des requêtes API (une ligne par requête journalisée)
+journal = logging.getLogger('assurance.requetes')
+
+
+class FormateurJson(logging.Formatter):
+    """Une ligne JSON par enregistrement ; les champs passés via extra= sont conservés"""
+
+    def format(self, record):
+        ligne = {
+            'ts': round(record.created, 6),
+            'niveau': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        for cle, valeur in record.__dict__.items():
+            if cle not in CHAMPS_STANDARDS and cle not in ('message', 'asctime'):
+                ligne[cle] = valeur
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            ligne['trace'] = record.exc_text
+        return json.dumps(ligne, ensure_ascii=False, default=str)
+
+
+class QueueHandlerDiffere(QueueHandler):
+    """
+    Met l'enregistrement en file sans le formater : la mise en forme (JSON) est
+    faite par le thread d'écriture. Seule la trace d'une exception est figée ici,
+    pendant que la pile existe encore. File pleine : l'enregistrement est compté
+    et abandonné plutôt que de bloquer la requête.
+    """
+
+    def __init__(self, file):
+        super().__init__(file)
+        self.abandons = 0
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        # Arguments résolus tant qu'ils ne peuvent pas encore changer
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.abandons += 1
+
+
+_etat = {'handler': None, 'listener': None, 'taille_file': 0, 'sortie': None}
+
+
+def _demarrer_listener():
+    file = queue.Queue(maxsize=_etat['taille_file'])
+    _etat['handler'].queue = file
+    listener = QueueListener(file, _etat['sortie'], respect_handler_level=True)
+    listener.start()
+    _etat['listener'] = listener
+
+
+def _apres_fork():
+    # Le thread d'écriture n'existe pas dans un processus forké (workers gunicorn
+    # préchargés) : nouvelle file et nouveau thread, sinon la file se remplit sans lecteur
+    if _etat['handler'] is not None:
+        _demarrer_listener()
+
+
+def _arreter():
+    if _etat['listener'] is not None:
+        _etat['listener'].stop()
+        _etat['listener'] = None
+
+
+def configurer_journalisation(niveau='INFO', format_sortie='json', taille_file=10000):
+    """
+    Remplace les handlers du logger racine par un QueueHandler ; l'écriture sur
+    stderr (JSON ou texte) se fait dans un thread dédié. Idempotent.
+    """
+    racine = logging.getLogger()
+    racine.setLevel(niveau)
+    if _etat['handler'] is not None:
+        return _etat['handler']
+
+    sortie = logging.StreamHandler(sys.stderr)
+    if format_sortie == 'json':
+        sortie.setFormatter(FormateurJson())
+    else:
+        sortie.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    for handler in list(racine.handlers):
+        racine.removeHandler(handler)
+    handler = QueueHandlerDiffere(None)
+    racine.addHandler(handler)
+
+    _etat.update(handler=handler, taille_file=taille_file, sortie=sortie)
+    _demarrer_listener()
+    os.register_at_fork(after_in_child=_apres_fork)
+    # Vide la file à l'arrêt du processus
+    atexit.register(_arreter)
+    return handler
+
+
+def empreinte_payload(donnees, cle):
+    """Empreinte HMAC-SHA256 (16 hex) du corps JSON sous forme canonique, sans donnée personnelle"""
+    if donnees is None:
+        return None
+    canonique = json.dumps(donnees, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hmac.new(cle, canonique.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+
+class JournalRequetes:
+    """
+    Une ligne par requête API : succès échantillonnés au taux `taux_succes`,
+    erreurs toujours écrites (trace complète pour les erreurs serveur).
+    Les erreurs de `erreurs_client` (validation) sont écrites en WARNING, sans trace.
+    """
+
+    def __init__(self, taux_succes=0.01, cle=None, erreurs_client=(), payload_erreurs=False, logger=journal):
+        self.taux_succes = taux_succes
+        self.payload_erreurs = payload_erreurs
+        self.cle = cle.encode('utf-8') if isinstance(cle, str) else (cle or os.urandom(32))
+        self.erreurs_client = tuple(erreurs_client)
+        self.logger = logger
+        self._aleatoire = random.random
+
+    def requete(self, route, statut, debut, payload=None, erreur=None, **champs):
+        """
+        Journalise une requête terminée. `payload` est une fonction sans argument
+        retournant le corps (appelée seulement si la ligne est écrite).
+        """
+        if erreur is None and statut < 500:
+            if self._aleatoire() >= self.taux_succes:
+                return
+            niveau = logging.INFO
+        elif isinstance(erreur, self.erreurs_client):
+            niveau = logging.WARNING
+        else:
+            niveau = logging.ERROR
+
+        if not self.logger.isEnabledFor(niveau):
+            return
+        donnees = payload() if payload is not None else None
+        champs.update(
+            route=route,
+            statut=statut,
+            duree_ms=round((time.perf_counter() - debut) * 1000, 3),
+            empreinte_payload=empreinte_payload(donnees, self.cle),
+        )
+        if isinstance(donnees, dict):
+            # Noms des champs seulement (utile pour diagnostiquer un corps mal formé)
+            champs['champs_payload'] = sorted(map(str, donnees))
+        elif isinstance(donnees, list):
+            champs['lignes_payload'] = len(donnees)
+
+        if niveau == logging.INFO:
+            champs['echantillon'] = self.taux_succes
+            self.logger.info('requête traitée', extra=champs)
+        elif niveau == logging.WARNING:
+            self.logger.warning('requête rejetée: %s', erreur, extra=champs)
+        else:
+            if self.payload_erreurs:
+                champs['payload'] = donnees
+            exc_info = (type(erreur), erreur, erreur.__traceback__) if erreur is not None else None
+            self.logger.error('échec de la requête: %s', erreur, exc_info=exc_info, extra=champs)
@@ -0,0 +1,473 @@
+import argparse
+import math
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# SEGMENTATION À GRANDE ÉCHELLE (MiniBatchKMeans + CRITÈRES EN FLUX)
+# =============================================================================
+# Le chemin exact de projetML.py (KMeans n_init=10 + silhouette_score exact pour
+# chaque K) est quadratique en temps pour la silhouette. Ici, les données ne sont
+# lues que par lots (source = fonction qui renvoie un itérateur de lots, relisible) :
+#
+# - MiniBatchKMeans.partial_fit sur des mini-lots de `batch_size` lignes ;
+# - Calinski–Harabasz et Davies–Bouldin exacts, en deux passes sur les lots
+#   (effectifs / sommes par cluster, puis distances aux centres) : O(n·k·d) en
+#   temps, O(k·d) en mémoire, mêmes valeurs que scikit-learn sur les mêmes labels ;
+# - silhouette sur `repetitions` échantillons stratifiés par cluster (allocation
+#   proportionnelle, tirage uniforme sans remise dans chaque cluster, fait pendant
+#   la seconde passe), avec intervalle de confiance de Student à 95 % sur la
+#   moyenne des répétitions.
+#
+#   python segmentation.py                          # balayage de K sur dataAssurance.csv
+#   python segmentation.py --benchmark              # temps et mémoire de 1k à 10M lignes
+#   python segmentation.py --hierarchique --tailles 100000 1000000   # plafonds mémoire du Ward
+
+TAILLE_LOT = 100_000
+
+
+def lots_tableau(X, taille_lot=TAILLE_LOT):
+    """Source de lots sur un tableau en mémoire (ou np.memmap)"""
+    X = np.asarray(X, dtype=np.float64)
+    return lambda: (X[debut:debut + taille_lot] for debut in range(0, len(X), taille_lot))
+
+
+def ajuster_minibatch(source, k, random_state=42, batch_size=4096, epoques=1, pas_min=100):
+    """
+    MiniBatchKMeans entraîné en flux : partial_fit sur chaque mini-lot de chaque lot,
+    pendant `epoques` passes et au moins `pas_min` mini-lots (petits jeux de données)
+    """
+    from sklearn.cluster import MiniBatchKMeans
+
+    modele = MiniBatchKMeans(n_clusters=k, random_state=random_state, batch_size=batch_size, n_init=3)
+    passes = pas = 0
+    while passes < epoques or pas < pas_min:
+        for lot in source():
+            for debut in range(0, len(lot), batch_size):
+                mini_lot = lot[debut:debut + batch_size]
+                # Le premier mini-lot initialise les centres (k-means++) : il doit contenir au moins k lignes
+                if len(mini_lot) >= k or hasattr(modele, 'cluster_centers_'):
+                    modele.partial_fit(mini_lot)
+                    pas += 1
+        passes += 1
+    return modele
+
+
+def _quotas(effectifs, taille_echantillon):
+    """Allocation proportionnelle de l'échantillon entre clusters (au moins 1 par cluster non vide)"""
+    n = effectifs.sum()
+    if taille_echantillon >= n:
+        return effectifs.copy()
+    quotas = np.maximum(1, np.round(effectifs * taille_echantillon / n).astype(np.int64))
+    return np.minimum(quotas, effectifs)
+
+
+def criteres_flux(source, modele, taille_echantillon=2000, repetitions=10, graine=42):
+    """
+    Calinski–Harabasz, Davies–Bouldin, inertie et silhouette échantillonnée (IC 95 %)
+    des labels prédits par `modele`, en deux passes sur `source`.
+    """
+    from scipy import stats
+    from sklearn.metrics import silhouette_score
+
+    k = modele.n_clusters
+
+    # Passe 1 : effectifs et sommes par cluster -> centres réels des labels
+    effectifs = np.zeros(k, dtype=np.int64)
+    sommes = None
+    for lot in source():
+        labels = modele.predict(lot)
+        if sommes is None:
+            sommes = np.zeros((k, lot.shape[1]))
+        effectifs += np.bincount(labels, minlength=k)
+        np.add.at(sommes, labels, lot)
+    n = int(effectifs.sum())
+    non_vides = effectifs > 0
+    centres = sommes / np.maximum(effectifs, 1)[:, None]
+    centre_global = sommes.sum(axis=0) / n
+
+    # Passe 2 : distances aux centres, et pour chaque répétition les `quota` lignes de
+    # plus petite priorité aléatoire de chaque cluster (= tirage uniforme sans remise)
+    quotas = _quotas(effectifs, taille_echantillon)
+    somme_distances = np.zeros(k)
+    somme_carres = np.zeros(k)
+    gardes = [[(np.empty(0), np.empty((0, sommes.shape[1]))) for _ in range(k)] for _ in range(repetitions)]
+    for i, lot in enumerate(source()):
+        labels = modele.predict(lot)
+        distances = np.linalg.norm(lot - centres[labels], axis=1)
+        somme_distances += np.bincount(labels, weights=distances, minlength=k)
+        somme_carres += np.bincount(labels, weights=distances ** 2, minlength=k)
+
+        priorites = np.random.default_rng([graine, i]).random((repetitions, len(lot)))
+        for c in range(k):
+            indices = np.flatnonzero(labels == c)
+            if len(indices) == 0:
+                continue
+            for r in range(repetitions):
+                # Seules les `quota` plus petites priorités du lot peuvent entrer : lignes copiées après sélection
+                cles_lot = priorites[r, indices]
+                if len(cles_lot) > quotas[c]:
+                    retenues = np.argpartition(cles_lot, quotas[c] - 1)[:quotas[c]]
+                    cles_lot, indices_lot = cles_lot[retenues], indices[retenues]
+                else:
+                    indices_lot = indices
+                cles, X_garde = gardes[r][c]
+                cles = np.concatenate([cles, cles_lot])
+                X_garde = np.concatenate([X_garde, lot[indices_lot]])
+                if len(cles) > quotas[c]:
+                    plus_petites = np.argpartition(cles, quotas[c] - 1)[:quotas[c]]
+                    cles, X_garde = cles[plus_petites], X_garde[plus_petites]
+                gardes[r][c] = (cles, X_garde)
+
+    # Calinski–Harabasz : dispersion inter / intra, corrigées des degrés de liberté
+    k_effectif = int(non_vides.sum())
+    inter = float((effectifs * ((centres - centre_global) ** 2).sum(axis=1)).sum())
+    intra = float(somme_carres.sum())
+    calinski = inter * (n - k_effectif) / (intra * (k_effectif - 1)) if intra > 0 and k_effectif > 1 else 1.0
+
+    # Davies–Bouldin : moyenne sur les clusters du pire rapport (S_i + S_j) / d(c_i, c_j)
+    dispersion = somme_distances[non_vides] / effectifs[non_vides]
+    c_valides = centres[non_vides]
+    ecarts = np.linalg.norm(c_valides[:, None, :] - c_valides[None, :, :], axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rapports = (dispersion[:, None] + dispersion[None, :]) / ecarts
+    rapports[~np.isfinite(rapports)] = 0.0
+    np.fill_diagonal(rapports, 0.0)
+    davies = float(rapports.max(axis=1).mean())
+
+    silhouettes = []
+    for r in range(repetitions):
+        X_echantillon = np.concatenate([gardes[r][c][1] for c in range(k)])
+        labels_echantillon = np.concatenate([np.full(len(gardes[r][c][1]), c) for c in range(k)])
+        silhouettes.append(float(silhouette_score(X_echantillon, labels_echantillon)))
+    silhouettes = np.array(silhouettes)
+    moyenne = float(silhouettes.mean())
+    if repetitions > 1:
+        demi_largeur = float(stats.t.ppf(0.975, repetitions - 1) * silhouettes.std(ddof=1) / math.sqrt(repetitions))
+    else:
+        demi_largeur = float('nan')
+
+    return {
+        'inertie': intra,
+        'calinski_harabasz': calinski,
+        'davies_bouldin': davies,
+        'silhouette': moyenne,
+        'silhouette_ic_bas': moyenne - demi_largeur,
+        'silhouette_ic_haut': moyenne + demi_largeur,
+        'echantillon': int(quotas.sum()),
+        'effectifs': effectifs.tolist(),
+    }
+
+
+def silhouette_stratifiee(X, labels, taille_echantillon=2000, repetitions=10, graine=42):
+    """
+    Silhouette moyenne sur `repetitions` échantillons stratifiés par `labels` (mêmes
+    quotas que criteres_flux), pour des labels déjà calculés en mémoire.
+    """
+    from sklearn.metrics import silhouette_score
+
+    X = np.asarray(X, dtype=np.float64)
+    effectifs = np.bincount(labels)
+    quotas = _quotas(effectifs, taille_echantillon)
+    groupes = [np.flatnonzero(labels == c) for c in range(len(effectifs))]
+    silhouettes = []
+    for r in range(repetitions):
+        rng = np.random.default_rng([graine, r])
+        indices = np.concatenate([rng.choice(g, quotas[c], replace=False) for c, g in enumerate(groupes) if len(g)])
+        silhouettes.append(float(silhouette_score(X[indices], labels[indices])))
+    return float(np.mean(silhouettes))
+
+
+# Critères de choix de K : nom -> True si plus grand est meilleur
+CRITERES = {'silhouette': True, 'calinski_harabasz': True, 'davies_bouldin': False}
+
+
+def choisir_k(balayage, critere='silhouette'):
+    """K du meilleur candidat selon le critère (égalité : le plus petit K)"""
+    signe = 1 if CRITERES[critere] else -1
+    return max(balayage, key=lambda ligne: (signe * ligne[critere], -ligne['k']))['k']
+
+
+def balayage_minibatch(source, k_candidats, random_state=42, batch_size=4096, epoques=1, pas_min=100,
+                       taille_echantillon=2000, repetitions=10):
+    """Une ligne par K : critères en flux du MiniBatchKMeans entraîné sur la source"""
+    lignes = []
+    for k in k_candidats:
+        modele = ajuster_minibatch(source, k, random_state, batch_size, epoques, pas_min)
+        criteres = criteres_flux(source, modele, taille_echantillon, repetitions, graine=random_state)
+        lignes.append(dict(k=k, **{cle: v for cle, v in criteres.items() if cle != 'effectifs'}))
+    return lignes
+
+
+# =============================================================================
+# WARD HIÉRARCHIQUE À GRANDE ÉCHELLE (BIRCH + WARD PONDÉRÉ, WARD SUR GRAPHE kNN)
+# =============================================================================
+# AgglomerativeClustering(linkage='ward') sans contrainte passe par la matrice des
+# distances condensée : n(n-1)/2 flottants, soit 40 Go à 100k lignes. Deux chemins :
+#
+# - birch_ward : BIRCH résume le flux en sous-clusters (rayon <= threshold), puis
+#   Ward pondéré par les effectifs agglomère leurs centres (chaîne des plus proches
+#   voisins, mémoire O(m·d) pour m sous-clusters). Le nombre de sous-clusters dépend
+#   de threshold et de la géométrie, pas de n : les variables one-hot séparent les
+#   combinaisons sex/smoker/region, le seuil découpe les 3 numériques mises à l'échelle.
+#   Un nouveau client est affecté via son sous-cluster BIRCH le plus proche.
+# - ward_knn : Ward contraint au graphe des k plus proches voisins (scikit-learn),
+#   mémoire O(n·k) ; en mémoire uniquement, sans affectation de nouveaux points.
+
+def ward_pondere(centres, poids, n_clusters):
+    """
+    Ward sur des points pondérés (centres de sous-clusters) : étiquette de chaque
+    point dans la partition en n_clusters. Avec des poids à 1, même partition que
+    AgglomerativeClustering(linkage='ward').
+    """
+    C = np.array(centres, dtype=np.float64)
+    W = np.array(poids, dtype=np.float64)
+    m = len(C)
+    actifs = np.ones(m, dtype=bool)
+    fusions = []
+    chaine = []
+    restants = m
+    # Chaîne des plus proches voisins : Ward est réductible, chaque paire de voisins
+    # réciproques peut être fusionnée dès qu'elle est trouvée
+    while restants > 1:
+        if not chaine:
+            chaine.append(int(np.flatnonzero(actifs)[0]))
+        a = chaine[-1]
+        couts = W[a] * W / (W[a] + W) * ((C - C[a]) ** 2).sum(axis=1)
+        couts[~actifs] = np.inf
+        couts[a] = np.inf
+        b = int(couts.argmin())
+        # Égalité avec le prédécesseur : on le préfère, sinon la chaîne peut boucler
+        if len(chaine) > 1 and couts[chaine[-2]] <= couts[b]:
+            b = chaine[-2]
+        if len(chaine) > 1 and b == chaine[-2]:
+            chaine.pop()
+            chaine.pop()
+            fusions.append((couts[b], a, b))
+            C[a] = (W[a] * C[a] + W[b] * C[b]) / (W[a] + W[b])
+            W[a] += W[b]
+            actifs[b] = False
+            restants -= 1
+        else:
+            chaine.append(b)
+
+    # Partition en n_clusters : les m - n_clusters fusions de plus faible coût
+    parent = np.arange(m)
+
+    def racine(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for _, a, b in sorted(fusions)[:m - n_clusters]:
+        parent[racine(b)] = racine(a)
+    racines = np.array([racine(i) for i in range(m)])
+    return np.unique(racines, return_inverse=True)[1]
+
+
+class BirchWard:
+    """BIRCH en flux + Ward pondéré sur les sous-clusters ; predict() pour toute ligne"""
+
+    def __init__(self, n_clusters, threshold=0.15, branching_factor=50):
+        self.n_clusters = n_clusters
+        self.threshold = threshold
+        self.branching_factor = branching_factor
+
+    def fit(self, source):
+        from sklearn.cluster import Birch
+
+        self.birch = Birch(threshold=self.threshold, branching_factor=self.branching_factor, n_clusters=None)
+        for lot in source():
+            self.birch.partial_fit(lot)
+        centres = self.birch.subcluster_centers_
+        # Effectifs par sous-cluster selon l'affectation utilisée ensuite par predict()
+        poids = np.zeros(len(centres), dtype=np.int64)
+        for lot in source():
+            poids += np.bincount(self.birch.predict(lot), minlength=len(centres))
+        garder = poids > 0
+        self.etiquettes_sous_clusters = np.empty(len(centres), dtype=np.int64)
+        self.etiquettes_sous_clusters[garder] = ward_pondere(centres[garder], poids[garder], self.n_clusters)
+        # Sous-cluster sans ligne d'entraînement : étiquette du sous-cluster non vide le plus proche
+        if not garder.all():
+            vides, pleins = np.flatnonzero(~garder), np.flatnonzero(garder)
+            distances = ((centres[vides, None, :] - centres[None, pleins, :]) ** 2).sum(axis=2)
+            self.etiquettes_sous_clusters[vides] = self.etiquettes_sous_clusters[pleins[distances.argmin(axis=1)]]
+        self.poids_sous_clusters = poids
+        return self
+
+    @property
+    def n_sous_clusters(self):
+        return int((self.poids_sous_clusters > 0).sum())
+
+    def predict(self, X):
+        return self.etiquettes_sous_clusters[self.birch.predict(X)]
+
+
+def connectivite_knn(X, n_voisins=10):
+    """
+    Graphe kNN rendu connexe : les composantes (nombreuses avec les variables one-hot)
+    sont reliées deux à deux par leurs représentants (premier point de chacune), au
+    lieu de calculer les distances entre tous les points de chaque paire de composantes.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    from sklearn.neighbors import kneighbors_graph
+
+    graphe = kneighbors_graph(X, n_neighbors=n_voisins, include_self=False)
+    graphe = graphe + graphe.T
+    n_composantes, composantes = connected_components(graphe, directed=False)
+    if n_composantes == 1:
+        return graphe
+    representants = np.unique(composantes, return_index=True)[1]
+    i, j = np.triu_indices(n_composantes, 1)
+    liens = coo_matrix((np.ones(len(i)), (representants[i], representants[j])), shape=graphe.shape)
+    return (graphe + liens + liens.T).tocsr()
+
+
+def ward_knn(X, n_clusters, n_voisins=10):
+    """Ward contraint au graphe kNN connexe"""
+    from sklearn.cluster import AgglomerativeClustering
+
+    connectivite = connectivite_knn(X, n_voisins)
+    return AgglomerativeClustering(n_clusters=n_clusters, linkage='ward', connectivity=connectivite).fit_predict(X)
+
+
+# =============================================================================
+# BENCHMARK DE MONTÉE EN CHARGE
+# =============================================================================
+
+def source_synthetique(X_reference, n, taille_lot=TAILLE_LOT, graine=42, bruit=0.01):
+    """
+    n lignes tirées avec remise de X_reference, bruit gaussien sur les colonnes
+    numériques (les 3 premières, bornées à [0, 1]) ; générées lot par lot, jamais en entier.
+    """
+    X_reference = np.asarray(X_reference, dtype=np.float64)
+
+    def lots():
+        for i, debut in enumerate(range(0, n, taille_lot)):
+            rng = np.random.default_rng([graine, i])
+            lot = X_reference[rng.integers(0, len(X_reference), min(taille_lot, n - debut))]
+            lot[:, :3] = np.clip(lot[:, :3] + rng.normal(0, bruit, (len(lot), 3)), 0, 1)
+            yield lot
+    return lots
+
+
+def mesurer(fonction):
+    """(résultat, durée en s, pic mémoire alloué en Mo) ; les tableaux NumPy sont suivis par tracemalloc"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    debut = time.perf_counter()
+    try:
+        resultat = fonction()
+        return resultat, time.perf_counter() - debut, tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    finally:
+        tracemalloc.stop()
+
+
+def benchmark(X_reference, tailles, k=4, max_exact_kmeans=100_000, max_exact_silhouette=20_000):
+    """Par taille : MiniBatchKMeans + critères en flux vs KMeans(n_init=10) + silhouette exacte"""
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+
+    lignes = []
+    for n in tailles:
+        source = source_synthetique(X_reference, n)
+        modele, duree_fit, memoire_fit = mesurer(lambda: ajuster_minibatch(source, k))
+        criteres, duree_criteres, memoire_criteres = mesurer(lambda: criteres_flux(source, modele))
+        ligne = {
+            'lignes': n,
+            'minibatch_fit_s': round(duree_fit, 2),
+            'criteres_flux_s': round(duree_criteres, 2),
+            'pic_flux_mo': round(max(memoire_fit, memoire_criteres), 1),
+            'silhouette_ech': round(criteres['silhouette'], 4),
+            'ic95': round((criteres['silhouette_ic_haut'] - criteres['silhouette_ic_bas']) / 2, 4),
+            'kmeans_exact_s': None,
+            'silhouette_exacte_s': None,
+            'silhouette_exacte': None,
+            'pic_exact_mo': None,
+        }
+        if n <= max_exact_kmeans:
+            X = np.concatenate(list(source()))
+            exact, duree, memoire = mesurer(
+                lambda: KMeans(n_clusters=k, random_state=42, n_init=10).fit_predict(X))
+            ligne.update(kmeans_exact_s=round(duree, 2), pic_exact_mo=round(memoire, 1))
+            if n <= max_exact_silhouette:
+                score, duree, memoire = mesurer(lambda: silhouette_score(X, exact))
+                ligne.update(silhouette_exacte_s=round(duree, 2), silhouette_exacte=round(float(score), 4),
+                             pic_exact_mo=round(max(ligne['pic_exact_mo'], memoire), 1))
+        lignes.append(ligne)
+        print(ligne, flush=True)
+    return pd.DataFrame(lignes)
+
+
+def benchmark_hierarchique(X_reference, tailles, k=4, max_ward_knn=100_000):
+    """Par taille : temps, pic mémoire et ARI vs MiniBatchKMeans de birch_ward et ward_knn"""
+    from sklearn.metrics import adjusted_rand_score
+
+    lignes = []
+    for n in tailles:
+        source = source_synthetique(X_reference, n)
+        modele, duree, memoire = mesurer(lambda: BirchWard(k).fit(source))
+        kmeans = ajuster_minibatch(source, k)
+        labels_kmeans = np.concatenate([kmeans.predict(lot) for lot in source()])
+        labels_birch = np.concatenate([modele.predict(lot) for lot in source()])
+        ligne = {
+            'lignes': n,
+            'birch_ward_s': round(duree, 2),
+            'pic_birch_ward_mo': round(memoire, 1),
+            'sous_clusters': modele.n_sous_clusters,
+            'ari_birch_ward': round(adjusted_rand_score(labels_kmeans, labels_birch), 4),
+            'ward_knn_s': None,
+            'pic_ward_knn_mo': None,
+            'ari_ward_knn': None,
+            # Ward sans contrainte : matrice des distances condensée (float64)
+            'ward_exact_estime_go': round(n * (n - 1) / 2 * 8 / 1024 ** 3, 2),
+        }
+        if n <= max_ward_knn:
+            X = np.concatenate(list(source()))
+            labels, duree, memoire = mesurer(lambda: ward_knn(X, k))
+            ligne.update(ward_knn_s=round(duree, 2), pic_ward_knn_mo=round(memoire, 1),
+                         ari_ward_knn=round(adjusted_rand_score(labels_kmeans, labels), 4))
+        lignes.append(ligne)
+        print(ligne, flush=True)
+    return pd.DataFrame(lignes)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Segmentation MiniBatchKMeans / BIRCH + Ward et critères en flux")
+    parser.add_argument('--benchmark', action='store_true', help="temps et mémoire selon le nombre de lignes")
+    parser.add_argument('--hierarchique', action='store_true', help="benchmark birch_ward / ward_knn")
+    parser.add_argument('--tailles', type=int, nargs='+',
+                        default=[1_000, 10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--echantillon', type=int, default=2000, help="taille de chaque échantillon de silhouette")
+    parser.add_argument('--repetitions', type=int, default=10)
+    args = parser.parse_args()
+
+    import train
+
+    p = train.PARAMETRES_DEFAUT
+    X = train.etape_encodage(p['encodage'], train.etape_nettoyage(p['nettoyage']))['X'].to_numpy()
+
+    if args.hierarchique:
+        print(benchmark_hierarchique(X, args.tailles).to_string(index=False))
+    elif args.benchmark:
+        print(benchmark(X, args.tailles).to_string(index=False))
+    else:
+        from sklearn.cluster import KMeans
+        from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score, silhouette_score
+
+        balayage = pd.DataFrame(balayage_minibatch(lots_tableau(X), p['clustering']['k_candidats'],
+                                                   taille_echantillon=args.echantillon,
+                                                   repetitions=args.repetitions))
+        exact = []
+        for k in balayage['k']:
+            labels = KMeans(n_clusters=k, random_state=42, n_init=10).fit_predict(X)
+            exact.append({'k': k, 'silhouette_exacte': silhouette_score(X, labels),
+                          'ch_exact': calinski_harabasz_score(X, labels), 'db_exact': davies_bouldin_score(X, labels)})
+        print(balayage.merge(pd.DataFrame(exact), on='k').to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+        for critere in CRITERES:
+            print(f"✅ K retenu ({critere}) : {choisir_k(balayage.to_dict('records'), critere)}")
@@ -0,0 +1,84 @@
+import argparse
+import os
+import shlex
+import sys
+
+# =============================================================================
+# PROFIL DE SERVICE EN PRODUCTION
+# =============================================================================
+# Lance gunicorn (multi-processus) avec gunicorn.conf.py : modèles préchargés dans
+# le maître puis partagés par fork, keep-alive et timeouts explicites, debug désactivé.
+#
+#   python serve.py                          # WSGI, app2:app
+#   python serve.py --asgi                   # ASGI micro-batché, asgi_app:app (uvicorn)
+#   python serve.py --workers 4 --threads 2 --dry-run
+#
+# Les options ont des équivalents en variables d'environnement (WORKERS, THREADS...)
+# pour les déploiements conteneurisés.
+
+
+def workers_par_defaut():
+    """Un worker par cœur : /predict est limité par le CPU (XGBoost), pas par les E/S"""
+    return os.cpu_count() or 1
+
+
+def construire_commande(args):
+    """Ligne de commande gunicorn correspondant aux options"""
+    commande = [
+        sys.executable, '-m', 'gunicorn',
+        '--config', 'gunicorn.conf.py',
+        '--bind', args.bind,
+        '--workers', str(args.workers),
+        '--keep-alive', str(args.keepalive),
+        '--timeout', str(args.timeout),
+        '--graceful-timeout', str(args.graceful_timeout),
+        '--log-level', args.log_level,
+    ]
+    if args.max_requests:
+        commande += ['--max-requests', str(args.max_requests),
+                     '--max-requests-jitter', str(max(1, args.max_requests // 10))]
+
+    if args.asgi:
+        # La boucle asyncio gère la concurrence : pas de threads par worker
+        commande += ['--worker-class', 'uvicorn.workers.UvicornWorker', 'asgi_app:app']
+    else:
+        # gthread même avec un seul thread : le worker sync ignore --keep-alive
+        commande += ['--worker-class', 'gthread', '--threads', str(args.threads)]
+        commande += ['app2:app']
+    return commande
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur de production (gunicorn, debug désactivé)")
+    parser.add_argument('--bind', default=os.environ.get('BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WORKERS', workers_par_defaut())))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('THREADS', 2)),
+                        help="threads par worker (WSGI uniquement)")
+    parser.add_argument('--asgi', action='store_true', default=os.environ.get('SERVER_MODE') == 'asgi',
+                        help="worker uvicorn et micro-batching de /predict (asgi_app.py)")
+    parser.add_argument('--no-preload', dest='preload', action='store_false',
+                        default=os.environ.get('PRELOAD', '1') == '1',
+                        help="chaque worker charge ses propres modèles")
+    parser.add_argument('--keepalive', type=int, default=int(os.environ.get('KEEPALIVE', 5)),
+                        help="secondes d'attente d'une requête sur une connexion keep-alive")
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('TIMEOUT', 30)),
+                        help="un worker bloqué plus longtemps est redémarré")
+    parser.add_argument('--graceful-timeout', type=int, default=int(os.environ.get('GRACEFUL_TIMEOUT', 30)))
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('MAX_REQUESTS', 0)),
+                        help="recycle un worker après N requêtes (0 : jamais)")
+    parser.add_argument('--log-level', default=os.environ.get('LOG_LEVEL', 'info'))
+    parser.add_argument('--dry-run', action='store_true', help="affiche la commande sans la lancer")
+    args = parser.parse_args(argv)
+
+    commande = construire_commande(args)
+    # gunicorn.conf.py lit PRELOAD ; FLASK_DEBUG forcé à 0 (pas de débogueur interactif)
+    env = dict(os.environ, PRELOAD='1' if args.preload else '0', FLASK_DEBUG='0')
+
+    print(f"🚀 {shlex.join(commande)}  (PRELOAD={env['PRELOAD']})")
+    if args.dry_run:
+        return
+    os.execvpe(commande[0], commande, env)
+
+
+if __name__ == '__main__':
+    main()
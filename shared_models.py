@@ -0,0 +1,63 @@
+import os
+
+import numpy as np
+
+from native_export import ATTRIBUTS_ARBRE, ParametresArbre
+
+# =============================================================================
+# PARTAGE DES MODÈLES ENTRE WORKERS PRÉ-FORKÉS
+# =============================================================================
+# Les tableaux d'arbres sont écrits en .npy non compressés dans models/partage/
+# puis ouverts avec mmap_mode='r' : les pages vivent dans le cache du noyau et
+# sont partagées par tous les processus, sans copie par worker.
+# Le booster XGBoost, lui, est chargé une seule fois dans le maître (preload_app)
+# et hérité par fork ; voir gunicorn.conf.py.
+
+DOSSIER_PARTAGE = 'partage'
+
+
+def exporter_tableaux_partages(arbre, dossier='models'):
+    """Écrit les tableaux de l'arbre en .npy mappables (lecture seule côté workers)"""
+    cible = os.path.join(dossier, DOSSIER_PARTAGE)
+    os.makedirs(cible, exist_ok=True)
+    for nom in ATTRIBUTS_ARBRE:
+        np.save(os.path.join(cible, f'clf_{nom}.npy'), np.ascontiguousarray(getattr(arbre, nom)))
+    np.save(os.path.join(cible, 'clf_classes.npy'), np.array([str(c) for c in arbre.classes_]))
+    np.save(os.path.join(cible, 'clf_features.npy'),
+            np.array([str(n) for n in arbre.feature_names_in_]))
+
+def attacher_arbre(dossier_partage):
+    """Attache les tableaux de l'arbre en mémoire mappée (aucune copie)"""
+    tableaux = {
+        nom: np.load(os.path.join(dossier_partage, f'clf_{nom}.npy'), mmap_mode='r')
+        for nom in ATTRIBUTS_ARBRE
+    }
+    classes = np.load(os.path.join(dossier_partage, 'clf_classes.npy')).astype(object)
+    features = np.load(os.path.join(dossier_partage, 'clf_features.npy')).astype(object)
+    return ParametresArbre(classes, features, **tableaux)
+
+def mesurer_memoire():
+    """
+    Mémoire du processus courant d'après /proc/self/smaps_rollup (Linux), en Mo :
+    RSS, PSS, USS (pages privées) et pages partagées.
+    """
+    valeurs = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for ligne in f:
+                morceaux = ligne.split()
+                if len(morceaux) >= 3 and morceaux[2] == 'kB':
+                    valeurs[morceaux[0].rstrip(':')] = int(morceaux[1])
+    except OSError:
+        return {'pid': os.getpid(), 'disponible': False}
+
+    prive = valeurs.get('Private_Clean', 0) + valeurs.get('Private_Dirty', 0)
+    partage = valeurs.get('Shared_Clean', 0) + valeurs.get('Shared_Dirty', 0)
+    return {
+        'pid': os.getpid(),
+        'disponible': True,
+        'rss_mo': round(valeurs.get('Rss', 0) / 1024, 1),
+        'pss_mo': round(valeurs.get('Pss', 0) / 1024, 1),
+        'uss_mo': round(prive / 1024, 1),
+        'partage_mo': round(partage / 1024, 1),
+    }
@@ -0,0 +1,201 @@
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import subprocess
+
+from flask import abort, request, send_file, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# =============================================================================
+# FICHIERS STATIQUES EMPREINTÉS ET PRÉCOMPRESSÉS
+# =============================================================================
+# Étape de build (après modification de static/ ou de frontend/) :
+#
+#   python static_assets.py                 # empreinte + gzip / brotli -> static/dist/
+#   python static_assets.py --plotly        # reconstruit d'abord le bundle Plotly réduit (npm)
+#
+# - Plotly : bundle réduit au cœur + trace indicator (frontend/, esbuild), vendu dans
+#   static/vendor/plotly-indicator.min.js, de la version de plotly.js embarquée par le
+#   paquet Python plotly de requirements.txt. S'il n'a pas été construit, la page
+#   garde le CDN Plotly (même version) : le bundle complet n'est pas auto-hébergé.
+# - Chaque fichier est copié sous static/dist/<nom>.<empreinte>.<ext> avec ses
+#   variantes .gz et .br ; static/dist/manifest.json associe nom logique -> fichier.
+# - Flask sert /assets/<fichier> en choisissant la variante selon Accept-Encoding,
+#   avec Cache-Control immutable d'un an : le nom change quand le contenu change.
+#   Sans build (développement), asset_url() retombe sur /static ou le CDN.
+
+DOSSIER_STATIC = 'static'
+DOSSIER_DIST = os.path.join(DOSSIER_STATIC, 'dist')
+FICHIER_MANIFESTE = 'manifest.json'
+BUNDLE_PLOTLY = os.path.join(DOSSIER_STATIC, 'vendor', 'plotly-indicator.min.js')
+
+# plotly.js embarqué par plotly==5.15.0 (requirements.txt) ; frontend/package.json le suit
+VERSION_PLOTLY_JS = '2.24.1'
+
+# Nom logique -> source (None : bundle Plotly, résolu par source_plotly())
+SOURCES = {
+    'style.css': os.path.join(DOSSIER_STATIC, 'style.css'),
+    'plotly.min.js': None,
+}
+
+# Sans build : URL utilisée pour les fichiers absents de static/
+REPLIS_CDN = {
+    'plotly.min.js': f'https://cdn.plot.ly/plotly-{VERSION_PLOTLY_JS}.min.js',
+}
+
+CACHE_IMMUABLE = 'public, max-age=31536000, immutable'
+
+# Encodages servis, par ordre de préférence, et extension de la variante
+ENCODAGES = (('br', '.br'), ('gzip', '.gz'))
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def construire_bundle_plotly(dossier_frontend='frontend'):
+    """npm ci (ou npm install sans package-lock.json) + esbuild : écrit static/vendor/plotly-indicator.min.js"""
+    # Versions exactes dans package.json : npm install crée le package-lock.json à committer,
+    # npm ci le respecte ensuite
+    installation = 'ci' if os.path.exists(os.path.join(dossier_frontend, 'package-lock.json')) else 'install'
+    subprocess.run(['npm', installation], cwd=dossier_frontend, check=True)
+    subprocess.run(['npm', 'run', 'build'], cwd=dossier_frontend, check=True)
+    return BUNDLE_PLOTLY
+
+
+def source_plotly():
+    """Bundle réduit s'il existe, sinon None (la page garde le CDN)"""
+    if os.path.exists(BUNDLE_PLOTLY):
+        return BUNDLE_PLOTLY
+    # Le bundle complet (4.7 Mo) alourdirait la page par rapport au CDN : pas de repli local
+    logging.warning("Bundle Plotly réduit absent (%s) : CDN Plotly conservé (python static_assets.py --plotly)",
+                    BUNDLE_PLOTLY)
+    return None
+
+
+def empreinte_fichier(chemin):
+    with open(chemin, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def precompresser(chemin):
+    """Écrit <chemin>.gz (niveau 9) et <chemin>.br (qualité 11) ; retourne les tailles"""
+    with open(chemin, 'rb') as f:
+        contenu = f.read()
+    tailles = {'brut': len(contenu)}
+
+    # mtime=0 : même contenu -> mêmes octets d'un build à l'autre
+    with open(chemin + '.gz', 'wb') as f:
+        f.write(gzip.compress(contenu, compresslevel=9, mtime=0))
+    tailles['gzip'] = os.path.getsize(chemin + '.gz')
+
+    if brotli is not None:
+        with open(chemin + '.br', 'wb') as f:
+            f.write(brotli.compress(contenu, quality=11))
+        tailles['br'] = os.path.getsize(chemin + '.br')
+    else:
+        logging.warning("Module brotli absent : pas de variante .br pour %s", chemin)
+    return tailles
+
+
+def construire_assets(sources=None, dossier_dist=DOSSIER_DIST):
+    """Copie empreintée + variantes compressées de chaque source ; écrit le manifeste"""
+    sources = dict(SOURCES if sources is None else sources)
+    if sources.get('plotly.min.js', '') is None:
+        sources['plotly.min.js'] = source_plotly()
+        if sources['plotly.min.js'] is None:
+            del sources['plotly.min.js']
+
+    # Un build repart de zéro : pas d'anciennes empreintes servies par erreur
+    shutil.rmtree(dossier_dist, ignore_errors=True)
+    os.makedirs(dossier_dist)
+
+    manifeste, rapport = {}, {}
+    for nom, source in sources.items():
+        base, extension = os.path.splitext(nom)
+        fichier = f'{base}.{empreinte_fichier(source)}{extension}'
+        shutil.copyfile(source, os.path.join(dossier_dist, fichier))
+        manifeste[nom] = fichier
+        rapport[nom] = dict(precompresser(os.path.join(dossier_dist, fichier)), fichier=fichier, source=source)
+
+    with open(os.path.join(dossier_dist, FICHIER_MANIFESTE), 'w', encoding='utf-8') as f:
+        json.dump(manifeste, f, indent=2)
+    return rapport
+
+
+# =============================================================================
+# SERVICE PAR FLASK
+# =============================================================================
+
+class AssetsStatiques:
+    """URLs empreintées pour les templates et service des variantes précompressées"""
+
+    def __init__(self, dossier_dist=DOSSIER_DIST):
+        self.dossier_dist = os.path.abspath(dossier_dist)
+        chemin = os.path.join(self.dossier_dist, FICHIER_MANIFESTE)
+        self.manifeste = {}
+        if os.path.exists(chemin):
+            with open(chemin, encoding='utf-8') as f:
+                self.manifeste = json.load(f)
+        else:
+            logging.warning("%s absent : fichiers statiques non empreintés (python static_assets.py)", chemin)
+        # Seuls les fichiers du manifeste sont servis (pas de chemin arbitraire)
+        self._fichiers = set(self.manifeste.values())
+
+    def url(self, nom):
+        """URL d'un fichier statique par son nom logique (asset_url dans les templates)"""
+        fichier = self.manifeste.get(nom)
+        if fichier is not None:
+            return f'/assets/{fichier}'
+        if nom in REPLIS_CDN:
+            return REPLIS_CDN[nom]
+        return url_for('static', filename=nom)
+
+    def variante(self, fichier, accept_encoding):
+        """(chemin, Content-Encoding) de la meilleure variante acceptée par le client"""
+        chemin = os.path.join(self.dossier_dist, fichier)
+        for encodage, extension in ENCODAGES:
+            if accept_encoding[encodage] and os.path.exists(chemin + extension):
+                return chemin + extension, encodage
+        return chemin, None
+
+    def servir(self, fichier):
+        if fichier not in self._fichiers:
+            abort(404)
+        chemin, encodage = self.variante(fichier, request.accept_encodings)
+        mimetype = mimetypes.guess_type(fichier)[0] or 'application/octet-stream'
+        reponse = send_file(chemin, mimetype=mimetype, conditional=True, etag=True)
+        if encodage is not None:
+            reponse.headers['Content-Encoding'] = encodage
+        reponse.headers['Vary'] = 'Accept-Encoding'
+        reponse.headers['Cache-Control'] = CACHE_IMMUABLE
+        return reponse
+
+    def enregistrer(self, app):
+        """Route /assets/<fichier> et fonction asset_url() dans les templates"""
+        app.add_url_rule('/assets/<path:fichier>', 'assets', self.servir)
+        app.jinja_env.globals['asset_url'] = self.url
+        return self
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Empreinte et précompresse les fichiers statiques")
+    parser.add_argument('--plotly', action='store_true', help="reconstruit le bundle Plotly réduit (npm, esbuild)")
+    args = parser.parse_args()
+
+    if args.plotly:
+        construire_bundle_plotly()
+
+    for nom, r in construire_assets().items():
+        tailles = ', '.join(f"{cle} {r[cle] / 1024:.1f} Ko" for cle in ('brut', 'gzip', 'br') if cle in r)
+        print(f"✅ {nom:>14} -> {DOSSIER_DIST}/{r['fichier']} ({tailles}) [{r['source']}]")
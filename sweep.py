@@ -0,0 +1,412 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# BALAYAGES PARALLÈLES (SÉLECTION D'HYPERPARAMÈTRES ET DE MODÈLES)
+# =============================================================================
+# Les boucles de sélection des notebooks (K de KMeans + silhouette, k du KNN,
+# régression linéaire vs XGBoost) deviennent des listes de candidats évalués par
+# un pool de processus. Chaque candidat est un dict de paramètres ('tache' et
+# 'donnees' : nom d'un jeu de données du moteur) ; les jeux de données sont copiés
+# une seule fois par worker (initializer), pas à chaque tâche.
+#
+# - Déterminisme : chaque candidat porte sa graine (random_state explicite, sinon
+#   dérivée de sa description), donc le résultat ne dépend ni du nombre de workers
+#   ni de l'ordre de fin des tâches. workers=1 exécute les mêmes fonctions dans le
+#   processus courant, sans pool (comportement des boucles d'origine).
+# - Un thread de calcul par worker (threadpoolctl, nthread XGBoost) : N workers
+#   occupent N cœurs sans sursouscription OpenMP / BLAS.
+# - Workers démarrés par forkserver, modules préchargés : pas de fork d'un processus
+#   dont le pool OpenMP a déjà servi, et pas de ré-import de scikit-learn par tâche.
+# - Annulation anticipée (patience) : sur un hyperparamètre ordonné, dès que les
+#   `patience` candidats qui suivent le meilleur (dans l'ordre donné) sont terminés
+#   sans l'améliorer, les candidats encore en file sont annulés. La sélection ne
+#   porte que sur ce préfixe : elle est identique quel que soit le parallélisme.
+#
+#   python sweep.py --workers 4         # temps série vs pool, tableaux identiques
+
+MODULES_PRECHARGES = ['sweep', 'train', 'segmentation', 'numpy', 'pandas', 'sklearn.cluster', 'sklearn.metrics',
+                      'sklearn.neighbors', 'sklearn.linear_model', 'xgboost']
+
+# Jeux de données et nombre de threads du processus (remplis par l'initializer dans les workers)
+_donnees = {}
+_etat = {'threads': None}
+
+
+def graine_candidat(candidat, graine_base=42):
+    """Graine stable dérivée de la description du candidat (indépendante de l'ordonnancement)"""
+    texte = json.dumps(candidat, sort_keys=True, default=str)
+    return int(hashlib.sha256(f'{graine_base}:{texte}'.encode('utf-8')).hexdigest()[:8], 16)
+
+
+def fixer_graine(candidat):
+    """Complète la graine d'un candidat qui n'en donne pas (random_state / seed XGBoost)"""
+    if candidat['tache'] in ('kmeans', 'minibatch_kmeans') and 'random_state' not in candidat:
+        candidat['random_state'] = graine_candidat(candidat)
+    elif candidat['tache'] in ('xgboost', 'xgb_cv') and 'seed' not in candidat['params']:
+        candidat['params'] = dict(candidat['params'], seed=graine_candidat(candidat))
+    return candidat
+
+
+# =============================================================================
+# TÂCHES (une par famille de candidats)
+# =============================================================================
+
+def _tache_kmeans(c):
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import calinski_harabasz_score, davies_bouldin_score, silhouette_score
+
+    X = _donnees[c['donnees']]
+    kmeans = KMeans(n_clusters=c['k'], random_state=c['random_state'], n_init=c.get('n_init', 10))
+    labels = kmeans.fit_predict(X)
+    return {
+        'inertie': float(kmeans.inertia_),
+        'silhouette': float(silhouette_score(X, labels)),
+        'calinski_harabasz': float(calinski_harabasz_score(X, labels)),
+        'davies_bouldin': float(davies_bouldin_score(X, labels)),
+    }, None
+
+
+def _tache_minibatch_kmeans(c):
+    from segmentation import ajuster_minibatch, criteres_flux, lots_tableau
+
+    source = lots_tableau(_donnees[c['donnees']])
+    modele = ajuster_minibatch(source, c['k'], c['random_state'], c['batch_size'], c['epoques'], c['pas_min'])
+    criteres = criteres_flux(source, modele, c['taille_echantillon'], c['repetitions'], graine=c['random_state'])
+    criteres.pop('effectifs')
+    return criteres, None
+
+
+def _tache_knn(c):
+    from sklearn.neighbors import KNeighborsClassifier
+
+    X_train, y_train, X_test, y_test = _donnees[c['donnees']]
+    modele = KNeighborsClassifier(n_neighbors=c['k']).fit(X_train, y_train)
+    return {'accuracy': float(modele.score(X_test, y_test))}, None
+
+
+def _tache_regression_lineaire(c):
+    from sklearn.linear_model import LinearRegression
+
+    from train import evaluer_regression
+
+    X_train, y_train, X_test, y_test = _donnees[c['donnees']]
+    modele = LinearRegression().fit(X_train, y_train)
+    predictions = modele.predict(X_test)
+    return dict(evaluer_regression(y_test, predictions), predictions=predictions), modele
+
+
+def _tache_xgboost(c):
+    import xgboost as xgb
+
+    from train import evaluer_regression
+
+    X_train, y_train, X_test, y_test = _donnees[c['donnees']]
+    params = dict(c['params'])
+    if _etat['threads'] is not None:
+        params['nthread'] = _etat['threads']
+    dtrain = xgb.DMatrix(X_train, label=y_train)
+    dtest = xgb.DMatrix(X_test, label=y_test)
+    # early_stopping_rounds=None : nombre d'itérations fixé (choisi par validation croisée)
+    arret = c.get('early_stopping_rounds')
+    modele = xgb.train(
+        params=params,
+        dtrain=dtrain,
+        num_boost_round=c['num_boost_round'],
+        evals=[(dtrain, 'train'), (dtest, 'validation')] if arret is not None else (),
+        early_stopping_rounds=arret,
+        verbose_eval=False,
+    )
+    if _etat['threads'] is not None:
+        # Modèle exporté identique à celui d'un entraînement en série (nthread par défaut)
+        modele.set_param({'nthread': 0})
+    predictions = modele.predict(dtest)
+    metriques = dict(evaluer_regression(y_test, predictions), predictions=predictions)
+    metriques['meilleure_iteration'] = int(modele.best_iteration) if arret is not None else c['num_boost_round'] - 1
+    return metriques, modele
+
+
+def _tache_xgb_cv(c):
+    """xgb.cv à plis fixés (mêmes plis pour tous les candidats) avec early stopping"""
+    import xgboost as xgb
+    from sklearn.model_selection import KFold
+
+    X, y = _donnees[c['donnees']]
+    # Indices int32 : DMatrix.slice de XGBoost 1.7 refuse la copie implicite sous NumPy 2
+    plis = [(entrainement.astype(np.int32), validation.astype(np.int32))
+            for entrainement, validation in KFold(c['nfold'], shuffle=True, random_state=c['graine_plis']).split(X)]
+    params = dict(c['params'])
+    if _etat['threads'] is not None:
+        params['nthread'] = _etat['threads']
+    historique = xgb.cv(
+        params=params,
+        dtrain=xgb.DMatrix(X, label=y),
+        num_boost_round=c['num_boost_round'],
+        folds=plis,
+        early_stopping_rounds=c['early_stopping_rounds'],
+        as_pandas=True,
+    )
+    # Avec early stopping, l'historique s'arrête à la meilleure itération
+    meilleure = int(historique['test-rmse-mean'].to_numpy().argmin())
+    return {
+        'rmse_cv': float(historique['test-rmse-mean'].iloc[meilleure]),
+        'rmse_cv_std': float(historique['test-rmse-std'].iloc[meilleure]),
+        'rmse_entrainement': float(historique['train-rmse-mean'].iloc[meilleure]),
+        'iterations': meilleure + 1,
+    }, None
+
+
+TACHES = {
+    'kmeans': _tache_kmeans,
+    'minibatch_kmeans': _tache_minibatch_kmeans,
+    'knn': _tache_knn,
+    'regression_lineaire': _tache_regression_lineaire,
+    'xgboost': _tache_xgboost,
+    'xgb_cv': _tache_xgb_cv,
+}
+
+
+def _initialiser_worker(donnees, threads):
+    from threadpoolctl import threadpool_limits
+
+    _donnees.clear()
+    _donnees.update(donnees)
+    _etat['threads'] = threads
+    threadpool_limits(limits=threads)
+
+
+def _evaluer(candidat):
+    """Exécute un candidat ; retourne (métriques, modèle éventuel, durée en s)"""
+    debut = time.perf_counter()
+    metriques, modele = TACHES[candidat['tache']](candidat)
+    return metriques, modele, time.perf_counter() - debut
+
+
+# =============================================================================
+# MOTEUR
+# =============================================================================
+
+class ResultatBalayage:
+    """Tableau des candidats (une ligne chacun, dans l'ordre donné) et candidat retenu"""
+
+    def __init__(self, candidats, metriques, modeles, statuts, durees, critere, maximiser):
+        self.candidats = candidats
+        self.metriques = metriques
+        self.modeles = modeles
+        self.statuts = statuts
+        self.durees = durees
+        self.critere = critere
+        self.maximiser = maximiser
+
+    @property
+    def indice_meilleur(self):
+        retenus = [i for i, statut in enumerate(self.statuts) if statut == 'ok']
+        signe = 1 if self.maximiser else -1
+        # Égalité : le premier dans l'ordre des candidats, comme np.argmax dans les notebooks
+        return max(retenus, key=lambda i: (signe * self.metriques[i][self.critere], -i))
+
+    @property
+    def meilleur(self):
+        return self.candidats[self.indice_meilleur]
+
+    def tableau(self):
+        """DataFrame : paramètres, métriques scalaires, statut et durée de chaque candidat"""
+        lignes = []
+        for candidat, metriques, statut, duree in zip(self.candidats, self.metriques, self.statuts, self.durees):
+            ligne = {cle: valeur for cle, valeur in candidat.items() if np.isscalar(valeur)}
+            if metriques is not None:
+                ligne.update({cle: valeur for cle, valeur in metriques.items() if np.isscalar(valeur)})
+            ligne.update(statut=statut, duree_s=round(duree, 4) if duree is not None else None)
+            lignes.append(ligne)
+        return pd.DataFrame(lignes)
+
+
+class MoteurBalayage:
+    """
+    Évalue des candidats dans un pool de processus (ou en série si workers=1).
+    À utiliser comme gestionnaire de contexte pour réutiliser le pool entre balayages.
+    """
+
+    def __init__(self, donnees, workers=None, threads_par_worker=1):
+        self.donnees = donnees
+        self.workers = workers or os.cpu_count() or 1
+        self.threads_par_worker = threads_par_worker
+        self._pool = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            contexte = multiprocessing.get_context('forkserver')
+            contexte.set_forkserver_preload(MODULES_PRECHARGES)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=contexte,
+                initializer=_initialiser_worker, initargs=(self.donnees, self.threads_par_worker),
+            )
+        return self
+
+    def __exit__(self, *exc):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def executer(self, candidats, critere, maximiser=True, patience=None, rappel=None):
+        """
+        Évalue les candidats (dans l'ordre donné) ; `patience` active l'annulation anticipée.
+        `rappel(candidat, metriques)` est appelé à chaque fin de candidat (sauvegarde au fil de l'eau).
+        """
+        candidats = [fixer_graine(dict(c)) for c in candidats]
+        n = len(candidats)
+        metriques, modeles = [None] * n, [None] * n
+        statuts, durees = ['annulé'] * n, [None] * n
+        limite = n
+
+        def terminer(i, resultat):
+            metriques[i], modeles[i], durees[i] = resultat
+            statuts[i] = 'ok'
+            if rappel is not None:
+                rappel(candidats[i], metriques[i])
+
+        def coupure():
+            """Fin du préfixe décisif (exclue) si la patience est épuisée, sinon None"""
+            if patience is None:
+                return None
+            signe = 1 if maximiser else -1
+            meilleur = None
+            for i in range(n):
+                if statuts[i] != 'ok':
+                    return None
+                valeur = signe * metriques[i][critere]
+                if meilleur is None or valeur > signe * metriques[meilleur][critere]:
+                    meilleur = i
+                elif i - meilleur >= patience:
+                    return i + 1
+            return None
+
+        if self._pool is None:
+            # Série, dans le processus courant (mêmes tâches que les workers)
+            _donnees.clear()
+            _donnees.update(self.donnees)
+            _etat['threads'] = None
+            for i, candidat in enumerate(candidats):
+                terminer(i, _evaluer(candidat))
+                limite = coupure() or n
+                if limite < n:
+                    break
+        else:
+            futurs = {self._pool.submit(_evaluer, candidat): i for i, candidat in enumerate(candidats)}
+            en_attente = set(futurs)
+            while en_attente:
+                finis, en_attente = wait(en_attente, return_when=FIRST_COMPLETED)
+                for futur in finis:
+                    if not futur.cancelled():
+                        terminer(futurs[futur], futur.result())
+                limite = coupure() or n
+                if limite < n:
+                    # Candidats pas encore démarrés : annulés ; ceux en cours : attendus puis écartés
+                    for futur in list(en_attente):
+                        if futur.cancel():
+                            en_attente.discard(futur)
+
+        # Hors du préfixe décisif : annulés, même si un worker les a terminés entre-temps
+        for i in range(limite, n):
+            metriques[i], modeles[i], durees[i], statuts[i] = None, None, None, 'annulé'
+        return ResultatBalayage(candidats, metriques, modeles, statuts, durees, critere, maximiser)
+
+
+# =============================================================================
+# COMPARAISON SÉRIE / PARALLÈLE
+# =============================================================================
+
+def balayages_reference(parametres=None):
+    """Jeux de données et balayages des deux notebooks (X complet, non-fumeurs, fumeurs, KNN, régression)"""
+    from sklearn.model_selection import train_test_split
+
+    import train
+
+    parametres = parametres or train.PARAMETRES_DEFAUT
+    encodage = train.etape_encodage(parametres['encodage'], train.etape_nettoyage(parametres['nettoyage']))
+    X = encodage['X']
+    fumeurs = X['smoker_yes'].to_numpy() == 1
+
+    p = parametres['classification']
+    charges = encodage['charges'].to_numpy()
+    y = train.classe_remboursement(charges, np.quantile(charges, p['quantiles']))
+    X_train, X_test, y_train, y_test = train_test_split(
+        X.values, y, test_size=p['test_size'], random_state=p['random_state'], stratify=y
+    )
+    regression = train.etape_separation(parametres['separation'], encodage)
+    r = parametres['regression']
+
+    donnees = {
+        'X': X.to_numpy(),
+        'non_fumeurs': X[~fumeurs].to_numpy(),
+        'fumeurs': X[fumeurs].to_numpy(),
+        'knn': (X_train, y_train, X_test, y_test),
+        'regression': (regression['X_train'], regression['y_train'], regression['X_test'], regression['y_test']),
+    }
+    c = parametres['clustering']
+    # Fumeurs : K < min(5, effectif - 1), comme dans ML.py
+    k_candidats = {
+        'X': c['k_candidats'],
+        'non_fumeurs': c['k_candidats'],
+        'fumeurs': [k for k in c['k_candidats'] if k < min(5, int(fumeurs.sum()) - 1)],
+    }
+    balayages = {
+        f'kmeans {nom}': ([{'tache': 'kmeans', 'donnees': nom, 'k': k, 'random_state': c['random_state'],
+                            'n_init': c['n_init']} for k in ks], 'silhouette', True)
+        for nom, ks in k_candidats.items()
+    }
+    balayages['knn'] = ([{'tache': 'knn', 'donnees': 'knn', 'k': k} for k in p['knn_k_candidats']],
+                        'accuracy', True)
+    balayages['regression'] = ([
+        {'tache': 'regression_lineaire', 'donnees': 'regression'},
+        {'tache': 'xgboost', 'donnees': 'regression', 'params': r['xgb'], 'num_boost_round': r['num_boost_round'],
+         'early_stopping_rounds': r['early_stopping_rounds']},
+    ], 'MAE', False)
+    return donnees, balayages
+
+
+def comparer(workers, patience=None):
+    """Durée totale des balayages en série puis avec `workers` processus ; tableaux comparés"""
+    donnees, balayages = balayages_reference()
+    mesures = {}
+    for mode, n in (('serie', 1), ('parallele', workers)):
+        debut = time.perf_counter()
+        with MoteurBalayage(donnees, workers=n) as moteur:
+            resultats = {nom: moteur.executer(candidats, critere, maximiser, patience)
+                         for nom, (candidats, critere, maximiser) in balayages.items()}
+        # Démarrage et arrêt du pool compris
+        mesures[mode] = {'duree_s': time.perf_counter() - debut, 'resultats': resultats}
+
+    identiques = all(
+        mesures['serie']['resultats'][nom].tableau().drop(columns='duree_s').equals(
+            mesures['parallele']['resultats'][nom].tableau().drop(columns='duree_s'))
+        for nom in balayages
+    )
+    return mesures, identiques
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Balayages de sélection : série vs pool de processus")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--patience', type=int, default=None, help="annulation anticipée (K et k ordonnés)")
+    args = parser.parse_args()
+
+    # Les workers importent ce module : les classes doivent être celles du module, pas de __main__
+    from sweep import comparer
+
+    mesures, identiques = comparer(args.workers, args.patience)
+    for nom, resultat in mesures['parallele']['resultats'].items():
+        print(f"\n{nom} (retenu: {resultat.meilleur.get('k', resultat.meilleur['tache'])})")
+        print(resultat.tableau().drop(columns=['tache', 'donnees']).to_string(index=False))
+
+    serie, parallele = mesures['serie']['duree_s'], mesures['parallele']['duree_s']
+    print(f"\n✅ Série: {serie:.2f} s | {args.workers} workers: {parallele:.2f} s "
+          f"| accélération x{serie / parallele:.2f} sur {os.cpu_count()} CPU | tableaux identiques: {identiques}")
@@ -1,47 +1,53 @@
 import sys
 import os
-
-print("🚀 Démarrage de l'application Flask...")
+import logging
+import time
 
 # Ajouter le chemin courant pour les imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from request_log import JournalRequetes, configurer_journalisation
+
+# Lignes JSON écrites par un thread dédié (LOG_FORMAT=texte pour du texte brut)
+configurer_journalisation(os.environ.get('LOG_LEVEL', 'INFO').upper(), os.environ.get('LOG_FORMAT', 'json'))
+logging.info("Démarrage de l'application Flask...")
+
 try:
     # Importations de base
-    from flask import Flask, render_template, request, jsonify
-    import pandas as pd
-    import numpy as np
+    from flask import Flask, render_template, request, jsonify, g
     import json
+
+    from feature_encoder import FeatureEncoder, charger_schema, verifier_schema_modele
     
-    print("✅ Importations de base réussies")
+    logging.info("Importations de base réussies")
     
     # Importations optionnelles avec gestion d'erreur
     try:
         import xgboost as xgb
-        print("✅ XGBoost importé")
+        logging.info("XGBoost importé")
     except ImportError as e:
-        print(f"❌ XGBoost: {e}")
+        logging.error("XGBoost: %s", e)
         xgb = None
         
     try:
         import plotly.graph_objects as go
         import plotly.utils
-        print("✅ Plotly importé")
+        logging.info("Plotly importé")
     except ImportError as e:
-        print(f"❌ Plotly: {e}")
+        logging.error("Plotly: %s", e)
         go = None
         
     try:
         import joblib
-        print("✅ Joblib importé")
+        logging.info("Joblib importé")
     except ImportError as e:
-        print(f"❌ Joblib: {e}")
+        logging.error("Joblib: %s", e)
         joblib = None
         
-    print("✅ Toutes les importations terminées")
+    logging.info("Toutes les importations terminées")
     
 except Exception as e:
-    print(f"❌ Erreur d'importation: {e}")
+    logging.error("Erreur d'importation: %s", e)
     input("Appuyez sur Entrée pour quitter...")
     sys.exit(1)
 
@@ -53,44 +59,47 @@ modele_final = None
 encoder = None
 scaler = None
 clf = None
+encodeur_features = None
 
 def load_models():
     """Charge les modèles avec gestion d'erreur"""
-    global modele_final, encoder, scaler, clf
+    global modele_final, encoder, scaler, clf, encodeur_features
     
-    print("🔍 Chargement des modèles...")
+    logging.info("Chargement des modèles...")
     
     if joblib is None:
-        print("❌ Joblib non disponible - mode démonstration activé")
+        logging.error("Joblib non disponible - mode démonstration activé")
         return False
         
     try:
         # Vérifier le dossier models
         if not os.path.exists('models'):
-            print("❌ Dossier 'models' introuvable")
+            logging.error("Dossier 'models' introuvable")
             return False
             
         # Liste des fichiers requis
-        model_files = ['modele_final.pkl', 'encoder.pkl', 'scaler.pkl', 'clf.pkl']
+        model_files = ['modele_final.pkl', 'encoder.pkl', 'scaler.pkl', 'clf.pkl', 'feature_schema.json']
         
         for filename in model_files:
             filepath = os.path.join('models', filename)
             if not os.path.exists(filepath):
-                print(f"❌ Fichier manquant: {filepath}")
+                logging.error("Fichier manquant: %s", filepath)
                 return False
         
         # Charger les modèles
-        print("📦 Chargement des modèles...")
         modele_final = joblib.load('models/modele_final.pkl')
         encoder = joblib.load('models/encoder.pkl')
         scaler = joblib.load('models/scaler.pkl') 
         clf = joblib.load('models/clf.pkl')
+        schema = charger_schema('models/feature_schema.json')
+        verifier_schema_modele(schema, modele_final)
+        encodeur_features = FeatureEncoder.depuis_schema(schema)
         
-        print("✅ Tous les modèles chargés avec succès!")
+        logging.info("Tous les modèles chargés avec succès")
         return True
         
     except Exception as e:
-        print(f"❌ Erreur de chargement des modèles: {e}")
+        logging.error("Erreur de chargement des modèles: %s", e)
         return False
 
 def create_simple_plot(risk_level, risk_value, risk_color):
@@ -143,7 +152,6 @@ models_loaded = load_models()
 @app.route('/')
 def index():
     """Page d'accueil principale"""
-    print("📄 Requête reçue sur la page d'accueil")
     return render_template('index.html')
 
 @app.route('/health')
@@ -158,36 +166,24 @@ def health():
 @app.route('/predict', methods=['POST'])
 def predict():
     """Endpoint de prédiction"""
-    print("🎯 Requête de prédiction reçue")
-    
     try:
         data = request.json
-        print(f"📊 Données reçues: {data}")
         
         # Utiliser les modèles réels si disponibles
         if models_loaded and all([modele_final, encoder, scaler, clf]):
-            print("🔮 Utilisation des modèles réels")
+            g.source = 'modele'
             
             # Préparation des données pour XGBoost
-            client_data_xgb = pd.DataFrame({
-                'age': [float(data['age'])],
-                'bmi': [float(data['bmi'])], 
-                'children': [int(data['children'])],
-                'sex_female': [1 if data['sex'] == 'female' else 0],
-                'sex_male': [1 if data['sex'] == 'male' else 0],
-                'smoker_no': [1 if data['smoker'] == 'no' else 0],
-                'smoker_yes': [1 if data['smoker'] == 'yes' else 0],
-                'region_northeast': [1 if data['region'] == 'northeast' else 0],
-                'region_northwest': [1 if data['region'] == 'northwest' else 0],
-                'region_southeast': [1 if data['region'] == 'southeast' else 0],
-                'region_southwest': [1 if data['region'] == 'southwest' else 0]
-            })
+            client_data_xgb = encodeur_features.encode(
+                float(data['age']), float(data['bmi']), int(data['children']),
+                data['sex'], data['smoker'], data['region']
+            )
 
             # Prédiction des frais
-            frais_predits = modele_final.predict(xgb.DMatrix(client_data_xgb))[0]
+            frais_predits = modele_final.predict(xgb.DMatrix(client_data_xgb, feature_names=encodeur_features.colonnes))[0]
             
         else:
-            print("🎭 Utilisation des données simulées")
+            g.source = 'simulation'
             # Données simulées pour la démonstration
             base_price = 10000
             age_factor = float(data['age']) * 100
@@ -198,7 +194,6 @@ def predict():
             frais_predits = base_price + age_factor + bmi_factor + smoker_factor + children_factor
         
         frais_formatted = f"${frais_predits:,.2f}"
-        print(f"💰 Frais prédits: {frais_formatted}")
 
         # Détermination du risque (simulée)
         risk_levels = [
@@ -229,12 +224,35 @@ def predict():
         })
         
     except Exception as e:
-        print(f"❌ Erreur lors de la prédiction: {e}")
+        g.erreur = e
         return jsonify({
             'success': False,
             'error': str(e)
         })
 
+# Une ligne JSON par prédiction : succès échantillonnés, erreurs toujours écrites,
+# corps remplacé par son empreinte
+journal_requetes = JournalRequetes(
+    taux_succes=float(os.environ.get('LOG_SUCCESS_SAMPLE', 0.01)),
+    cle=os.environ.get('LOG_HASH_KEY')
+)
+
+@app.before_request
+def debut_requete():
+    if request.endpoint == 'predict':
+        g.debut = time.perf_counter()
+
+@app.after_request
+def journaliser_requete(response):
+    debut = g.pop('debut', None)
+    if debut is not None:
+        journal_requetes.requete(
+            request.endpoint, response.status_code, debut,
+            payload=lambda: request.get_json(silent=True),
+            erreur=g.pop('erreur', None), source=g.pop('source', None)
+        )
+    return response
+
 @app.route('/test')
 def test_page():
     """Page de test simple"""
@@ -253,19 +271,12 @@ def test_page():
     """
 
 if __name__ == '__main__':
-    print("=" * 50)
-    print("🎯 APPLICATION FLASK PRÊTE")
-    print("=" * 50)
-    print(f"📊 Modèles chargés: {models_loaded}")
-    print("🌐 URL: http://localhost:5000")
-    print("🔧 Debug: http://localhost:5000/test")
-    print("❤️  Health: http://localhost:5000/health")
-    print("⏹️  Ctrl+C pour arrêter")
-    print("=" * 50)
+    logging.info("Application Flask prête (modèles chargés: %s) sur http://localhost:5000 "
+                 "- /test, /health", models_loaded)
     
-    # Démarrer le serveur
+    # Démarrer le serveur (sans débogueur ; en production : python serve.py)
     app.run(
-        debug=True,
+        debug=False,
         host='0.0.0.0',
         port=5000,
         use_reloader=False  # Éviter le double démarrage
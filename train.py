@@ -0,0 +1,778 @@
+import argparse
+import ast
+import copy
+import glob
+import hashlib
+import importlib
+import inspect
+import json
+import logging
+import os
+import sys
+import textwrap
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from xgb_tuning import ESPACE_DEFAUT
+
+# =============================================================================
+# PIPELINE D'ENTRAÎNEMENT SANS INTERFACE, PAR ÉTAPES MISES EN CACHE
+# =============================================================================
+# Reprend le chemin de projetML.py qui produit models/ (mêmes données, mêmes
+# paramètres, mêmes graines), sans plt.show() ni entraînements inutiles à l'export :
+#
+#   nettoyage -> encodage -> separation -> reglage -> regression -.
+#                        \-> classification ----------------------+-> export   (cible par défaut)
+#                        \-> clustering --------------------------+-> rapport  (figures, opt-in)
+#
+# reglage (xgb_tuning.py) choisit les hyperparamètres et le nombre d'itérations de
+# XGBoost par validation croisée sur le seul jeu d'entraînement ; regression
+# réentraîne alors le booster sur tout le jeu d'entraînement, et le test ne sert
+# qu'à l'évaluation. --set reglage.actif=false revient au chemin de projetML.py
+# (paramètres fixes, early stopping sur le test).
+#
+# Chaque étape est une fonction dont le résultat est sauvegardé dans .cache/train/,
+# sous une clé = empreinte de ses paramètres, du code qu'elle atteint (la fonction,
+# puis les fonctions, classes et constantes du projet qu'elle référence, dans
+# train.py comme dans xgb_tuning.py, sweep.py...), des clés des étapes amont et des
+# versions des bibliothèques ; pour le nettoyage, empreinte du CSV. Une relance ne recalcule
+# que les étapes dont l'une de ces entrées a changé. L'export n'écrit models/ que
+# si les fichiers présents ne correspondent pas déjà à sa clé.
+#
+#   python train.py                                   # models/
+#   python train.py rapport                           # + figures et métriques dans reports/
+#   python train.py --set regression.xgb.max_depth=4  # surcharge d'un paramètre
+#   python train.py --sans-cache                      # recalcule tout
+
+DOSSIER_CACHE = os.path.join('.cache', 'train')
+# Modules du projet : fichiers .py voisins de train.py
+DOSSIER_MODULES = os.path.dirname(os.path.abspath(__file__))
+FICHIER_TAMPON_EXPORT = 'export.json'
+
+# Processus des balayages de sélection (sweep.py) et dossier du journal de reprise
+# du réglage ; sans effet sur les résultats, donc hors des clés de cache
+EXECUTION = {'workers': 1, 'reprise': DOSSIER_CACHE}
+
+PARAMETRES_DEFAUT = {
+    'nettoyage': {
+        'csv': 'dataAssurance.csv',
+    },
+    'encodage': {
+        'categorielles': ['sex', 'smoker', 'region'],
+        'numeriques': ['age', 'bmi', 'children'],
+    },
+    'clustering': {
+        # exact : KMeans + silhouette exacte (projetML.py) ; minibatch : segmentation.py (gros volumes)
+        'mode': 'exact',
+        # Choix de K : silhouette, calinski_harabasz ou davies_bouldin
+        'critere': 'silhouette',
+        'k_candidats': [2, 3, 4, 5],
+        'random_state': 42,
+        'n_init': 10,
+        'minibatch': {'batch_size': 4096, 'epoques': 1, 'pas_min': 100,
+                      'taille_echantillon': 2000, 'repetitions': 10},
+        # Ward comparé au KMeans : ward (exact, O(n²)), birch_ward, ward_knn ;
+        # auto : ward en mode exact, birch_ward en mode minibatch
+        'hierarchique': 'auto',
+        'birch': {'threshold': 0.15, 'branching_factor': 50},
+        'n_voisins': 10,
+    },
+    'separation': {
+        'test_size': 0.2,
+        'random_state': 42,
+    },
+    'reglage': {
+        'actif': True,
+        'methode': 'halving',
+        'n_configurations': 27,
+        'eta': 3,
+        'min_rounds': 100,
+        'max_rounds': 1000,
+        'nfold': 5,
+        'early_stopping_rounds': 50,
+        'graine': 42,
+        # Paramètres fixes pendant la recherche ; l'espace fournit les autres
+        'xgb_base': {'objective': 'reg:squarederror', 'tree_method': 'hist', 'seed': 42},
+        'espace': ESPACE_DEFAUT,
+    },
+    'regression': {
+        'xgb': {
+            'objective': 'reg:squarederror',
+            'tree_method': 'hist',
+            'learning_rate': 0.1,
+            'max_depth': 6,
+            'subsample': 0.8,
+            'colsample_bytree': 0.8,
+            'reg_alpha': 0.1,
+            'reg_lambda': 1.0,
+            'seed': 42,
+        },
+        'num_boost_round': 1000,
+        'early_stopping_rounds': 50,
+    },
+    'classification': {
+        'quantiles': [0.33, 0.66],
+        'test_size': 0.2,
+        'random_state': 42,
+        'max_depth': 5,
+        'class_weight': {'R1': 1, 'R2': 1, 'R3': 1.5},
+        'knn_k': 5,
+        'knn_k_candidats': list(range(1, 21)),
+    },
+    'export': {
+        'dossier': 'models',
+    },
+    'rapport': {
+        'dossier': 'reports',
+        'rf_n_estimators': 100,
+        'random_state': 42,
+    },
+}
+
+
+# =============================================================================
+# FONCTIONS DE SÉLECTION (boucles des notebooks)
+# =============================================================================
+
+def evaluer_regression(y_true, y_pred):
+    """MAE, RMSE, R2, MAPE (%) comme evaluate_model de projetML.py"""
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    return {
+        'MAE': float(mean_absolute_error(y_true, y_pred)),
+        'RMSE': float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        'R2': float(r2_score(y_true, y_pred)),
+        'MAPE': float(np.mean(np.abs((y_true - y_pred) / y_true)) * 100),
+    }
+
+
+def balayage_kmeans(X, k_candidats, random_state=42, n_init=10):
+    """Méthode du coude + silhouette : une ligne (k, inertie, silhouette, CH, DB) par candidat"""
+    from sweep import MoteurBalayage
+
+    candidats = [{'tache': 'kmeans', 'donnees': 'X', 'k': k, 'random_state': random_state, 'n_init': n_init}
+                 for k in k_candidats]
+    with MoteurBalayage({'X': X}, workers=EXECUTION['workers']) as moteur:
+        resultat = moteur.executer(candidats, 'silhouette')
+    return [dict(k=c['k'], **m) for c, m in zip(resultat.candidats, resultat.metriques)]
+
+
+def balayage_minibatch(X, k_candidats, random_state=42, **options):
+    """Balayage de K par MiniBatchKMeans, critères en flux et silhouette échantillonnée (segmentation.py)"""
+    from sweep import MoteurBalayage
+
+    candidats = [dict(tache='minibatch_kmeans', donnees='X', k=k, random_state=random_state, **options)
+                 for k in k_candidats]
+    with MoteurBalayage({'X': X}, workers=EXECUTION['workers']) as moteur:
+        resultat = moteur.executer(candidats, 'silhouette')
+    return [dict(k=c['k'], **m) for c, m in zip(resultat.candidats, resultat.metriques)]
+
+
+def balayage_knn(X_train, y_train, X_test, y_test, k_candidats):
+    """Accuracy sur le test d'un KNN par nombre de voisins k"""
+    from sweep import MoteurBalayage
+
+    candidats = [{'tache': 'knn', 'donnees': 'knn', 'k': k} for k in k_candidats]
+    with MoteurBalayage({'knn': (X_train, y_train, X_test, y_test)}, workers=EXECUTION['workers']) as moteur:
+        resultat = moteur.executer(candidats, 'accuracy')
+    return [dict(k=c['k'], **m) for c, m in zip(resultat.candidats, resultat.metriques)]
+
+
+def classe_remboursement(charges, quantiles):
+    """R3 (charges faibles, fort remboursement), R2, R1 (charges élevées)"""
+    return np.where(charges <= quantiles[0], 'R3', np.where(charges <= quantiles[1], 'R2', 'R1')).astype(object)
+
+
+# =============================================================================
+# ÉTAPES
+# =============================================================================
+
+def etape_nettoyage(p):
+    """Lecture du CSV, doublons, imputation (médiane / mode), lignes sans charges"""
+    df = pd.read_csv(p['csv'])
+    df = df.drop_duplicates()
+    for colonne in ('age', 'bmi'):
+        df[colonne] = df[colonne].fillna(df[colonne].median())
+    for colonne in ('sex', 'children', 'smoker', 'region'):
+        df[colonne] = df[colonne].fillna(df[colonne].mode()[0])
+    return df.dropna(subset=['charges']).reset_index(drop=True)
+
+
+def etape_encodage(p, df):
+    """One-hot des catégorielles, MinMax des numériques ; X_transformed et schéma de features"""
+    from sklearn.preprocessing import MinMaxScaler, OneHotEncoder
+
+    from feature_encoder import construire_schema
+
+    X = df.drop('charges', axis=1)
+    encoder = OneHotEncoder(sparse_output=False)
+    encoded_df = pd.DataFrame(encoder.fit_transform(X[p['categorielles']]),
+                              columns=encoder.get_feature_names_out(p['categorielles']))
+    scaler = MinMaxScaler()
+    scaled_df = pd.DataFrame(scaler.fit_transform(X[p['numeriques']]), columns=p['numeriques'])
+
+    X_transformed = pd.concat([scaled_df, encoded_df], axis=1)
+    return {
+        'X': X_transformed,
+        'charges': df['charges'],
+        'encoder': encoder,
+        'scaler': scaler,
+        'schema': construire_schema(scaler, X_transformed.columns),
+    }
+
+
+def etape_clustering(p, encodage):
+    """Balayage de K, modèle final au K retenu, Ward hiérarchique au même K, ARI et silhouettes"""
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import adjusted_rand_score, silhouette_score
+
+    from segmentation import (BirchWard, ajuster_minibatch, choisir_k, criteres_flux, lots_tableau,
+                              silhouette_stratifiee, ward_knn)
+
+    X = encodage['X']
+    hierarchique = p['hierarchique']
+    if hierarchique == 'auto':
+        hierarchique = 'birch_ward' if p['mode'] == 'minibatch' else 'ward'
+
+    if p['mode'] == 'minibatch':
+        options = p['minibatch']
+        X = X.to_numpy(dtype=np.float64)
+        balayage = balayage_minibatch(X, p['k_candidats'], p['random_state'], **options)
+        k_optimal = choisir_k(balayage, p['critere'])
+        modele = ajuster_minibatch(lots_tableau(X), k_optimal, p['random_state'], options['batch_size'],
+                                   options['epoques'], options['pas_min'])
+        labels_kmeans = modele.predict(X)
+        silhouette_kmeans = next(ligne['silhouette'] for ligne in balayage if ligne['k'] == k_optimal)
+    else:
+        balayage = balayage_kmeans(X, p['k_candidats'], p['random_state'], p['n_init'])
+        k_optimal = choisir_k(balayage, p['critere'])
+        labels_kmeans = KMeans(n_clusters=k_optimal, random_state=p['random_state'],
+                               n_init=p['n_init']).fit_predict(X)
+        silhouette_kmeans = float(silhouette_score(X, labels_kmeans))
+
+    # ward : AgglomerativeClustering exact (matrice O(n²)) ; birch_ward et ward_knn : segmentation.py
+    if hierarchique == 'ward':
+        from sklearn.cluster import AgglomerativeClustering
+
+        labels_ward = AgglomerativeClustering(n_clusters=k_optimal, linkage='ward').fit_predict(X)
+        modele_ward = None
+    elif hierarchique == 'birch_ward':
+        options = p['birch']
+        modele_ward = BirchWard(k_optimal, options['threshold'], options['branching_factor'])
+        modele_ward.fit(lots_tableau(np.asarray(X, dtype=np.float64)))
+        labels_ward = modele_ward.predict(np.asarray(X, dtype=np.float64))
+    elif hierarchique == 'ward_knn':
+        labels_ward = ward_knn(np.asarray(X, dtype=np.float64), k_optimal, p['n_voisins'])
+        modele_ward = None
+    else:
+        raise ValueError(f"Clustering hiérarchique inconnu : {hierarchique}")
+
+    # Silhouette du Ward : exacte en mode exact, échantillonnée (stratifiée par labels) en mode minibatch
+    if p['mode'] == 'minibatch' and modele_ward is not None:
+        options = p['minibatch']
+        silhouette_ward = criteres_flux(lots_tableau(X), modele_ward, options['taille_echantillon'],
+                                        options['repetitions'], p['random_state'])['silhouette']
+    elif p['mode'] == 'minibatch':
+        options = p['minibatch']
+        silhouette_ward = silhouette_stratifiee(X, labels_ward, options['taille_echantillon'],
+                                                options['repetitions'], p['random_state'])
+    else:
+        silhouette_ward = float(silhouette_score(X, labels_ward))
+
+    return {
+        'balayage': balayage,
+        'k_optimal': k_optimal,
+        'hierarchique': hierarchique,
+        'labels_kmeans': labels_kmeans,
+        'labels_ward': labels_ward,
+        'ari': float(adjusted_rand_score(labels_kmeans, labels_ward)),
+        'silhouette_kmeans': silhouette_kmeans,
+        'silhouette_ward': silhouette_ward,
+    }
+
+
+def etape_separation(p, encodage):
+    """Split entraînement / test de la régression (une seule fois pour le réglage et les modèles)"""
+    from sklearn.model_selection import train_test_split
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        encodage['X'], encodage['charges'], test_size=p['test_size'], random_state=p['random_state']
+    )
+    return {'X_train': X_train, 'X_test': X_test, 'y_train': y_train, 'y_test': y_test}
+
+
+def etape_reglage(p, separation):
+    """Hyperparamètres et nombre d'itérations XGBoost par xgb.cv sur l'entraînement (None si inactif)"""
+    from xgb_tuning import rechercher
+
+    if not p['actif']:
+        return None
+    return rechercher(
+        separation['X_train'], separation['y_train'], p['xgb_base'], p['espace'], methode=p['methode'],
+        n_configurations=p['n_configurations'], eta=p['eta'], min_rounds=p['min_rounds'],
+        max_rounds=p['max_rounds'], nfold=p['nfold'], early_stopping_rounds=p['early_stopping_rounds'],
+        graine=p['graine'], workers=EXECUTION['workers'], dossier_reprise=EXECUTION['reprise'],
+    )
+
+
+def etape_regression(p, separation, reglage):
+    """Régression linéaire vs XGBoost ; XGBoost retenu s'il gagne en MAE et en R2 sur le test"""
+    from sweep import MoteurBalayage
+
+    X_train, X_test = separation['X_train'], separation['X_test']
+    y_train, y_test = separation['y_train'], separation['y_test']
+    if reglage is not None:
+        # Itérations fixées par la validation croisée : le test ne participe pas à l'entraînement
+        xgb_candidat = {'params': dict(p['xgb'], **reglage['params']), 'num_boost_round': reglage['num_boost_round'],
+                        'early_stopping_rounds': None}
+    else:
+        xgb_candidat = {'params': p['xgb'], 'num_boost_round': p['num_boost_round'],
+                        'early_stopping_rounds': p['early_stopping_rounds']}
+    candidats = [
+        {'tache': 'regression_lineaire', 'donnees': 'split'},
+        dict(tache='xgboost', donnees='split', **xgb_candidat),
+    ]
+    with MoteurBalayage({'split': (X_train, y_train, X_test, y_test)}, workers=EXECUTION['workers']) as moteur:
+        resultat = moteur.executer(candidats, 'MAE', maximiser=False)
+    (metriques_lr, metriques_xgb), (model_lr, model_xgb) = resultat.metriques, resultat.modeles
+    pred_lr, pred_xgb = metriques_lr.pop('predictions'), metriques_xgb.pop('predictions')
+    meilleure_iteration = metriques_xgb.pop('meilleure_iteration')
+
+    metriques = {'Régression Linéaire': metriques_lr, 'XGBoost': metriques_xgb}
+    lr, xg = metriques['Régression Linéaire'], metriques['XGBoost']
+    meilleur = 'XGBoost' if xg['MAE'] < lr['MAE'] and xg['R2'] > lr['R2'] else 'Régression Linéaire'
+    return {
+        'modele_final': model_xgb if meilleur == 'XGBoost' else model_lr,
+        'meilleur_modele': meilleur,
+        'metriques': metriques,
+        'meilleure_iteration': meilleure_iteration,
+        'reglage': None if reglage is None else {cle: reglage[cle] for cle in
+                                                 ('params', 'num_boost_round', 'rmse_cv', 'rmse_cv_std')},
+        'y_test': np.asarray(y_test),
+        'predictions': {'Régression Linéaire': pred_lr, 'XGBoost': pred_xgb},
+    }
+
+
+def etape_classification(p, encodage):
+    """Classes de remboursement ; KNN de référence et balayage de k ; arbre de décision exporté"""
+    from sklearn.metrics import classification_report
+    from sklearn.model_selection import train_test_split
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.tree import DecisionTreeClassifier
+
+    charges = encodage['charges'].to_numpy()
+    y = classe_remboursement(charges, np.quantile(charges, p['quantiles']))
+    X = encodage['X']
+
+    # KNN : split stratifié sur les tableaux NumPy, comme dans projetML.py
+    X_train, X_test, y_train, y_test = train_test_split(
+        X.values, y, test_size=p['test_size'], random_state=p['random_state'], stratify=y
+    )
+    knn = KNeighborsClassifier(n_neighbors=p['knn_k']).fit(X_train, y_train)
+    knn_rapport = classification_report(y_test, knn.predict(X_test), output_dict=True, zero_division=0)
+    knn_balayage = balayage_knn(X_train, y_train, X_test, y_test, p['knn_k_candidats'])
+
+    # Arbre : split non stratifié sur le DataFrame (feature_names_in_ conservés pour le service)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, pd.Series(y), test_size=p['test_size'], random_state=p['random_state']
+    )
+    clf = DecisionTreeClassifier(max_depth=p['max_depth'], class_weight=p['class_weight'],
+                                 random_state=p['random_state'])
+    clf.fit(X_train, y_train)
+    y_pred = clf.predict(X_test)
+    return {
+        'clf': clf,
+        'rapport_arbre': classification_report(y_test, y_pred, output_dict=True, zero_division=0),
+        'rapport_knn': knn_rapport,
+        'balayage_knn': knn_balayage,
+        'y_test': y_test.to_numpy(),
+        'y_pred': y_pred,
+    }
+
+
+def fichiers_exportes(dossier):
+    """Fichiers écrits par l'export (pickles, schéma, formats natifs, tableaux partagés)"""
+    noms = ['modele_final.pkl', 'encoder.pkl', 'scaler.pkl', 'clf.pkl',
+            'feature_schema.json', 'modele_final.ubj', 'preprocessing.npz']
+    chemins = [os.path.join(dossier, nom) for nom in noms]
+    return chemins + sorted(glob.glob(os.path.join(dossier, 'partage', '*.npy')))
+
+
+def empreintes_fichiers(chemins):
+    empreintes = {}
+    for chemin in chemins:
+        if os.path.exists(chemin):
+            with open(chemin, 'rb') as f:
+                empreintes[chemin] = hashlib.sha256(f.read()).hexdigest()
+    return empreintes
+
+
+def etape_export(p, encodage, regression, classification):
+    """Mêmes fichiers que la sauvegarde de projetML.py (pickles + formats natifs)"""
+    from feature_encoder import sauvegarder_schema
+    from native_export import exporter_natif
+
+    dossier = p['dossier']
+    os.makedirs(dossier, exist_ok=True)
+    modele_final, clf = regression['modele_final'], classification['clf']
+    joblib.dump(modele_final, os.path.join(dossier, 'modele_final.pkl'))
+    joblib.dump(encodage['encoder'], os.path.join(dossier, 'encoder.pkl'))
+    joblib.dump(encodage['scaler'], os.path.join(dossier, 'scaler.pkl'))
+    joblib.dump(clf, os.path.join(dossier, 'clf.pkl'))
+    sauvegarder_schema(encodage['schema'], os.path.join(dossier, 'feature_schema.json'))
+    exporter_natif(modele_final, encodage['encoder'], encodage['scaler'], clf, dossier)
+    return fichiers_exportes(dossier)
+
+
+def etape_rapport(p, nettoyage, encodage, clustering, regression, classification):
+    """Figures (PNG, backend Agg) et métriques (JSON) ; importances RandomForest"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import ConfusionMatrixDisplay
+
+    dossier = p['dossier']
+    os.makedirs(dossier, exist_ok=True)
+    figures = []
+
+    def enregistrer(fig, nom):
+        chemin = os.path.join(dossier, nom)
+        fig.tight_layout()
+        fig.savefig(chemin, dpi=100)
+        plt.close(fig)
+        figures.append(chemin)
+
+    rf = RandomForestRegressor(n_estimators=p['rf_n_estimators'], random_state=p['random_state'])
+    rf.fit(encodage['X'], encodage['charges'])
+    importances = pd.Series(rf.feature_importances_, index=encodage['X'].columns).sort_values(ascending=False)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    importances.plot(kind='bar', ax=ax, title='Importance des variables (RandomForest)')
+    enregistrer(fig, 'importances_rf.png')
+
+    balayage = pd.DataFrame(clustering['balayage'])
+    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(15, 5))
+    ax1.plot(balayage['k'], balayage['inertie'], marker='o')
+    ax1.set(xlabel='Nombre de clusters (K)', ylabel='Inertie', title='Méthode du coude')
+    ax2.plot(balayage['k'], balayage['silhouette'], marker='o', color='red')
+    ax2.set(xlabel='Nombre de clusters (K)', ylabel='Silhouette', title='Score de silhouette')
+    enregistrer(fig, 'balayage_kmeans.png')
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    for cluster in np.unique(clustering['labels_kmeans']):
+        masque = clustering['labels_kmeans'] == cluster
+        ax.scatter(nettoyage['age'][masque], nettoyage['charges'][masque], alpha=0.6, label=f'Cluster {cluster}')
+    ax.set(xlabel='Âge', ylabel='Charges ($)', title='Charges vs Âge par Cluster (KMeans)')
+    ax.legend()
+    enregistrer(fig, 'clusters_kmeans.png')
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+    for ax, (nom, pred) in zip(axes, regression['predictions'].items()):
+        ax.scatter(regression['y_test'], pred, alpha=0.5)
+        bornes = [regression['y_test'].min(), regression['y_test'].max()]
+        ax.plot(bornes, bornes, 'r--')
+        ax.set(xlabel='Valeurs réelles', ylabel='Prédictions', title=f'{nom} : prédictions vs réel')
+    enregistrer(fig, 'regression.png')
+
+    knn = pd.DataFrame(classification['balayage_knn'])
+    fig, ax = plt.subplots()
+    ax.plot(knn['k'], knn['accuracy'], marker='o')
+    ax.set(xlabel='Nombre de voisins (k)', ylabel='Accuracy sur test', title='Choix du meilleur k')
+    enregistrer(fig, 'balayage_knn.png')
+
+    fig, ax = plt.subplots()
+    ConfusionMatrixDisplay.from_predictions(classification['y_test'], classification['y_pred'],
+                                            labels=['R1', 'R2', 'R3'], cmap='Blues', ax=ax)
+    ax.set_title('Matrice de confusion - Arbre de décision')
+    enregistrer(fig, 'confusion_arbre.png')
+
+    metriques = {
+        'importances_rf': importances.round(6).to_dict(),
+        'clustering': {cle: clustering[cle] for cle in
+                       ('balayage', 'k_optimal', 'hierarchique', 'ari', 'silhouette_kmeans', 'silhouette_ward')},
+        'regression': {cle: regression[cle] for cle in
+                       ('meilleur_modele', 'metriques', 'meilleure_iteration', 'reglage')},
+        'classification': {cle: classification[cle] for cle in ('rapport_arbre', 'rapport_knn', 'balayage_knn')},
+    }
+    chemin = os.path.join(dossier, 'metriques.json')
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump(metriques, f, indent=2, ensure_ascii=False, default=float)
+    return figures + [chemin]
+
+
+# Nom -> (fonction, étapes amont dont les résultats sont passés en arguments)
+ETAPES = {
+    'nettoyage': (etape_nettoyage, ()),
+    'encodage': (etape_encodage, ('nettoyage',)),
+    'clustering': (etape_clustering, ('encodage',)),
+    'separation': (etape_separation, ('encodage',)),
+    'reglage': (etape_reglage, ('separation',)),
+    'regression': (etape_regression, ('separation', 'reglage')),
+    'classification': (etape_classification, ('encodage',)),
+    'export': (etape_export, ('encodage', 'regression', 'classification')),
+    'rapport': (etape_rapport, ('nettoyage', 'encodage', 'clustering', 'regression', 'classification')),
+}
+
+
+# =============================================================================
+# CACHE DES ÉTAPES
+# =============================================================================
+
+def versions_bibliotheques():
+    import sklearn
+    import xgboost
+
+    return {'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__,
+            'xgboost': xgboost.__version__, 'python': sys.version.split()[0]}
+
+
+# Constantes lues par les étapes mais sans effet sur leurs résultats (processus, reprise)
+HORS_CLES = {'EXECUTION'}
+
+
+def _module_projet(objet):
+    """Module du projet (fichier voisin de train.py) qui définit objet, sinon None"""
+    module = objet if inspect.ismodule(objet) else sys.modules.get(getattr(objet, '__module__', None))
+    chemin = getattr(module, '__file__', None)
+    if chemin is None or os.path.dirname(os.path.abspath(chemin)) != DOSSIER_MODULES:
+        return None
+    return module
+
+
+def _nom_module(module):
+    # Nom du fichier : train.py lancé en script (__main__) et importé donnent la même clé
+    return os.path.splitext(os.path.basename(module.__file__))[0]
+
+
+def _references(source, module):
+    """(nom, objet) des noms globaux et des imports du projet référencés par `source`"""
+    arbre = ast.parse(textwrap.dedent(source))
+    espace = dict(vars(module))
+    for noeud in ast.walk(arbre):
+        # Imports locaux aux fonctions : from sweep import MoteurBalayage, import train...
+        if isinstance(noeud, ast.ImportFrom) and noeud.level == 0 and noeud.module:
+            importe = sys.modules.get(noeud.module)
+            if importe is None and os.path.exists(os.path.join(DOSSIER_MODULES, noeud.module + '.py')):
+                importe = importlib.import_module(noeud.module)
+            if importe is not None and _module_projet(importe) is not None:
+                for alias in noeud.names:
+                    espace[alias.asname or alias.name] = getattr(importe, alias.name, None)
+        elif isinstance(noeud, ast.Import):
+            for alias in noeud.names:
+                if os.path.exists(os.path.join(DOSSIER_MODULES, alias.name + '.py')):
+                    espace[alias.asname or alias.name] = importlib.import_module(alias.name)
+    for noeud in ast.walk(arbre):
+        if isinstance(noeud, ast.Name) and noeud.id in espace:
+            yield noeud.id, espace[noeud.id]
+        elif (isinstance(noeud, ast.Attribute) and isinstance(noeud.value, ast.Name)
+              and inspect.ismodule(espace.get(noeud.value.id)) and _module_projet(espace[noeud.value.id])):
+            yield noeud.attr, getattr(espace[noeud.value.id], noeud.attr, None)
+
+
+def code_etape(fonction):
+    """
+    Empreintes du code atteint depuis la fonction d'une étape : fonctions et classes
+    du projet qu'elle référence (noms globaux, imports locaux, module.attribut), de
+    proche en proche dans tous les modules, et valeurs des constantes (noms en
+    majuscules) qu'elles lisent. Une modification ailleurs dans un module n'invalide
+    pas l'étape. Non suivis : les accès dynamiques (getattr, globals()[...]).
+    """
+    empreintes = {}
+    a_visiter = [fonction]
+
+    def constante(cle, valeur):
+        # Fonctions d'un registre (sweep.TACHES...) : leur code est suivi, leur nom suffit ici
+        def nommer(o):
+            if (inspect.isfunction(o) or inspect.isclass(o)) and _module_projet(o) is not None:
+                a_visiter.append(o)
+                return f'{_nom_module(_module_projet(o))}.{o.__qualname__}'
+            return repr(o)
+        texte = json.dumps(valeur, sort_keys=True, default=nommer)
+        empreintes[cle] = hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+    while a_visiter:
+        objet = a_visiter.pop()
+        module = _module_projet(objet)
+        cle = f'{_nom_module(module)}.{objet.__qualname__}'
+        if cle in empreintes:
+            continue
+        source = inspect.getsource(objet)
+        empreintes[cle] = hashlib.sha256(source.encode('utf-8')).hexdigest()
+        for nom, valeur in _references(source, module):
+            if (inspect.isfunction(valeur) or inspect.isclass(valeur)) and _module_projet(valeur) is not None:
+                a_visiter.append(valeur)
+            elif nom.isupper() and nom not in HORS_CLES and not inspect.ismodule(valeur):
+                constante(f'{_nom_module(module)}.{nom}', valeur)
+    return empreintes
+
+
+def empreinte_fichier(chemin):
+    with open(chemin, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class CacheEtapes:
+    """Résultats d'étapes sérialisés (joblib) dans un dossier, indexés par clé d'entrées"""
+
+    def __init__(self, dossier=DOSSIER_CACHE, actif=True):
+        self.dossier = dossier
+        self.actif = actif
+
+    def _chemin(self, etape, cle):
+        return os.path.join(self.dossier, f'{etape}-{cle[:16]}.joblib')
+
+    def lire(self, etape, cle):
+        chemin = self._chemin(etape, cle)
+        if not self.actif or not os.path.exists(chemin):
+            return None
+        try:
+            return joblib.load(chemin)
+        except Exception as e:
+            logging.warning("Cache illisible pour %s (%s) : étape recalculée", etape, e)
+            return None
+
+    def ecrire(self, etape, cle, resultat):
+        os.makedirs(self.dossier, exist_ok=True)
+        # Écriture puis renommage : un entraînement interrompu ne laisse pas d'entrée tronquée
+        chemin = self._chemin(etape, cle)
+        joblib.dump(resultat, chemin + '.tmp')
+        os.replace(chemin + '.tmp', chemin)
+
+    def lire_tampon_export(self):
+        chemin = os.path.join(self.dossier, FICHIER_TAMPON_EXPORT)
+        if not self.actif or not os.path.exists(chemin):
+            return None
+        with open(chemin, encoding='utf-8') as f:
+            return json.load(f)
+
+    def ecrire_tampon_export(self, cle, fichiers):
+        os.makedirs(self.dossier, exist_ok=True)
+        with open(os.path.join(self.dossier, FICHIER_TAMPON_EXPORT), 'w', encoding='utf-8') as f:
+            json.dump({'cle': cle, 'fichiers': empreintes_fichiers(fichiers)}, f, indent=2)
+
+
+class PipelineEntrainement:
+    """Exécute une étape cible et ses dépendances, en réutilisant les résultats en cache"""
+
+    def __init__(self, parametres=None, cache=None):
+        self.parametres = copy.deepcopy(PARAMETRES_DEFAUT if parametres is None else parametres)
+        self.cache = cache if cache is not None else CacheEtapes()
+        self._versions = versions_bibliotheques()
+        self.cles = {}
+        self.resultats = {}
+        # Étape -> ('cache' | 'calculée' | 'à jour', durée en s)
+        self.journal = {}
+
+    def cle(self, etape):
+        if etape not in self.cles:
+            fonction, amont = ETAPES[etape]
+            entrees = {
+                'etape': etape,
+                'code': code_etape(fonction),
+                'parametres': self.parametres[etape],
+                'amont': [self.cle(nom) for nom in amont],
+                'versions': self._versions,
+            }
+            if etape == 'nettoyage':
+                entrees['csv'] = empreinte_fichier(self.parametres['nettoyage']['csv'])
+            texte = json.dumps(entrees, sort_keys=True, ensure_ascii=False, default=str)
+            self.cles[etape] = hashlib.sha256(texte.encode('utf-8')).hexdigest()
+        return self.cles[etape]
+
+    def _export_a_jour(self, cle):
+        tampon = self.cache.lire_tampon_export()
+        if tampon is None or tampon['cle'] != cle:
+            return False
+        fichiers = fichiers_exportes(self.parametres['export']['dossier'])
+        return empreintes_fichiers(fichiers) == tampon['fichiers']
+
+    def executer(self, etape):
+        if etape in self.resultats:
+            return self.resultats[etape]
+        fonction, amont = ETAPES[etape]
+        cle = self.cle(etape)
+        debut = time.perf_counter()
+
+        # L'export n'a pas de résultat à mettre en cache : ses fichiers sont comparés à ceux du dernier export
+        if etape == 'export' and self._export_a_jour(cle):
+            self.journal[etape] = ('à jour', time.perf_counter() - debut)
+            self.resultats[etape] = fichiers_exportes(self.parametres['export']['dossier'])
+            return self.resultats[etape]
+
+        resultat = self.cache.lire(etape, cle) if etape not in ('export', 'rapport') else None
+        if resultat is not None:
+            self.journal[etape] = ('cache', time.perf_counter() - debut)
+        else:
+            entrees = [self.executer(nom) for nom in amont]
+            debut = time.perf_counter()
+            logging.info("Étape %s : calcul", etape)
+            resultat = fonction(self.parametres[etape], *entrees)
+            self.journal[etape] = ('calculée', time.perf_counter() - debut)
+            if etape == 'export':
+                self.cache.ecrire_tampon_export(cle, resultat)
+            elif etape != 'rapport':
+                self.cache.ecrire(etape, cle, resultat)
+        self.resultats[etape] = resultat
+        return resultat
+
+
+def surcharger(parametres, affectation):
+    """Applique 'etape.cle[.sous_cle]=valeur' (valeur lue en JSON, sinon chaîne)"""
+    chemin, _, texte = affectation.partition('=')
+    noms = chemin.split('.')
+    if len(noms) < 2 or noms[0] not in parametres:
+        raise ValueError(f"Paramètre invalide: {chemin} (attendu etape.cle, étapes: {', '.join(parametres)})")
+    try:
+        valeur = json.loads(texte)
+    except json.JSONDecodeError:
+        valeur = texte
+    cible = parametres
+    for nom in noms[:-1]:
+        cible = cible[nom]
+    if noms[-1] not in cible:
+        raise ValueError(f"Paramètre inconnu: {chemin}")
+    cible[noms[-1]] = valeur
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Entraîne les modèles du service par étapes mises en cache")
+    parser.add_argument('cibles', nargs='*', default=['export'],
+                        help=f"étapes à produire parmi {', '.join(ETAPES)} (défaut : export)")
+    parser.add_argument('--set', dest='surcharges', action='append', default=[], metavar='ETAPE.CLE=VALEUR')
+    parser.add_argument('--sans-cache', action='store_true', help="ignore les résultats en cache")
+    parser.add_argument('--cache', default=DOSSIER_CACHE, help="dossier du cache")
+    parser.add_argument('--workers', type=int, default=1, help="processus des balayages (sweep.py)")
+    args = parser.parse_args()
+    for cible in args.cibles:
+        if cible not in ETAPES:
+            parser.error(f"étape inconnue: {cible}")
+
+    EXECUTION.update(workers=args.workers, reprise=None if args.sans_cache else args.cache)
+    parametres = copy.deepcopy(PARAMETRES_DEFAUT)
+    for affectation in args.surcharges:
+        surcharger(parametres, affectation)
+
+    debut = time.perf_counter()
+    pipeline = PipelineEntrainement(parametres, CacheEtapes(args.cache, actif=not args.sans_cache))
+    for cible in args.cibles:
+        pipeline.executer(cible)
+
+    for etape, (etat, duree) in pipeline.journal.items():
+        print(f"✅ {etape:<15} {etat:<9} {duree:7.2f} s  [{pipeline.cle(etape)[:12]}]")
+    if 'regression' in pipeline.resultats:
+        regression = pipeline.resultats['regression']
+        print(f"   Modèle final: {regression['meilleur_modele']} "
+              f"(MAE {regression['metriques'][regression['meilleur_modele']]['MAE']:.2f})")
+        if regression['reglage'] is not None:
+            reglage = regression['reglage']
+            print(f"   Réglage XGBoost: {reglage['params']}, {reglage['num_boost_round']} itérations "
+                  f"(RMSE CV {reglage['rmse_cv']:.1f} ± {reglage['rmse_cv_std']:.1f})")
+    if pipeline.journal.get('export', ('',))[0] == 'calculée':
+        print("ℹ️ Mode PREDICTION_MODE=table : reconstruire la table avec python price_table.py")
+    print(f"⏱️ Total: {time.perf_counter() - debut:.2f} s")
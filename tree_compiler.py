@@ -0,0 +1,155 @@
+import numpy as np
+
+# =============================================================================
+# ARBRE DE DÉCISION COMPILÉ (clf.pkl sans scikit-learn à l'inférence)
+# =============================================================================
+# Les tableaux tree_.feature / threshold / children_* / value sont aplatis :
+# - predict_one() parcourt l'arbre sur une ligne avec des listes Python,
+#   sans validation ni conversion scikit-learn ;
+# - predict() avance tout un lot d'un niveau par itération avec NumPy.
+# Comme scikit-learn, les entrées sont comparées en float32 (x <= seuil -> gauche).
+
+FEUILLE = -1
+
+
+class ArbreCompile:
+    """Évaluateur à plat d'un DecisionTreeClassifier entraîné"""
+
+    def __init__(self, children_left, children_right, feature, threshold, value,
+                 classes, feature_names=None):
+        self.children_left = np.asarray(children_left, dtype=np.intp)
+        self.children_right = np.asarray(children_right, dtype=np.intp)
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.classes = np.asarray(classes, dtype=object)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+
+        # Classe de chaque nœud (seules les feuilles sont utilisées)
+        self.classe_noeud = np.argmax(np.asarray(value)[:, 0, :], axis=1)
+        est_feuille = self.children_left == FEUILLE
+        # Sur une feuille on « boucle » sur elle-même : le parcours vectorisé s'y arrête
+        self._gauche = np.where(est_feuille, np.arange(len(est_feuille)), self.children_left)
+        self._droite = np.where(est_feuille, np.arange(len(est_feuille)), self.children_right)
+        self._feature = np.where(est_feuille, 0, self.feature)
+        self.profondeur = self._calculer_profondeur()
+
+        # Versions listes pour le parcours d'une seule ligne
+        self._l_gauche = self.children_left.tolist()
+        self._l_droite = self.children_right.tolist()
+        self._l_feature = self.feature.tolist()
+        self._l_seuil = self.threshold.tolist()
+        self._l_classe = [self.classes[i] for i in self.classe_noeud.tolist()]
+
+    @classmethod
+    def depuis_parametres(cls, arbre):
+        """Depuis ParametresArbre (preprocessing.npz / models/partage) ou un clf scikit-learn"""
+        source = getattr(arbre, 'tree_', arbre)
+        return cls(
+            source.children_left, source.children_right, source.feature,
+            source.threshold, source.value, arbre.classes_,
+            getattr(arbre, 'feature_names_in_', None)
+        )
+
+    def _calculer_profondeur(self):
+        profondeur, pile = 0, [(0, 0)]
+        while pile:
+            noeud, niveau = pile.pop()
+            profondeur = max(profondeur, niveau)
+            if self.children_left[noeud] != FEUILLE:
+                pile.append((self.children_left[noeud], niveau + 1))
+                pile.append((self.children_right[noeud], niveau + 1))
+        return profondeur
+
+    def predict_one(self, ligne):
+        """Classe d'une ligne (séquence de features dans l'ordre d'entraînement)"""
+        gauche, droite, feature, seuil = self._l_gauche, self._l_droite, self._l_feature, self._l_seuil
+        noeud = 0
+        while gauche[noeud] != FEUILLE:
+            # float32 comme scikit-learn ; sans effet si la ligne vient de FeatureEncoder
+            if np.float32(ligne[feature[noeud]]) <= seuil[noeud]:
+                noeud = gauche[noeud]
+            else:
+                noeud = droite[noeud]
+        return self._l_classe[noeud]
+
+    def predict_indices(self, X):
+        """Indice de classe pour chaque ligne d'une matrice (n, n_features)"""
+        X = np.asarray(X, dtype=np.float32)
+        lignes = np.arange(X.shape[0])
+        noeuds = np.zeros(X.shape[0], dtype=np.intp)
+        for _ in range(self.profondeur):
+            a_gauche = X[lignes, self._feature[noeuds]] <= self.threshold[noeuds]
+            noeuds = np.where(a_gauche, self._gauche[noeuds], self._droite[noeuds])
+        return self.classe_noeud[noeuds]
+
+    def predict(self, X):
+        """Classes pour un lot (équivalent vectorisé de clf.predict)"""
+        return self.classes[self.predict_indices(X)]
+
+
+def valider_sur_donnees(chemin_csv='dataAssurance.csv', dossier='models'):
+    """
+    Compare l'arbre compilé à clf.predict sur tout le jeu de données
+    (nettoyage identique à projetML.py, encodage via le schéma de features).
+    """
+    import time
+    import warnings
+
+    import joblib
+    import pandas as pd
+
+    from feature_encoder import FeatureEncoder, charger_schema
+
+    df = pd.read_csv(chemin_csv).drop_duplicates()
+    for colonne in ('age', 'bmi'):
+        df[colonne] = df[colonne].fillna(df[colonne].median())
+    for colonne in ('sex', 'children', 'smoker', 'region'):
+        df[colonne] = df[colonne].fillna(df[colonne].mode()[0])
+
+    encodeur = FeatureEncoder.depuis_schema(charger_schema(f'{dossier}/feature_schema.json'))
+    X = encodeur.encode_batch(
+        df['age'].values, df['bmi'].values, df['children'].values,
+        df['sex'].values, df['smoker'].values, df['region'].values
+    )
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        clf = joblib.load(f'{dossier}/clf.pkl')
+    arbre = ArbreCompile.depuis_parametres(clf)
+    X_df = pd.DataFrame(X, columns=encodeur.colonnes)
+
+    debut = time.perf_counter()
+    attendu = clf.predict(X_df)
+    t_sklearn_lot = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    obtenu_lot = arbre.predict(X)
+    t_compile_lot = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    obtenu_ligne = [arbre.predict_one(ligne) for ligne in X.tolist()]
+    t_compile_ligne = (time.perf_counter() - debut) / len(X)
+
+    debut = time.perf_counter()
+    for i in range(200):
+        clf.predict(X_df.iloc[i:i + 1])
+    t_sklearn_ligne = (time.perf_counter() - debut) / 200
+
+    return {
+        'lignes': len(X),
+        'accord_lot': float(np.mean(obtenu_lot == attendu)),
+        'accord_ligne': float(np.mean(np.array(obtenu_ligne, dtype=object) == attendu)),
+        'sklearn_lot_ms': round(t_sklearn_lot * 1000, 3),
+        'compile_lot_ms': round(t_compile_lot * 1000, 3),
+        'sklearn_ligne_us': round(t_sklearn_ligne * 1e6, 1),
+        'compile_ligne_us': round(t_compile_ligne * 1e6, 1),
+    }
+
+
+if __name__ == '__main__':
+    resultats = valider_sur_donnees()
+    for cle, valeur in resultats.items():
+        print(f"{cle:>18} : {valeur}")
+    if resultats['accord_lot'] < 1.0 or resultats['accord_ligne'] < 1.0:
+        raise SystemExit("❌ L'arbre compilé diverge de scikit-learn")
+    print("✅ Arbre compilé identique à scikit-learn sur tout le jeu de données")
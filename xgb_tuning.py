@@ -0,0 +1,226 @@
+import argparse
+import hashlib
+import inspect
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+# =============================================================================
+# RÉGLAGE DE XGBOOST PAR VALIDATION CROISÉE (xgb.cv + SUCCESSIVE HALVING)
+# =============================================================================
+# projetML.py arrête l'entraînement sur le jeu de test (early stopping) : le test
+# choisit le nombre d'itérations, puis sert à mesurer le modèle. Ici, seul le jeu
+# d'entraînement est utilisé : chaque configuration est évaluée par xgb.cv
+# (k plis fixés, early stopping par configuration), le nombre d'itérations retenu
+# est celui de la validation croisée, et le test reste intact pour l'évaluation.
+#
+# - Recherche budgétée : configurations tirées au hasard dans ESPACE_DEFAUT
+#   (graine fixe), puis successive halving sur le nombre maximal d'itérations :
+#   toutes au budget le plus faible, le meilleur 1/eta passe au budget suivant
+#   (methode='aleatoire' : un seul palier, au budget maximal). Une configuration dont
+#   l'early stopping s'est déclenché sous le budget précédent garde son résultat
+#   (xgb.cv donnerait exactement le même) : seules les autres sont réévaluées.
+# - Parallélisme : les configurations d'un palier passent par sweep.MoteurBalayage ;
+#   nthread de XGBoost = CPU / workers, pour occuper les cœurs sans les surcharger.
+# - Reprise : chaque évaluation terminée est ajoutée à un journal JSONL (un fichier
+#   par jeu d'entraînement, réglage de la recherche et code de la tâche xgb_cv) ;
+#   une recherche interrompue reprend sans réévaluer ce qui est déjà journalisé.
+#
+#   python xgb_tuning.py                    # recherche sur le split de train.py
+#   python xgb_tuning.py --workers 4 --methode aleatoire --configurations 20
+
+# Espace de recherche : nom -> (loi, min, max) ; 'log' = log-uniforme
+ESPACE_DEFAUT = {
+    'max_depth': ['entier', 3, 8],
+    'learning_rate': ['log', 0.02, 0.3],
+    'subsample': ['uniforme', 0.6, 1.0],
+    'colsample_bytree': ['uniforme', 0.6, 1.0],
+    'min_child_weight': ['log', 1.0, 10.0],
+    'reg_alpha': ['log', 0.001, 10.0],
+    'reg_lambda': ['log', 0.1, 10.0],
+}
+
+# Critère de sélection (xgb.cv, moyenne sur les plis de validation)
+CRITERE = 'rmse_cv'
+
+
+def tirer_configurations(espace, n, graine=42):
+    """n configurations tirées selon l'espace (reproductibles pour une graine donnée)"""
+    rng = np.random.default_rng(graine)
+    configurations = []
+    for _ in range(n):
+        configuration = {}
+        for nom, (loi, bas, haut) in espace.items():
+            if loi == 'entier':
+                configuration[nom] = int(rng.integers(bas, haut + 1))
+            elif loi == 'log':
+                configuration[nom] = round(float(math.exp(rng.uniform(math.log(bas), math.log(haut)))), 6)
+            else:
+                configuration[nom] = round(float(rng.uniform(bas, haut)), 6)
+        configurations.append(configuration)
+    return configurations
+
+
+def budgets_halving(min_rounds, max_rounds, eta):
+    """Budgets d'itérations par palier : max_rounds / eta^i, jusqu'à min_rounds au moins"""
+    budgets = [max_rounds]
+    while budgets[-1] / eta >= min_rounds:
+        budgets.append(int(math.ceil(budgets[-1] / eta)))
+    return budgets[::-1]
+
+
+def empreinte(*objets):
+    texte = json.dumps(objets, sort_keys=True, default=str)
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+def empreinte_donnees(X, y):
+    h = hashlib.sha256()
+    h.update(np.ascontiguousarray(np.asarray(X, dtype=np.float64)).tobytes())
+    h.update(np.ascontiguousarray(np.asarray(y, dtype=np.float64)).tobytes())
+    h.update(json.dumps([str(c) for c in getattr(X, 'columns', [])]).encode('utf-8'))
+    return h.hexdigest()
+
+
+class JournalReglage:
+    """Évaluations terminées (une ligne JSON chacune), relues au démarrage pour reprendre"""
+
+    def __init__(self, chemin=None):
+        self.chemin = chemin
+        self.evaluations = {}
+        if chemin is not None and os.path.exists(chemin):
+            with open(chemin, encoding='utf-8') as f:
+                for ligne in f:
+                    try:
+                        entree = json.loads(ligne)
+                    except json.JSONDecodeError:
+                        # Dernière ligne tronquée par une interruption : ignorée, réévaluée
+                        continue
+                    self.evaluations[entree['cle']] = entree['metriques']
+
+    def ajouter(self, cle, configuration, budget, metriques):
+        self.evaluations[cle] = metriques
+        if self.chemin is None:
+            return
+        os.makedirs(os.path.dirname(self.chemin) or '.', exist_ok=True)
+        with open(self.chemin, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'cle': cle, 'configuration': configuration, 'budget': budget,
+                                'metriques': metriques}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def rechercher(X_train, y_train, params_base, espace=None, methode='halving', n_configurations=27, eta=3,
+               min_rounds=100, max_rounds=1000, nfold=5, early_stopping_rounds=50, graine=42,
+               workers=1, dossier_reprise=None):
+    """
+    Recherche budgétée par xgb.cv sur (X_train, y_train). Retourne les hyperparamètres
+    retenus, leur nombre d'itérations et le tableau de toutes les évaluations.
+    """
+    import xgboost as xgb
+
+    from sweep import TACHES, MoteurBalayage
+
+    espace = ESPACE_DEFAUT if espace is None else espace
+    configurations = tirer_configurations(espace, n_configurations, graine)
+    budgets = budgets_halving(min_rounds, max_rounds, eta) if methode == 'halving' else [max_rounds]
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    # Un journal par (données, réglage de la recherche, code de l'évaluation xgb.cv et version
+    # de XGBoost) : ni workers ni threads, sans effet sur les résultats
+    contexte = empreinte(empreinte_donnees(X_train, y_train), params_base, espace, n_configurations,
+                         nfold, early_stopping_rounds, graine, inspect.getsource(TACHES['xgb_cv']),
+                         xgb.__version__)
+    chemin = os.path.join(dossier_reprise, f'reglage-{contexte[:16]}.jsonl') if dossier_reprise else None
+    journal = JournalReglage(chemin)
+    reprises = len(journal.evaluations)
+
+    lignes = []
+    reutilisees = 0
+    survivantes = list(range(n_configurations))
+    with MoteurBalayage({'cv': (X_train, y_train)}, workers=workers, threads_par_worker=threads) as moteur:
+        for palier, budget in enumerate(budgets):
+            candidats = [{
+                'tache': 'xgb_cv', 'donnees': 'cv', 'configuration': i,
+                'params': dict(params_base, nthread=threads, **configurations[i]),
+                'num_boost_round': budget, 'nfold': nfold, 'graine_plis': graine,
+                'early_stopping_rounds': early_stopping_rounds,
+            } for i in survivantes]
+            cles = {i: empreinte(configurations[i], budget) for i in survivantes}
+
+            # Early stopping déclenché sous le budget précédent : un budget plus grand
+            # donnerait exactement le même xgb.cv, le résultat est repris tel quel
+            if palier > 0 and early_stopping_rounds is not None:
+                for i in survivantes:
+                    precedent = resultats[i]
+                    if (cles[i] not in journal.evaluations
+                            and precedent['iterations'] + early_stopping_rounds <= budgets[palier - 1]):
+                        journal.ajouter(cles[i], configurations[i], budget, precedent)
+                        reutilisees += 1
+
+            a_evaluer = [c for c in candidats if cles[c['configuration']] not in journal.evaluations]
+            if a_evaluer:
+                moteur.executer(
+                    a_evaluer, CRITERE, maximiser=False,
+                    rappel=lambda c, m: journal.ajouter(cles[c['configuration']], configurations[c['configuration']],
+                                                        c['num_boost_round'], m),
+                )
+
+            resultats = {i: journal.evaluations[cles[i]] for i in survivantes}
+            for i in survivantes:
+                lignes.append(dict(configuration=i, palier=palier, budget=budget, **configurations[i], **resultats[i]))
+            # Égalité : l'ordre de tirage départage
+            classement = sorted(survivantes, key=lambda i: (resultats[i][CRITERE], i))
+            if palier < len(budgets) - 1:
+                survivantes = classement[:max(1, len(survivantes) // eta)]
+            else:
+                survivantes = classement
+
+    meilleure = survivantes[0]
+    dernier = resultats[meilleure]
+    return {
+        'params': configurations[meilleure],
+        'num_boost_round': dernier['iterations'],
+        'rmse_cv': dernier['rmse_cv'],
+        'rmse_cv_std': dernier['rmse_cv_std'],
+        'configuration': meilleure,
+        'budgets': budgets,
+        'evaluations': lignes,
+        'reprises': reprises,
+        'reutilisees': reutilisees,
+        'journal': chemin,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Réglage de XGBoost par xgb.cv (successive halving)")
+    parser.add_argument('--methode', choices=['halving', 'aleatoire'], default='halving')
+    parser.add_argument('--configurations', type=int, default=27)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--reprise', default=os.path.join('.cache', 'train'), help="dossier du journal de reprise")
+    args = parser.parse_args()
+
+    import time
+
+    import train
+
+    debut = time.perf_counter()
+    separation = train.etape_separation(train.PARAMETRES_DEFAUT['separation'], train.etape_encodage(
+        train.PARAMETRES_DEFAUT['encodage'], train.etape_nettoyage(train.PARAMETRES_DEFAUT['nettoyage'])))
+    p = train.PARAMETRES_DEFAUT['reglage']
+    resultat = rechercher(
+        separation['X_train'], separation['y_train'], p['xgb_base'], p['espace'], methode=args.methode,
+        n_configurations=args.configurations, eta=p['eta'], min_rounds=p['min_rounds'], max_rounds=p['max_rounds'],
+        nfold=p['nfold'], early_stopping_rounds=p['early_stopping_rounds'], graine=p['graine'],
+        workers=args.workers, dossier_reprise=args.reprise,
+    )
+    tableau = pd.DataFrame(resultat['evaluations'])
+    print(tableau.sort_values(['palier', CRITERE]).to_string(index=False, float_format=lambda v: f'{v:.4g}'))
+    print(f"\n✅ Configuration {resultat['configuration']} : {resultat['params']}")
+    print(f"   {resultat['num_boost_round']} itérations, RMSE CV {resultat['rmse_cv']:.1f} ± {resultat['rmse_cv_std']:.1f}"
+          f" | budgets {resultat['budgets']} | {len(tableau)} évaluations dont {resultat['reprises']} reprises"
+          f" et {resultat['reutilisees']} reprises du palier précédent (early stopping)"
+          f" | {time.perf_counter() - debut:.1f} s")